@@ -1,18 +1,32 @@
 import streamlit as st
 import os
+import time
+import importlib
 from auth import authenticate_user, get_user_role, logout_user
 from database import init_database
-from components.status_report import status_report_page
-from components.emergency_map import emergency_map_page
-from components.shelters import shelters_page
-from components.sos_alerts import sos_alerts_page
-from components.emergency_contacts import emergency_contacts_page
-from components.messaging import messaging_page
-from components.government_dashboard import government_dashboard_page
+from query_stats import set_page
+import profiler
+from metrics import PAGE_RENDER_SECONDS, start_metrics_server
+from components.live_updates import subscribe_session, live_notifications
+
+# Page name -> (module, render function). Page modules and their heavy
+# dependencies (plotly, pandas, folium, numpy) are imported on first visit.
+PAGES = {
+    "Status Report": ("components.status_report", "status_report_page"),
+    "Emergency Map": ("components.emergency_map", "emergency_map_page"),
+    "Shelters": ("components.shelters", "shelters_page"),
+    "SOS Alerts": ("components.sos_alerts", "sos_alerts_page"),
+    "Messages": ("components.messaging", "messaging_page"),
+    "Emergency Contacts": ("components.emergency_contacts", "emergency_contacts_page"),
+    "Government Dashboard": ("components.government_dashboard", "government_dashboard_page"),
+}
 
 # Initialize database
 init_database()
 
+# Serve /metrics for scraping if FLOODAID_METRICS_PORT is set (once per process)
+start_metrics_server()
+
 # Set page config
 st.set_page_config(
     page_title="FloodRescueNet - Emergency Response System",
@@ -128,6 +142,10 @@ def main():
         
         selected_page = st.selectbox("Navigate to:", pages)
         
+        # Live notifications pushed by other sessions (SOS alerts, messages, shelters)
+        subscribe_session(st.session_state.user_id, st.session_state.user_role)
+        live_notifications()
+        
         st.divider()
         
         if st.button("🚪 Logout", use_container_width=True):
@@ -135,20 +153,24 @@ def main():
             st.rerun()
 
     # Main content area
-    if selected_page == "Status Report":
-        status_report_page()
-    elif selected_page == "Emergency Map":
-        emergency_map_page()
-    elif selected_page == "Shelters":
-        shelters_page()
-    elif selected_page == "SOS Alerts":
-        sos_alerts_page()
-    elif selected_page == "Messages":
-        messaging_page()
-    elif selected_page == "Emergency Contacts":
-        emergency_contacts_page()
-    elif selected_page == "Government Dashboard":
-        government_dashboard_page()
+    render_page(selected_page)
+
+def render_page(page_name):
+    """Import a page's module on first use and render it"""
+    module_name, function_name = PAGES[page_name]
+    set_page(page_name)
+    started = time.perf_counter()
+    try:
+        if profiler.enabled(st.session_state.get("profile_renders")):
+            with profiler.profile_render(page_name):
+                module = importlib.import_module(module_name)
+                getattr(module, function_name)()
+        else:
+            module = importlib.import_module(module_name)
+            getattr(module, function_name)()
+    finally:
+        PAGE_RENDER_SECONDS.observe(time.perf_counter() - started, page=page_name,
+                                    role=st.session_state.get("user_role") or "anonymous")
 
 if __name__ == "__main__":
     main()
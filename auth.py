@@ -74,6 +74,9 @@ def get_user_role(user_id):
 
 def logout_user():
     """Logout user by clearing session state"""
+    from components.live_updates import unsubscribe_session
+    unsubscribe_session()
+    
     st.session_state.authenticated = False
     st.session_state.user_id = None
     st.session_state.user_role = None
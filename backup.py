@@ -0,0 +1,517 @@
+import os
+import csv
+import json
+import gzip
+import time
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from database import (
+    ARCHIVED_TABLES, get_connection, execute_write, create_sos_alert, ensure_archive_partitions, maintain_partitions,
+    rebuild_last_locations
+)
+
+BACKUP_ROOT = "backups"
+# gzip level: backups favour throughput over size
+COMPRESS_LEVEL = 1
+# How long a backup waits for transactions in flight when it starts to finish
+SETTLE_TIMEOUT = 10
+SETTLE_POLL = 0.05
+
+# Tables with a SERIAL id: segments copy new ids plus ids updated since the last backup
+ID_TABLES = ("users", "shelters", "roads", "status_reports", "sos_alerts", "messages")
+# Append-only table keyed by message: segments copy deliveries of new messages
+DELIVERY_TABLE = "message_deliveries"
+# Month-partitioned archives (see retention.py): segments copy rows archived since the last backup
+ARCHIVE_TABLES = tuple(f"{table}_archive" for table in ARCHIVED_TABLES)
+# Small tables without an id, copied whole in every segment
+FULL_TABLES = ("message_read_cursors", "archive_daily_counts")
+BACKUP_TABLES = ID_TABLES + (DELIVERY_TABLE,) + ARCHIVE_TABLES + FULL_TABLES
+# change_events and data_versions are deliberately not backed up: restoring
+# them would move change ids and cache versions backwards, so readers holding
+# later ones would miss changes. restore() moves both forward instead.
+
+class HashingFile:
+    """Write-only file wrapper that computes the sha256 and size of what passes through"""
+
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+def _copy_out(cursor, query, path):
+    """COPY a query's result as gzipped CSV; returns (sha256, compressed bytes)"""
+    target = HashingFile(path)
+    with gzip.GzipFile(fileobj=target, mode="wb", compresslevel=COMPRESS_LEVEL) as archive:
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", archive)
+    target.close()
+    return target.sha256.hexdigest(), target.size
+
+def _watermarks(cursor):
+    """Highest id per id table, highest delivered message id and the change feed position"""
+    marks = {}
+    for table in ID_TABLES:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        marks[table] = cursor.fetchone()[0]
+    cursor.execute(f"SELECT COALESCE(MAX(message_id), 0) FROM {DELIVERY_TABLE}")
+    marks[DELIVERY_TABLE] = cursor.fetchone()[0]
+    return marks
+
+def _settled_floors(conn, fallback):
+    """Id bounds at or below which every row is committed, taken just before the backup snapshot.
+
+    A MAX(id) watermark read in a snapshot can miss rows of transactions in
+    flight at the time: they took lower ids but commit later. So this reads
+    the last id each sequence handed out (including to in-flight
+    transactions) and then waits until every transaction that had started
+    by then has finished; a snapshot taken afterwards sees every row at or
+    below those ids. The next segment rescans from these floors rather than
+    from the watermarks, and restore dedupes the overlap by key. If a
+    long-running transaction holds things up past SETTLE_TIMEOUT, fallback
+    (the previous floors) is returned instead.
+    """
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        floors = {}
+        for table in ID_TABLES + ("change_events",):
+            cursor.execute(
+                "SELECT COALESCE(pg_sequence_last_value(pg_get_serial_sequence(%s, 'id')::regclass), 0)", (table,)
+            )
+            floors[table] = cursor.fetchone()[0]
+        # Deliveries are keyed by message and committed after it, so their bound is what is stored
+        cursor.execute(f"SELECT COALESCE(MAX(message_id), 0) FROM {DELIVERY_TABLE}")
+        floors[DELIVERY_TABLE] = cursor.fetchone()[0]
+        cursor.execute("SELECT pg_snapshot_xmax(pg_current_snapshot())::text::bigint")
+        started_before = cursor.fetchone()[0]
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while True:
+            cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+            if cursor.fetchone()[0] >= started_before:
+                return floors
+            if time.monotonic() > deadline:
+                return fallback
+            time.sleep(SETTLE_POLL)
+    finally:
+        conn.autocommit = False
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+def _read_manifest(directory):
+    with open(os.path.join(directory, "manifest.json")) as f:
+        return json.load(f)
+
+def _snapshot_transaction(conn):
+    """Put a psycopg2 connection in a read-only REPEATABLE READ transaction.
+
+    Every COPY then sees the same snapshot while writers carry on (MVCC),
+    so no table locks beyond ACCESS SHARE are taken.
+    """
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    return conn.cursor()
+
+def create_snapshot(backup_root=BACKUP_ROOT, progress=None):
+    """Take an online full backup; returns the backup directory.
+
+    Each table becomes a gzipped CSV with its sha256 in manifest.json, along
+    with the id watermarks later segments continue from.
+    """
+    conn = get_connection()
+    if conn is None:
+        raise RuntimeError("No database connection")
+    started = time.perf_counter()
+    backup_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    directory = os.path.join(backup_root, backup_id, "base")
+    os.makedirs(directory)
+
+    try:
+        # Without settled floors the first segment rescans everything
+        floors = _settled_floors(conn, dict.fromkeys(ID_TABLES + ("change_events", DELIVERY_TABLE), 0))
+        cursor = _snapshot_transaction(conn)
+        cursor.execute("SELECT NOW()")
+        snapshot_time = cursor.fetchone()[0]
+        manifest = {"kind": "base", "created_at": snapshot_time.isoformat(), "files": {}}
+        manifest["watermarks"] = _watermarks(cursor)
+        manifest["floors"] = floors
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_events")
+        manifest["change_id"] = cursor.fetchone()[0]
+        for table in BACKUP_TABLES:
+            file_name = f"{table}.csv.gz"
+            sha256, size = _copy_out(cursor, f"SELECT * FROM {table}", os.path.join(directory, file_name))
+            manifest["files"][table] = {"file": file_name, "sha256": sha256, "bytes": size, "rows": cursor.rowcount}
+            if progress:
+                progress(table, manifest)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    manifest["seconds"] = round(time.perf_counter() - started, 3)
+    _write_manifest(directory, manifest)
+    return os.path.dirname(directory)
+
+def _latest_manifest(backup_dir):
+    """Manifest of the newest segment of a backup, or its base"""
+    segments = list_segments(backup_dir)
+    return _read_manifest(segments[-1] if segments else os.path.join(backup_dir, "base"))
+
+def list_segments(backup_dir):
+    """Segment directories of a backup, oldest first"""
+    segments_dir = os.path.join(backup_dir, "segments")
+    if not os.path.isdir(segments_dir):
+        return []
+    return [os.path.join(segments_dir, name) for name in sorted(os.listdir(segments_dir))
+            if os.path.exists(os.path.join(segments_dir, name, "manifest.json"))]
+
+def create_segment(backup_dir, progress=None):
+    """Append an incremental segment with everything written since the last base or segment.
+
+    A segment holds rows with ids above the previous floors (see
+    _settled_floors), rows whose update was recorded in the change feed,
+    rows archived since, deliveries of new messages and full copies of the
+    small keyless tables. Restoring a base plus its segments up to a given
+    one recovers the database as of that segment. If retention has pruned
+    change events past the previous floor, the segment is refused.
+    """
+    previous = _latest_manifest(backup_dir)
+    conn = get_connection()
+    if conn is None:
+        raise RuntimeError("No database connection")
+    started = time.perf_counter()
+    directory = os.path.join(backup_dir, "segments", f"{len(list_segments(backup_dir)) + 1:05d}")
+
+    since = previous["floors"]
+    try:
+        floors = _settled_floors(conn, since)
+        cursor = _snapshot_transaction(conn)
+        # Updates and archiving are only found through the change feed, so it
+        # must still hold every event after the previous floor
+        cursor.execute("SELECT COALESCE(MIN(id), %s) FROM change_events", (floors["change_events"] + 1,))
+        if cursor.fetchone()[0] > since["change_events"] + 1:
+            raise RuntimeError(
+                "Change events since the previous backup step were pruned; take a new snapshot instead"
+            )
+        cursor.execute("SELECT NOW()")
+        manifest = {"kind": "segment", "created_at": cursor.fetchone()[0].isoformat(), "files": {}}
+        manifest["watermarks"] = _watermarks(cursor)
+        manifest["floors"] = floors
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_events")
+        manifest["change_id"] = cursor.fetchone()[0]
+
+        cursor.execute(
+            "SELECT table_name, ARRAY_AGG(DISTINCT row_id) FROM change_events "
+            "WHERE id > %s AND id <= %s AND operation = 'update' AND row_id IS NOT NULL GROUP BY table_name",
+            (since["change_events"], manifest["change_id"])
+        )
+        updated = dict(cursor.fetchall())
+
+        queries = {}
+        for table in ID_TABLES:
+            queries[table] = cursor.mogrify(
+                f"SELECT * FROM {table} WHERE (id > %s AND id <= %s) OR id = ANY(%s)",
+                (since[table], manifest["watermarks"][table], updated.get(table, []))
+            ).decode()
+        queries[DELIVERY_TABLE] = cursor.mogrify(
+            f"SELECT * FROM {DELIVERY_TABLE} WHERE message_id > %s AND message_id <= %s",
+            (since[DELIVERY_TABLE], manifest["watermarks"][DELIVERY_TABLE])
+        ).decode()
+        for table in ARCHIVE_TABLES:
+            queries[table] = cursor.mogrify(
+                f"SELECT * FROM {table} WHERE archive_event_id > %s AND archive_event_id <= %s",
+                (since["change_events"], manifest["change_id"])
+            ).decode()
+        for table in FULL_TABLES:
+            queries[table] = f"SELECT * FROM {table}"
+
+        os.makedirs(directory)
+        for table, query in queries.items():
+            file_name = f"{table}.csv.gz"
+            sha256, size = _copy_out(cursor, query, os.path.join(directory, file_name))
+            manifest["files"][table] = {"file": file_name, "sha256": sha256, "bytes": size, "rows": cursor.rowcount}
+            if progress:
+                progress(table, manifest)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    manifest["seconds"] = round(time.perf_counter() - started, 3)
+    _write_manifest(directory, manifest)
+    return directory
+
+def verify(directory):
+    """Check every file of a base or segment against its manifest checksum; returns the bad files"""
+    manifest = _read_manifest(directory)
+    bad = []
+    for entry in manifest["files"].values():
+        sha256 = hashlib.sha256()
+        with open(os.path.join(directory, entry["file"]), "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        if sha256.hexdigest() != entry["sha256"]:
+            bad.append(entry["file"])
+    return bad
+
+def restore(backup_dir, until=None):
+    """Replace the database contents with a backup as of a point in time.
+
+    Loads the base snapshot, then applies segments in order while their
+    created_at is at or before until (an ISO timestamp; all segments if
+    None). Every file is verified first. This overwrites all backed-up
+    tables in one transaction.
+    """
+    base_dir = os.path.join(backup_dir, "base")
+    base = _read_manifest(base_dir)
+    steps = [base_dir] + [segment for segment in list_segments(backup_dir)
+                          if until is None or _read_manifest(segment)["created_at"] <= until]
+    for step in steps:
+        bad = verify(step)
+        if bad:
+            raise RuntimeError(f"Checksum mismatch in {step}: {', '.join(bad)}")
+
+    conn = get_connection()
+    if conn is None:
+        raise RuntimeError("No database connection")
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"TRUNCATE {', '.join(BACKUP_TABLES)} CASCADE")
+        for step in steps:
+            manifest = _read_manifest(step)
+            for table in BACKUP_TABLES:
+                # Backups taken before a table existed have no file for it
+                if table not in manifest["files"]:
+                    continue
+                path = os.path.join(step, manifest["files"][table]["file"])
+                if table in ARCHIVE_TABLES:
+                    _archive_in(cursor, table, path)
+                elif step == base_dir:
+                    _copy_in(cursor, table, path)
+                elif table in FULL_TABLES:
+                    cursor.execute(f"DELETE FROM {table}")
+                    _copy_in(cursor, table, path)
+                else:
+                    _merge_in(cursor, table, path)
+
+        # Rows archived after an earlier segment copied them are live in that segment only
+        for table in ARCHIVED_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table}_archive)")
+
+        # Point SERIAL sequences past the restored ids
+        for table in ID_TABLES:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 0) + 1, false) FROM {table}"
+            )
+        _advance_after_restore(cursor, _read_manifest(steps[-1])["change_id"])
+        # Derived from the restored reports and alerts rather than backed up
+        rebuild_last_locations(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    # Restored rows for days without a partition landed in the default ones
+    maintain_partitions()
+    return steps[-1]
+
+def _advance_after_restore(cursor, change_id):
+    """Move the change feed and data versions forward past everything seen before the restore.
+
+    Change ids continue above the live feed, the backup's own position and
+    the archive events restored rows refer to; a 'restore' event per table
+    marks the reload. Every data version is bumped past its pre-restore
+    value so no cached entry matches.
+    """
+    archived = ", ".join(f"(SELECT MAX(archive_event_id) FROM {table})" for table in ARCHIVE_TABLES)
+    cursor.execute(
+        "SELECT setval(pg_get_serial_sequence('change_events', 'id'), GREATEST("
+        "pg_sequence_last_value(pg_get_serial_sequence('change_events', 'id')::regclass), "
+        f"(SELECT MAX(id) FROM change_events), %s, {archived}, 1))",
+        (change_id,)
+    )
+    cursor.execute("UPDATE data_versions SET version = version + 1")
+    # Tables never written before had no row (version 0); give them one
+    cursor.execute(
+        "INSERT INTO data_versions (table_name, version) VALUES "
+        + ", ".join(["(%s, 1)"] * len(BACKUP_TABLES))
+        + " ON CONFLICT (table_name) DO NOTHING",
+        BACKUP_TABLES
+    )
+    cursor.execute(
+        "INSERT INTO change_events (table_name, operation) VALUES " + ", ".join(["(%s, 'restore')"] * len(BACKUP_TABLES)),
+        BACKUP_TABLES
+    )
+
+def _copy_in(cursor, table, path):
+    """COPY a gzipped CSV into a table, matching columns by the file's header"""
+    with gzip.open(path, "rt", newline="") as f:
+        columns = next(csv.reader([f.readline()]))
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", f)
+
+def _archive_in(cursor, table, path):
+    """Load archive rows, creating the monthly partitions they fall in first.
+
+    Archives have no primary key, so rows a segment copied again (see
+    _settled_floors) are skipped by id and archive event.
+    """
+    staging = f"restore_{table}"
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table}) ON COMMIT DROP")
+    _copy_in(cursor, staging, path)
+    cursor.execute(f"SELECT DISTINCT date_trunc('month', created_at) FROM {staging}")
+    ensure_archive_partitions(cursor, table[:-len("_archive")], [row[0] for row in cursor.fetchall()])
+    cursor.execute(
+        f"INSERT INTO {table} SELECT * FROM {staging} s WHERE NOT EXISTS "
+        f"(SELECT 1 FROM {table} a WHERE a.id = s.id AND a.archive_event_id IS NOT DISTINCT FROM s.archive_event_id)"
+    )
+    cursor.execute(f"DROP TABLE {staging}")
+
+def _merge_in(cursor, table, path):
+    """Load a segment file, replacing rows with the same key"""
+    staging = f"restore_{table}"
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table}) ON COMMIT DROP")
+    _copy_in(cursor, staging, path)
+    if table == DELIVERY_TABLE:
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {staging} ON CONFLICT DO NOTHING")
+    else:
+        cursor.execute(
+            "SELECT a.attname FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = %s::regclass AND i.indisprimary",
+            (table,)
+        )
+        key = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT * FROM {staging} LIMIT 0")
+        updates = ", ".join(f"{column[0]} = EXCLUDED.{column[0]}" for column in cursor.description if column[0] not in key)
+        # Upsert rather than delete + insert so rows referenced by foreign keys stay in place
+        cursor.execute(f"INSERT INTO {table} SELECT * FROM {staging} ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}")
+    cursor.execute(f"DROP TABLE {staging}")
+
+def list_backups(backup_root=BACKUP_ROOT):
+    """Backup directories, newest first"""
+    if not os.path.isdir(backup_root):
+        return []
+    return [os.path.join(backup_root, name) for name in sorted(os.listdir(backup_root), reverse=True)
+            if os.path.exists(os.path.join(backup_root, name, "base", "manifest.json"))]
+
+def backup_size(directory):
+    """Total bytes and rows recorded in a base or segment manifest"""
+    files = _read_manifest(directory)["files"].values()
+    return sum(entry["bytes"] for entry in files), sum(entry.get("rows", 0) for entry in files)
+
+def benchmark(user_id, backup_root=BACKUP_ROOT, baseline_seconds=5.0):
+    """Measure snapshot throughput and SOS insert latency with and without a backup running.
+
+    Inserts real SOS alerts as user_id; run it against a staging database.
+    """
+    alert_ids = []
+
+    def insert_latencies(stop, latencies):
+        while not stop.is_set():
+            started = time.perf_counter()
+            alert_ids.append(create_sos_alert(user_id, "Backup benchmark", 17.385, 78.4867, "BACKUP BENCHMARK - ignore"))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    def percentiles(latencies):
+        ordered = sorted(latencies)
+        if not ordered:
+            return {}
+        return {
+            "inserts": len(ordered),
+            "p50_ms": round(ordered[len(ordered) // 2], 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+        }
+
+    idle = []
+    stop = threading.Event()
+    writer = threading.Thread(target=insert_latencies, args=(stop, idle))
+    writer.start()
+    time.sleep(baseline_seconds)
+    stop.set()
+    writer.join()
+
+    during = []
+    stop = threading.Event()
+    writer = threading.Thread(target=insert_latencies, args=(stop, during))
+    writer.start()
+    backup_dir = create_snapshot(backup_root)
+    stop.set()
+    writer.join()
+
+    manifest = _read_manifest(os.path.join(backup_dir, "base"))
+    size, rows = backup_size(os.path.join(backup_dir, "base"))
+    # Through execute_write, so later segments and cached alert lists see the updates
+    for alert_id in filter(None, alert_ids):
+        execute_write(
+            "UPDATE sos_alerts SET status = 'resolved' WHERE id = %s",
+            (alert_id,),
+            table_name='sos_alerts',
+            operation='update',
+            row_id=alert_id
+        )
+    return {
+        "backup": backup_dir,
+        "seconds": manifest["seconds"],
+        "rows": rows,
+        "compressed_mb": round(size / 1e6, 2),
+        "rows_per_sec": round(rows / manifest["seconds"]) if manifest["seconds"] else 0,
+        "insert_latency_idle": percentiles(idle),
+        "insert_latency_during_backup": percentiles(during),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online backup and point-in-time restore")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot", help="take a full online backup")
+    segment_parser = commands.add_parser("segment", help="append an incremental segment to a backup")
+    segment_parser.add_argument("backup_dir", nargs="?", help="defaults to the newest backup")
+    verify_parser = commands.add_parser("verify", help="check a backup's checksums")
+    verify_parser.add_argument("backup_dir")
+    restore_parser = commands.add_parser("restore", help="overwrite the database from a backup")
+    restore_parser.add_argument("backup_dir")
+    restore_parser.add_argument("--until", help="ISO timestamp; apply only segments taken at or before it")
+    restore_parser.add_argument("--yes", action="store_true", help="confirm overwriting the database")
+    bench_parser = commands.add_parser("bench", help="measure backup throughput and insert latency impact")
+    bench_parser.add_argument("--user-id", type=int, required=True, help="user to file benchmark SOS alerts as")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        backup_dir = create_snapshot()
+        size, rows = backup_size(os.path.join(backup_dir, "base"))
+        print(f"{backup_dir}: {rows} rows, {size / 1e6:.1f} MB")
+    elif args.command == "segment":
+        backups = list_backups()
+        backup_dir = args.backup_dir or (backups[0] if backups else None)
+        if backup_dir is None:
+            raise SystemExit("No backup to extend; take a snapshot first")
+        segment = create_segment(backup_dir)
+        size, rows = backup_size(segment)
+        print(f"{segment}: {rows} rows, {size / 1e6:.1f} MB")
+    elif args.command == "verify":
+        bad = []
+        for step in [os.path.join(args.backup_dir, "base")] + list_segments(args.backup_dir):
+            bad += [os.path.join(step, name) for name in verify(step)]
+        print("OK" if not bad else "Checksum mismatch: " + ", ".join(bad))
+        raise SystemExit(1 if bad else 0)
+    elif args.command == "restore":
+        if not args.yes:
+            raise SystemExit("Restore overwrites the database; pass --yes to confirm")
+        print(f"Restored up to {restore(args.backup_dir, args.until)}")
+    else:
+        print(json.dumps(benchmark(args.user_id), indent=2))
@@ -0,0 +1,260 @@
+import io
+import os
+import sys
+import json
+import time
+import inspect
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+import numpy as np
+
+# Status reports per scale; the other tables scale with them (see scenario_counts)
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+BENCH_SEED = 0
+# Photos are capped so large scales stay within memory; their bytes dominate row size
+BENCH_MAX_PHOTOS = 2000
+# Timed runs per case after one untimed warm-up
+REPEATS = 5
+RENDER_REPEATS = 3
+# A case whose warm-up takes longer than this is timed once, from the warm-up
+SLOW_CASE_SECONDS = 30
+# Median slowdown over the baseline that counts as a regression, and the
+# absolute change below which differences are treated as noise
+REGRESSION_THRESHOLD = 0.2
+RENDER_REGRESSION_THRESHOLD = 0.35
+NOISE_FLOOR_MS = 2.0
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+# Role each page is rendered as
+PAGE_ROLES = {
+    "Status Report": "citizen",
+    "Emergency Map": "citizen",
+    "Shelters": "rescue_team",
+    "SOS Alerts": "rescue_team",
+    "Messages": "citizen",
+    "Emergency Contacts": "citizen",
+    "Government Dashboard": "government",
+}
+PHOTO_UPLOAD_SIZE = (4000, 3000)
+
+def clear_read_caches():
+    """Forget cached query results and figures so the next read goes to the database"""
+    import database
+    from cache import get_cache
+    get_cache().backend.clear()
+    database._unread_cache.clear()
+
+def time_case(function, repeats=REPEATS, setup=None):
+    """Samples in ms of repeated calls after a warm-up, and the warm-up's result"""
+    if setup:
+        setup()
+    started = time.perf_counter()
+    result = function()
+    warmup = time.perf_counter() - started
+    if warmup > SLOW_CASE_SECONDS:
+        return [warmup * 1000], result
+    samples = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, result
+
+def summarize(samples, result=None):
+    entry = {
+        "median_ms": round(float(np.median(samples)), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "samples_ms": [round(sample, 3) for sample in samples],
+    }
+    if isinstance(result, list):
+        entry["rows"] = len(result)
+    return entry
+
+def busiest_users():
+    """Per role, the user with the most messages addressed to them (their inbox is the heaviest)"""
+    from database import execute_query
+    rows = execute_query("""
+        SELECT DISTINCT ON (u.role) u.role, u.id FROM users u
+        LEFT JOIN messages m ON m.recipient_id = u.id
+        GROUP BY u.role, u.id ORDER BY u.role, COUNT(m.id) DESC, u.id
+    """, fetch=True)
+    return dict(rows)
+
+def dashboard_aggregations():
+    """Every data-building function of the government dashboard: (name, function)"""
+    import components.government_dashboard as dashboard
+    return [
+        (name, function) for name, function in inspect.getmembers(dashboard, inspect.isfunction)
+        if function.__module__ == dashboard.__name__ and (name.endswith("_figure") or name.startswith("collect_"))
+    ]
+
+def query_cases(users):
+    """Database read cases as (name, function); each is named after the function it times.
+
+    The inbox case times get_inbox for the citizen with the most messages.
+    """
+    from database import get_active_sos_alerts, get_status_reports, get_inbox
+    cases = [
+        ("get_active_sos_alerts", get_active_sos_alerts),
+        ("get_status_reports", get_status_reports),
+        ("get_inbox", lambda: get_inbox(users["citizen"])),
+    ]
+    cases += [(f"dashboard:{name}", function) for name, function in dashboard_aggregations()]
+    return cases
+
+def _render_script(page, role, user_id):
+    import streamlit as st
+    st.session_state.authenticated = True
+    st.session_state.user_id = user_id
+    st.session_state.user_role = role
+    import app
+    app.render_page(page)
+
+def render_page(page, role, user_id):
+    """Render a page headlessly, raising if it failed"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_function(_render_script, kwargs={"page": page, "role": role, "user_id": user_id},
+                               default_timeout=SLOW_CASE_SECONDS * 10)
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{page} render failed: {at.exception[0].value}")
+    return at
+
+def photo_upload():
+    """A camera-sized JPEG like the ones citizens upload"""
+    from PIL import Image
+    rng = np.random.default_rng(BENCH_SEED)
+    width, height = PHOTO_UPLOAD_SIZE
+    pixels = np.linspace(60, 200, height)[:, None, None] + rng.normal(0, 10, size=(height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def run_scale(scale, reports, results, repeats, progress):
+    from scenario_generator import PHOTO_SHARE, generate_scenario
+    from benchmarks.embedded_db import reset_database, analyze
+
+    progress(f"[{scale}] loading scenario with {reports:,} status reports")
+    reset_database()
+    loaded, seconds = generate_scenario(reports, seed=BENCH_SEED, photo_share=min(PHOTO_SHARE, BENCH_MAX_PHOTOS / reports))
+    analyze()
+    results[f"{scale}/load"] = {"seconds": seconds, "rows": sum(loaded.values())}
+    users = busiest_users()
+
+    for name, function in query_cases(users):
+        progress(f"[{scale}] {name}")
+        # Cold: the read cache is cleared before every call, so the database does the work
+        samples, result = time_case(function, repeats, setup=clear_read_caches)
+        results[f"{scale}/{name}"] = summarize(samples, result)
+
+    import app
+    for page in app.PAGES:
+        role = PAGE_ROLES.get(page, "citizen")
+        for variant, setup in (("cold", clear_read_caches), ("warm", None)):
+            progress(f"[{scale}] render {page} ({role}, {variant})")
+            samples, _ = time_case(lambda: render_page(page, role, users[role]), min(repeats, RENDER_REPEATS), setup)
+            results[f"{scale}/render:{page}:{variant}"] = summarize(samples)
+
+def run_suite(scales, dsn=None, pgdata=None, repeats=REPEATS, progress=print):
+    """Run every case at each scale; returns the results document"""
+    from streamlit.logger import set_log_level
+    from benchmarks.embedded_db import start_embedded, use_database
+    # Calling page code outside a script run warns on every Streamlit call
+    set_log_level("error")
+    use_database(dsn or start_embedded(pgdata))
+
+    from utils import process_uploaded_image
+    results = {}
+    upload = photo_upload()
+    progress("process_uploaded_image")
+    samples, _ = time_case(lambda: process_uploaded_image(io.BytesIO(upload)), repeats)
+    results["process_uploaded_image"] = summarize(samples)
+
+    for scale in scales:
+        run_scale(scale, SCALES[scale], results, repeats, progress)
+    return {"meta": run_metadata(scales, repeats), "results": results}
+
+def run_metadata(scales, repeats):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=BENCH_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": f"{platform.machine()} {os.cpu_count()} CPUs",
+        "seed": BENCH_SEED,
+        "scales": list(scales),
+        "repeats": repeats,
+    }
+
+def compare(current, baseline):
+    """Per shared timed case: (case, baseline ms, current ms, change, regressed)"""
+    rows = []
+    for case, entry in sorted(current["results"].items()):
+        base = baseline["results"].get(case)
+        if not base or "median_ms" not in entry or "median_ms" not in base:
+            continue
+        before, after = base["median_ms"], entry["median_ms"]
+        change = (after - before) / before if before else 0.0
+        threshold = RENDER_REGRESSION_THRESHOLD if "/render:" in case else REGRESSION_THRESHOLD
+        regressed = change > threshold and after - before > NOISE_FLOOR_MS
+        rows.append((case, before, after, change, regressed))
+    return rows
+
+def print_comparison(rows):
+    for case, before, after, change, regressed in rows:
+        print(f"{case:<70} {before:>10.1f} {after:>10.1f} ms {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    regressions = sum(row[4] for row in rows)
+    print(f"{regressions} regressions in {len(rows)} compared cases")
+    return regressions
+
+def save(document, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark database queries, dashboard aggregations and page renders")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the suite and compare with the baseline")
+    run_parser.add_argument("--scale", action="append", choices=list(SCALES), help="limit to these scales (repeatable)")
+    run_parser.add_argument("--repeats", type=int, default=REPEATS)
+    run_parser.add_argument("--dsn", help="benchmark this (disposable!) database instead of an embedded one")
+    run_parser.add_argument("--pgdata", help="data directory for the embedded database")
+    run_parser.add_argument("--out", help="results file (default: benchmarks/results/<time>.json)")
+    run_parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    run_parser.add_argument("--save-baseline", action="store_true", help="also write the results as the new baseline")
+    compare_parser = subparsers.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("baseline", nargs="?", default=DEFAULT_BASELINE)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        sys.exit(1 if print_comparison(compare(load(args.current), load(args.baseline))) else 0)
+
+    document = run_suite(args.scale or list(SCALES), args.dsn, args.pgdata, args.repeats,
+                         lambda text: print(text, flush=True))
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    save(document, out)
+    print(f"Wrote {out}")
+    if args.save_baseline:
+        save(document, args.baseline)
+        print(f"Saved baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        sys.exit(1 if print_comparison(compare(document, load(args.baseline))) else 0)
+    else:
+        print(f"No baseline at {args.baseline}; rerun with --save-baseline to create one")
@@ -0,0 +1,183 @@
+import io
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from database import PARTITIONED_TABLES, copy_rows, create_daily_partitions
+
+# Rows parsed, validated and COPYed per transaction
+IMPORT_CHUNK_SIZE = 50000
+
+# Importable tables: required and optional columns, and allowed status values
+IMPORT_TABLES = {
+    "users": {
+        "required": ("username", "password_hash", "role"),
+        "optional": ("created_at",),
+        "choices": {"role": ("citizen", "rescue_team", "government")},
+    },
+    "shelters": {
+        "required": ("name", "address", "latitude", "longitude", "capacity"),
+        "optional": ("current_occupancy", "status", "contact_number", "facilities", "updated_at"),
+        "choices": {"status": ("available", "limited", "full")},
+    },
+    "roads": {
+        "required": ("name", "status"),
+        "optional": ("description", "latitude", "longitude", "updated_at"),
+        "choices": {"status": ("open", "limited", "blocked")},
+    },
+    "status_reports": {
+        "required": ("user_id", "status"),
+        "optional": ("location", "latitude", "longitude", "description", "photo_path", "created_at"),
+        "choices": {"status": ("safe", "help", "trapped")},
+    },
+    "sos_alerts": {
+        "required": ("user_id", "message"),
+        "optional": ("location", "latitude", "longitude", "status", "created_at"),
+        "choices": {"status": ("active", "resolved")},
+    },
+    "messages": {
+        "required": ("sender_id", "message"),
+        "optional": ("recipient_id", "alert_id", "message_type", "created_at"),
+        "choices": {"message_type": ("sos_response", "general", "alert")},
+    },
+}
+
+# Columns loaded as integers; JSON Lines input can turn these into floats
+INTEGER_COLUMNS = {"user_id", "sender_id", "recipient_id", "alert_id", "capacity", "current_occupancy"}
+# Columns loaded as timestamps: ISO 8601, offsets converted to UTC
+TIMESTAMP_COLUMNS = {"created_at", "updated_at"}
+
+def read_chunks(source, file_format=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream a CSV or JSON Lines file (path or file object) as DataFrame chunks"""
+    if file_format is None:
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+        file_format = "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    if file_format == "jsonl":
+        return pd.read_json(source, lines=True, chunksize=chunk_size, dtype=False)
+    return pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""])
+
+def validate_chunk(table, df):
+    """Split a chunk into (valid rows, rejected rows) using vectorized checks.
+
+    Checks that required columns are present and non-empty, coordinates are
+    numeric and in range, ids/counts are integers and timestamps parse
+    (when given), and status-like columns hold allowed values.
+    """
+    spec = IMPORT_TABLES[table]
+    missing = [column for column in spec["required"] if column not in df.columns]
+    if missing:
+        raise ValueError(f"{table} import is missing required columns: {', '.join(missing)}")
+
+    # Rejected rows are returned as read, not with the values that failed to convert
+    source = df
+    valid = np.ones(len(df), dtype=bool)
+    for column in spec["required"]:
+        valid &= df[column].notna().to_numpy()
+
+    if "latitude" in df.columns and "longitude" in df.columns:
+        lat = pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=float)
+        lon = pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=float)
+        given = df["latitude"].notna().to_numpy() | df["longitude"].notna().to_numpy()
+        in_range = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        valid &= ~given | in_range
+        df = df.assign(latitude=lat, longitude=lon)
+
+    integers = {}
+    for column in INTEGER_COLUMNS.intersection(df.columns):
+        values = pd.to_numeric(df[column], errors="coerce")
+        given = df[column].notna().to_numpy()
+        valid &= ~given | (values.notna() & (values % 1 == 0)).to_numpy()
+        integers[column] = values.where(values % 1 == 0).astype("Int64")
+    df = df.assign(**integers)
+
+    timestamps = {}
+    for column in TIMESTAMP_COLUMNS.intersection(df.columns):
+        values = pd.to_datetime(df[column], errors="coerce", format="ISO8601", utc=True).dt.tz_localize(None)
+        given = df[column].notna().to_numpy()
+        valid &= ~given | values.notna().to_numpy()
+        timestamps[column] = values
+    df = df.assign(**timestamps)
+
+    for column, allowed in spec["choices"].items():
+        if column in df.columns:
+            values = df[column]
+            valid &= (values.isna() | values.isin(allowed)).to_numpy()
+
+    return df[valid], source[~valid]
+
+def chunk_days(df):
+    """Distinct dates of validated rows' created_at values, for creating daily partitions"""
+    if "created_at" not in df.columns:
+        return []
+    return list(df["created_at"].dropna().dt.date.unique())
+
+def load_chunk(table, chunk):
+    """Validate a DataFrame chunk and COPY its valid rows in one transaction.
+
+    Returns (rows loaded, rejected rows); if the load fails the whole chunk
+    is returned as rejected.
+    """
+    spec = IMPORT_TABLES[table]
+    valid, rejected = validate_chunk(table, chunk)
+    if not len(valid):
+        return 0, rejected
+    columns = [column for column in spec["required"] + spec["optional"] if column in valid.columns]
+    if table in PARTITIONED_TABLES:
+        # Historical rows get their own daily partitions instead of the default one
+        create_daily_partitions(table, chunk_days(valid))
+    buffer = io.StringIO()
+    valid[columns].to_csv(buffer, header=False, index=False, na_rep="")
+    loaded = copy_rows(table, columns, buffer.getvalue())
+    if loaded is None:
+        # The whole chunk's transaction was rolled back
+        return 0, chunk
+    return loaded, rejected
+
+def import_file(table, source, file_format=None, chunk_size=IMPORT_CHUNK_SIZE, rejects_path=None, progress=None):
+    """Stream a file into a table in chunks, returning counts and rows/second.
+
+    Rejected rows are appended to rejects_path as CSV when given. progress,
+    if given, is called after each chunk with the running result dict.
+    """
+    if table not in IMPORT_TABLES:
+        raise ValueError(f"Unknown import table: {table}")
+    result = {"table": table, "rows_read": 0, "rows_loaded": 0, "rows_rejected": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    for chunk in read_chunks(source, file_format, chunk_size):
+        loaded, rejected = load_chunk(table, chunk)
+        result["rows_loaded"] += loaded
+
+        if len(rejected) and rejects_path:
+            rejected.to_csv(rejects_path, mode="a", index=False,
+                            header=not os.path.exists(rejects_path))
+
+        result["rows_read"] += len(chunk)
+        result["rows_rejected"] += len(rejected)
+        result["chunks"] += 1
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["rows_per_sec"] = round(result["rows_read"] / result["seconds"]) if result["seconds"] else 0
+        if progress:
+            progress(result)
+
+    result.setdefault("seconds", 0)
+    result.setdefault("rows_per_sec", 0)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import CSV or JSON Lines data into a table")
+    parser.add_argument("table", choices=sorted(IMPORT_TABLES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--rejects", help="append rejected rows to this CSV file")
+    args = parser.parse_args()
+
+    def report(result):
+        print(f"{result['rows_read']:>10} rows read, {result['rows_loaded']} loaded, "
+              f"{result['rows_rejected']} rejected ({result['rows_per_sec']} rows/s)", flush=True)
+
+    final = import_file(args.table, args.path, args.format, args.chunk_size, args.rejects, report)
+    print(f"Done: {final['rows_loaded']} rows loaded into {final['table']} in {final['seconds']}s "
+          f"({final['rows_per_sec']} rows/s), {final['rows_rejected']} rejected")
@@ -0,0 +1,202 @@
+import os
+import json
+import base64
+import hashlib
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from datetime import datetime, date
+from decimal import Decimal
+
+# Entries kept by the in-process LRU backend
+LRU_CACHE_SIZE = 256
+# Set to a directory (ideally on tmpfs, e.g. /dev/shm/floodaid-cache) to share
+# cached rows and figures between Streamlit server processes on one host
+CACHE_DIR_ENV = "FLOODAID_CACHE_DIR"
+
+class CacheBackend(ABC):
+    """Interface for cache storage: string keys to bytes values"""
+
+    @abstractmethod
+    def get(self, key):
+        """Return the stored bytes, or None on a miss"""
+
+    @abstractmethod
+    def set(self, key, value):
+        """Store bytes under key, replacing any previous value"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Remove key if present"""
+
+    @abstractmethod
+    def clear(self):
+        """Remove every entry"""
+
+class LRUCacheBackend(CacheBackend):
+    """Per-process cache evicting the least recently used entry"""
+
+    def __init__(self, max_entries=LRU_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SharedFileCacheBackend(CacheBackend):
+    """Cache shared by every process on a host, one file per key.
+
+    Meant for a tmpfs directory such as /dev/shm so reads and writes stay in
+    memory. Writes go to a temporary file that is renamed into place, so
+    readers never see a partial entry and no locking is needed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+def _encode(value):
+    """json.dumps default= hook for values found in database rows"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    if isinstance(value, (bytes, memoryview)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode()}
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+def _decode(obj):
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+        if "__decimal__" in obj:
+            return Decimal(obj["__decimal__"])
+        if "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+    return obj
+
+def dumps_rows(rows):
+    """Serialize query result rows (tuples) to bytes"""
+    return json.dumps([list(row) for row in rows], default=_encode, separators=(",", ":")).encode()
+
+def loads_rows(data):
+    """Deserialize rows written by dumps_rows back into a list of tuples"""
+    return [tuple(row) for row in json.loads(data, object_hook=_decode)]
+
+class VersionedCache:
+    """Values stored with the data versions they were built from.
+
+    An entry is returned only while the versions passed to get() equal the
+    ones it was stored with, so a write that bumps a table's version
+    invalidates every entry built from that table without any messaging
+    between processes; the stale entry is simply overwritten on the next set().
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # (key prefix such as "figure", or "query", "hit"/"miss") -> lookups
+        self._lookups = Counter()
+        # Sessions look entries up from many threads; += on a counter is not atomic
+        self._lock = threading.Lock()
+
+    def get(self, key, versions):
+        kind = key.split(":", 1)[0] if ":" in key else "query"
+        data = self.backend.get(key)
+        if data is not None:
+            header, _, payload = data.partition(b"\n")
+            if json.loads(header) == list(versions):
+                self._count(kind, "hit")
+                return payload
+        self._count(kind, "miss")
+        return None
+
+    def _count(self, kind, outcome):
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._lookups[kind, outcome] += 1
+
+    def lookup_counts(self):
+        """{(cache kind, "hit" or "miss"): lookups} in this process"""
+        with self._lock:
+            return dict(self._lookups)
+
+    def set(self, key, versions, payload):
+        self.backend.set(key, json.dumps(list(versions)).encode() + b"\n" + payload)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Get this process's versioned cache, shared across processes if configured"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            cache_dir = os.environ.get(CACHE_DIR_ENV)
+            backend = SharedFileCacheBackend(cache_dir) if cache_dir else LRUCacheBackend()
+            _cache = VersionedCache(backend)
+        return _cache
@@ -0,0 +1,89 @@
+import hashlib
+import streamlit as st
+import pandas as pd
+
+# Fixed grid height: st.dataframe only renders the rows scrolled into view
+DEFAULT_TABLE_HEIGHT = 400
+
+def render_table(rows, columns, key, filter_columns=None, sort_options=None, column_config=None,
+                 height=DEFAULT_TABLE_HEIGHT, selectable=False, id_column=None, empty_message="No rows to display"):
+    """Render a list as a single dataframe element with filtering and sorting.
+
+    rows are tuples (or dicts) matching columns. The whole list is sent as
+    one columnar payload instead of several elements per row; the grid
+    virtualizes scrolling and also supports sorting by clicking a header.
+    sort_options maps a label to (column, ascending) for a server-side sort.
+    With selectable=True the selected row (a pandas Series) is returned,
+    otherwise None; see selected_row for how the selection is kept.
+    """
+    if selectable and id_column is None:
+        raise ValueError("selectable tables need an id_column")
+    df = pd.DataFrame(list(rows), columns=columns)
+
+    if filter_columns or sort_options:
+        col_filter, col_sort = st.columns([3, 2])
+
+        if filter_columns:
+            with col_filter:
+                query = st.text_input("🔍 Filter", key=f"{key}_filter", placeholder="Type to filter rows...")
+            if query and not df.empty:
+                mask = pd.Series(False, index=df.index)
+                for column in filter_columns:
+                    mask |= df[column].astype(str).str.contains(query, case=False, regex=False, na=False)
+                df = df[mask]
+
+        if sort_options:
+            with col_sort:
+                sort_label = st.selectbox("Sort by", list(sort_options.keys()), key=f"{key}_sort")
+            sort_column, ascending = sort_options[sort_label]
+            df = df.sort_values(sort_column, ascending=ascending, kind="stable")
+
+    if df.empty:
+        st.info(empty_message)
+        return None
+
+    df = df.reset_index(drop=True)
+    st.caption(f"{len(df)} row(s)")
+
+    if not selectable:
+        st.dataframe(df, height=min(height, 38 + 35 * len(df)), hide_index=True,
+                     column_config=column_config, use_container_width=True)
+        return None
+
+    return selected_row(df, key, id_column, height, column_config)
+
+def selected_row(df, key, id_column, height, column_config):
+    """Render a single-row selectable grid and return the selected row, tracked by its id.
+
+    The grid reports its selection as a row position, and Streamlit keeps
+    that position across reruns even when the rows change underneath it.
+    So the widget key includes the displayed ids in order: any change to
+    the rows, the filter or the sort starts a fresh grid with no selection,
+    while the selected id, kept in st.session_state, still picks its row
+    if it is shown.
+    """
+    ids = df[id_column].tolist()
+    grid_key = _grid_key(key, ids)
+    state_key = f"{key}_selected"
+    event = st.dataframe(df, height=min(height, 38 + 35 * len(df)), hide_index=True,
+                         column_config=column_config, use_container_width=True,
+                         on_select="rerun", selection_mode="single-row", key=grid_key)
+    positions = event.selection.rows
+    previous = st.session_state.get(state_key)
+    if positions:
+        selected_id = ids[positions[0]]
+    elif previous is not None and previous[0] != grid_key:
+        # A fresh grid: keep following the row selected in the previous one
+        selected_id = previous[1]
+    else:
+        # Nothing selected yet, or the row was deselected in this grid
+        selected_id = None
+    if selected_id not in ids:
+        st.session_state.pop(state_key, None)
+        return None
+    st.session_state[state_key] = (grid_key, selected_id)
+    return df.iloc[ids.index(selected_id)]
+
+def _grid_key(key, ids):
+    """Widget key of the selectable grid showing ids in this order"""
+    return f"{key}_grid_{hashlib.sha1(repr(ids).encode()).hexdigest()[:12]}"
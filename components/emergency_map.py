@@ -3,14 +3,19 @@ import folium
 from streamlit_folium import st_folium
 from database import get_shelters, get_roads, get_status_reports, get_active_sos_alerts
 from utils import get_hyderabad_coordinates, get_status_color
+from components.live_updates import live_refresh
+from heatmap_tiles import update_heatmap, get_heatmap_tile_url, incident_points, HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM
 
 def emergency_map_page():
     """Emergency map page showing flood conditions, shelters, and incidents"""
     st.header("🗺️ Emergency Flood Map")
     st.write("Real-time view of flood conditions, shelters, and emergency incidents across Hyderabad")
     
+    # Rerun only when the change feed shows new map data
+    live_refresh(("sos_alerts", "status_reports", "shelters", "roads"), "emergency_map")
+    
     # Map controls
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         show_shelters = st.checkbox("🏠 Show Shelters", value=True)
@@ -18,6 +23,9 @@ def emergency_map_page():
         show_roads = st.checkbox("🛣️ Show Road Status", value=True)
     with col3:
         show_incidents = st.checkbox("🚨 Show Incidents", value=True)
+    with col4:
+        show_heatmap = st.checkbox("🔥 Density Heatmap", value=True,
+                                   help="Show incidents as a density layer instead of individual markers")
     
     # Get data
     shelters = get_shelters() if show_shelters else []
@@ -121,10 +129,24 @@ def emergency_map_page():
                     icon=folium.Icon(color=color, icon=icon, prefix='fa')
                 ).add_to(m)
     
+    # Incident density layer rendered server-side into cached PNG tiles
+    if show_incidents and show_heatmap:
+        heatmap_version = update_heatmap(incident_points(sos_alerts, status_reports))
+        folium.TileLayer(
+            tiles=get_heatmap_tile_url(heatmap_version),
+            attr="FloodRescueNet incidents",
+            name="Incident density",
+            overlay=True,
+            control=False,
+            opacity=0.8,
+            min_native_zoom=HEATMAP_MIN_ZOOM,
+            max_native_zoom=HEATMAP_MAX_ZOOM
+        ).add_to(m)
+    
     # Add SOS alerts
-    if sos_alerts:
+    if sos_alerts and not show_heatmap:
         for alert in sos_alerts:
-            alert_id, username, location, lat, lon, message, created_at = alert
+            alert_id, username, location, lat, lon, message, created_at, reporter_id = alert
             
             if lat and lon:
                 popup_text = f"""
@@ -143,7 +165,7 @@ def emergency_map_page():
                 ).add_to(m)
     
     # Add status reports (recent trapped/help requests)
-    if status_reports:
+    if status_reports and not show_heatmap:
         recent_reports = [r for r in status_reports if r[2] in ['help', 'trapped']][:20]  # Last 20 help requests
         
         for report in recent_reports:
@@ -199,11 +221,12 @@ def emergency_map_page():
         - 🆘 Active SOS alerts
         - 🔴 People trapped
         - 🟡 People needing help
+        - 🔥 Heatmap: blue (few) to red (many) incidents
         
         **Map Features:**
         - Click markers for detailed information
         - Zoom in/out for better visibility
-        - Real-time updates every 5 minutes
+        - Live updates as soon as new data arrives
         """)
     
     # Quick stats
@@ -234,4 +257,4 @@ def emergency_map_page():
         st.metric("Active Help Requests", help_requests)
     
     # Auto-refresh notice
-    st.info("🔄 Map data refreshes automatically. Click 'Refresh' in your browser to get the latest updates.")
+    st.info("🔄 Map data refreshes automatically whenever new incidents, shelter or road updates are reported.")
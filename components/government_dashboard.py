@@ -1,14 +1,28 @@
 import streamlit as st
+import os
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 from datetime import datetime, timedelta
-from database import execute_query, get_shelters, get_roads, get_active_sos_alerts, get_status_reports
+from database import (
+    execute_query, get_shelters, get_roads, get_active_sos_alerts, get_status_reports, get_archived_counts,
+    recent_window
+)
 from utils import format_datetime, get_status_color, create_alert_box
+from components.data_table import render_table
+from figure_cache import cached_figure
+from metrics import system_health
+
+# Charts over a sliding time window are rebuilt at least this often (seconds)
+ACTIVITY_WINDOW_BUCKET = 300
 
 def government_dashboard_page():
-    """Government dashboard for monitoring emergency response operations"""
+    """Government dashboard for monitoring emergency response operations.
+
+    Each panel is a fragment that loads its own data, so interacting with a
+    widget only reruns the panel it belongs to.
+    """
     st.header("🏛️ Government Emergency Dashboard")
     st.write("Real-time monitoring and coordination of flood response operations across Hyderabad")
     
@@ -41,6 +55,7 @@ def government_dashboard_page():
     with tab5:
         administrative_controls()
 
+@st.fragment
 def display_overview_metrics():
     """Display key metrics at the top of the dashboard"""
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -104,6 +119,7 @@ def display_overview_metrics():
             help="Roads currently blocked due to flooding"
         )
 
+@st.fragment
 def overview_dashboard():
     """Main overview dashboard with key charts and information"""
     
@@ -113,25 +129,8 @@ def overview_dashboard():
     with col1:
         st.subheader("📊 Emergency Status Distribution")
         
-        status_reports = get_status_reports()
-        if status_reports:
-            status_counts = {}
-            for report in status_reports:
-                status = report[2]  # status field
-                status_counts[status] = status_counts.get(status, 0) + 1
-            
-            # Create pie chart
-            fig = px.pie(
-                values=list(status_counts.values()),
-                names=list(status_counts.keys()),
-                title="Citizen Status Reports",
-                color_discrete_map={
-                    'safe': '#28a745',
-                    'help': '#ffc107', 
-                    'trapped': '#dc3545'
-                }
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
+        fig = cached_figure("status_distribution", ("status_reports",), status_distribution_figure)
+        if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No status reports available")
@@ -139,44 +138,8 @@ def overview_dashboard():
     with col2:
         st.subheader("🏠 Shelter Capacity Overview")
         
-        shelters = get_shelters()
-        if shelters:
-            shelter_data = []
-            for shelter in shelters:
-                shelter_id, name, address, lat, lon, capacity, occupancy, status, contact, facilities, updated_at = shelter
-                occupancy_rate = (occupancy / capacity * 100) if capacity > 0 else 0
-                shelter_data.append({
-                    'Shelter': name[:20] + '...' if len(name) > 20 else name,
-                    'Capacity': capacity,
-                    'Occupancy': occupancy,
-                    'Rate': occupancy_rate,
-                    'Status': status
-                })
-            
-            df = pd.DataFrame(shelter_data)
-            
-            # Create stacked bar chart
-            fig = go.Figure()
-            fig.add_trace(go.Bar(
-                name='Occupied',
-                x=df['Shelter'],
-                y=df['Occupancy'],
-                marker_color='#ffc107'
-            ))
-            fig.add_trace(go.Bar(
-                name='Available',
-                x=df['Shelter'],
-                y=df['Capacity'] - df['Occupancy'],
-                marker_color='#28a745'
-            ))
-            
-            fig.update_layout(
-                barmode='stack',
-                title='Shelter Capacity Status',
-                xaxis_title='Shelters',
-                yaxis_title='People',
-                xaxis={'tickangle': 45}
-            )
+        fig = cached_figure("shelter_capacity", ("shelters",), shelter_capacity_figure)
+        if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No shelter data available")
@@ -185,21 +148,23 @@ def overview_dashboard():
     st.subheader("📅 Recent Emergency Activity")
     
     # Get recent activities from multiple sources
-    recent_sos = execute_query("""
-        SELECT 'SOS Alert' as type, location, created_at, u.username 
+    window, window_params = recent_window(24, "s.created_at")
+    recent_sos = execute_query(f"""
+        SELECT 'SOS Alert' as type, s.location, s.created_at, u.username 
         FROM sos_alerts s 
         JOIN users u ON s.user_id = u.id 
-        WHERE s.created_at > NOW() - INTERVAL '24 hours'
+        WHERE {window}
         ORDER BY s.created_at DESC
-    """, fetch=True)
+    """, window_params, fetch=True)
     
-    recent_status = execute_query("""
-        SELECT CONCAT('Status: ', status) as type, location, created_at, u.username 
+    window, window_params = recent_window(24, "sr.created_at")
+    recent_status = execute_query(f"""
+        SELECT CONCAT('Status: ', sr.status) as type, sr.location, sr.created_at, u.username 
         FROM status_reports sr 
         JOIN users u ON sr.user_id = u.id 
-        WHERE sr.created_at > NOW() - INTERVAL '24 hours' AND status IN ('help', 'trapped')
+        WHERE {window} AND sr.status IN ('help', 'trapped')
         ORDER BY sr.created_at DESC
-    """, fetch=True)
+    """, window_params, fetch=True)
     
     # Combine and sort activities
     all_activities = []
@@ -209,29 +174,96 @@ def overview_dashboard():
         all_activities.extend(recent_status)
     
     if all_activities:
-        # Sort by timestamp
-        all_activities.sort(key=lambda x: x[2], reverse=True)
+        # One table for the whole timeline instead of a row of columns per activity
+        timeline = []
+        for activity_type, location, timestamp, username in all_activities:
+            if 'SOS' in activity_type:
+                label = "🆘 " + activity_type
+            elif 'trapped' in activity_type:
+                label = "🚨 " + activity_type
+            else:
+                label = "⚠️ " + activity_type
+            timeline.append((timestamp, label, location, username))
         
-        # Display recent activities
-        for activity_type, location, timestamp, username in all_activities[:10]:
-            col_time, col_type, col_location, col_user = st.columns([2, 2, 3, 2])
-            
-            with col_time:
-                st.write(format_datetime(timestamp))
-            with col_type:
-                if 'SOS' in activity_type:
-                    st.write("🆘 " + activity_type)
-                elif 'trapped' in activity_type:
-                    st.write("🚨 " + activity_type)
-                else:
-                    st.write("⚠️ " + activity_type)
-            with col_location:
-                st.write(location)
-            with col_user:
-                st.write(username)
+        render_table(
+            timeline,
+            ["Time", "Type", "Location", "User"],
+            key="recent_activity",
+            filter_columns=["Type", "Location", "User"],
+            sort_options={"Newest first": ("Time", False), "Oldest first": ("Time", True)},
+            column_config={"Time": st.column_config.DatetimeColumn("Time", format="YYYY-MM-DD HH:mm:ss")}
+        )
     else:
         st.info("No recent emergency activity in the last 24 hours")
 
+def status_distribution_figure():
+    """Pie chart of citizen status reports"""
+    status_reports = get_status_reports()
+    if not status_reports:
+        return None
+    
+    status_counts = {}
+    for report in status_reports:
+        status = report[2]  # status field
+        status_counts[status] = status_counts.get(status, 0) + 1
+    
+    fig = px.pie(
+        values=list(status_counts.values()),
+        names=list(status_counts.keys()),
+        title="Citizen Status Reports",
+        color_discrete_map={
+            'safe': '#28a745',
+            'help': '#ffc107', 
+            'trapped': '#dc3545'
+        }
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+def shelter_capacity_figure():
+    """Stacked bar chart of occupied and available shelter places"""
+    shelters = get_shelters()
+    if not shelters:
+        return None
+    
+    shelter_data = []
+    for shelter in shelters:
+        shelter_id, name, address, lat, lon, capacity, occupancy, status, contact, facilities, updated_at = shelter
+        occupancy_rate = (occupancy / capacity * 100) if capacity > 0 else 0
+        shelter_data.append({
+            'Shelter': name[:20] + '...' if len(name) > 20 else name,
+            'Capacity': capacity,
+            'Occupancy': occupancy,
+            'Rate': occupancy_rate,
+            'Status': status
+        })
+    
+    df = pd.DataFrame(shelter_data)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='Occupied',
+        x=df['Shelter'],
+        y=df['Occupancy'],
+        marker_color='#ffc107'
+    ))
+    fig.add_trace(go.Bar(
+        name='Available',
+        x=df['Shelter'],
+        y=df['Capacity'] - df['Occupancy'],
+        marker_color='#28a745'
+    ))
+    
+    fig.update_layout(
+        barmode='stack',
+        title='Shelter Capacity Status',
+        xaxis_title='Shelters',
+        yaxis_title='People',
+        xaxis={'tickangle': 45}
+    )
+    return fig
+
+@st.fragment
 def geographic_analysis():
     """Geographic analysis of emergency incidents and resources"""
     st.subheader("🗺️ Geographic Distribution Analysis")
@@ -242,42 +274,8 @@ def geographic_analysis():
     with col1:
         st.write("**Incidents by Area**")
         
-        # Get all incidents with locations
-        incidents = []
-        
-        # Add SOS alerts
-        sos_alerts = get_active_sos_alerts()
-        if isinstance(sos_alerts, list):
-            for alert in sos_alerts:
-                location = str(alert[2]) if len(alert) > 2 and alert[2] is not None else "Unknown Location"
-                area = location.split(',')[0].strip() if ',' in location else location
-                incidents.append(('SOS Alert', area))
-        
-        # Add status reports (help/trapped)
-        status_reports = get_status_reports()
-        if status_reports and isinstance(status_reports, list):
-            for report in status_reports:
-                if len(report) > 4 and report[2] in ['help', 'trapped']:
-                    location = str(report[4]) if report[4] is not None else "Unknown Location"
-                    area = location.split(',')[0].strip() if ',' in location else location
-                    incidents.append((report[2].title(), area))
-        
-        if incidents:
-            # Count incidents by area
-            area_counts = {}
-            for incident_type, area in incidents:
-                area_counts[area] = area_counts.get(area, 0) + 1
-            
-            # Create bar chart
-            fig = px.bar(
-                x=list(area_counts.keys()),
-                y=list(area_counts.values()),
-                title="Emergency Incidents by Area",
-                labels={'x': 'Area', 'y': 'Number of Incidents'},
-                color=list(area_counts.values()),
-                color_continuous_scale='Reds'
-            )
-            fig.update_layout(xaxis={'tickangle': 45})
+        fig = cached_figure("incidents_by_area", ("sos_alerts", "status_reports"), incidents_by_area_figure)
+        if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No incidents to display")
@@ -285,40 +283,8 @@ def geographic_analysis():
     with col2:
         st.write("**Resource Distribution**")
         
-        shelters = get_shelters()
-        if shelters:
-            # Analyze shelter distribution by area
-            shelter_areas = {}
-            for shelter in shelters:
-                address = str(shelter[2]) if shelter[2] is not None else "Unknown Address"
-                area = address.split(',')[-2].strip() if ',' in address else address
-                if area not in shelter_areas:
-                    shelter_areas[area] = {'count': 0, 'capacity': 0}
-                shelter_areas[area]['count'] += 1
-                shelter_areas[area]['capacity'] += shelter[5]  # capacity
-            
-            # Create visualization
-            areas = list(shelter_areas.keys())
-            counts = [shelter_areas[area]['count'] for area in areas]
-            capacities = [shelter_areas[area]['capacity'] for area in areas]
-            
-            fig = make_subplots(specs=[[{"secondary_y": True}]])
-            
-            fig.add_trace(
-                go.Bar(name="Number of Shelters", x=areas, y=counts, marker_color='lightblue'),
-                secondary_y=False
-            )
-            
-            fig.add_trace(
-                go.Scatter(name="Total Capacity", x=areas, y=capacities, mode='lines+markers', marker_color='red'),
-                secondary_y=True
-            )
-            
-            fig.update_xaxes(title_text="Area")
-            fig.update_yaxes(title_text="Number of Shelters", secondary_y=False)
-            fig.update_yaxes(title_text="Total Capacity", secondary_y=True)
-            fig.update_layout(title="Shelter Resources by Area")
-            
+        fig = cached_figure("shelter_resources", ("shelters",), shelter_resources_figure)
+        if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No shelter data available")
@@ -326,6 +292,8 @@ def geographic_analysis():
     # High-risk areas identification
     st.subheader("⚠️ High-Risk Areas Identification")
     
+    incidents = collect_incidents()
+    
     if incidents:
         # Identify areas with highest incident rates
         area_incident_types = {}
@@ -357,6 +325,88 @@ def geographic_analysis():
     else:
         st.success("✅ No high-risk areas identified currently")
 
+def collect_incidents():
+    """Get (incident type, area) for active SOS alerts and help/trapped status reports"""
+    incidents = []
+    
+    # Add SOS alerts
+    sos_alerts = get_active_sos_alerts()
+    if isinstance(sos_alerts, list):
+        for alert in sos_alerts:
+            location = str(alert[2]) if len(alert) > 2 and alert[2] is not None else "Unknown Location"
+            area = location.split(',')[0].strip() if ',' in location else location
+            incidents.append(('SOS Alert', area))
+    
+    # Add status reports (help/trapped)
+    status_reports = get_status_reports()
+    if status_reports and isinstance(status_reports, list):
+        for report in status_reports:
+            if len(report) > 4 and report[2] in ['help', 'trapped']:
+                location = str(report[4]) if report[4] is not None else "Unknown Location"
+                area = location.split(',')[0].strip() if ',' in location else location
+                incidents.append((report[2].title(), area))
+    
+    return incidents
+
+def incidents_by_area_figure():
+    """Bar chart of incident counts per area"""
+    incidents = collect_incidents()
+    if not incidents:
+        return None
+    
+    area_counts = {}
+    for incident_type, area in incidents:
+        area_counts[area] = area_counts.get(area, 0) + 1
+    
+    fig = px.bar(
+        x=list(area_counts.keys()),
+        y=list(area_counts.values()),
+        title="Emergency Incidents by Area",
+        labels={'x': 'Area', 'y': 'Number of Incidents'},
+        color=list(area_counts.values()),
+        color_continuous_scale='Reds'
+    )
+    fig.update_layout(xaxis={'tickangle': 45})
+    return fig
+
+def shelter_resources_figure():
+    """Shelter count and total capacity per area"""
+    shelters = get_shelters()
+    if not shelters:
+        return None
+    
+    shelter_areas = {}
+    for shelter in shelters:
+        address = str(shelter[2]) if shelter[2] is not None else "Unknown Address"
+        area = address.split(',')[-2].strip() if ',' in address else address
+        if area not in shelter_areas:
+            shelter_areas[area] = {'count': 0, 'capacity': 0}
+        shelter_areas[area]['count'] += 1
+        shelter_areas[area]['capacity'] += shelter[5]  # capacity
+    
+    areas = list(shelter_areas.keys())
+    counts = [shelter_areas[area]['count'] for area in areas]
+    capacities = [shelter_areas[area]['capacity'] for area in areas]
+    
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    
+    fig.add_trace(
+        go.Bar(name="Number of Shelters", x=areas, y=counts, marker_color='lightblue'),
+        secondary_y=False
+    )
+    
+    fig.add_trace(
+        go.Scatter(name="Total Capacity", x=areas, y=capacities, mode='lines+markers', marker_color='red'),
+        secondary_y=True
+    )
+    
+    fig.update_xaxes(title_text="Area")
+    fig.update_yaxes(title_text="Number of Shelters", secondary_y=False)
+    fig.update_yaxes(title_text="Total Capacity", secondary_y=True)
+    fig.update_layout(title="Shelter Resources by Area")
+    return fig
+
+@st.fragment
 def infrastructure_status():
     """Infrastructure status monitoring"""
     st.subheader("🏗️ Infrastructure Status Monitoring")
@@ -369,23 +419,7 @@ def infrastructure_status():
         
         roads = get_roads()
         if roads:
-            road_status_counts = {}
-            for road in roads:
-                status = road[2]  # status field
-                road_status_counts[status] = road_status_counts.get(status, 0) + 1
-            
-            # Create donut chart
-            fig = px.pie(
-                values=list(road_status_counts.values()),
-                names=list(road_status_counts.keys()),
-                title="Road Network Status",
-                hole=0.4,
-                color_discrete_map={
-                    'open': '#28a745',
-                    'limited': '#ffc107',
-                    'blocked': '#dc3545'
-                }
-            )
+            fig = cached_figure("road_status", ("roads",), road_status_figure)
             st.plotly_chart(fig, use_container_width=True)
             
             # Detailed road status
@@ -413,41 +447,12 @@ def infrastructure_status():
         
         shelters = get_shelters()
         if shelters:
-            # Shelter capacity utilization
-            shelter_data = []
-            total_capacity = 0
-            total_occupancy = 0
-            
-            for shelter in shelters:
-                capacity = shelter[5]
-                occupancy = shelter[6]
-                total_capacity += capacity
-                total_occupancy += occupancy
-                
-                utilization = (occupancy / capacity * 100) if capacity > 0 else 0
-                shelter_data.append({
-                    'Name': shelter[1][:15] + '...' if len(shelter[1]) > 15 else shelter[1],
-                    'Utilization': utilization,
-                    'Status': shelter[7]
-                })
-            
-            df = pd.DataFrame(shelter_data)
-            
-            # Utilization chart
-            fig = px.bar(
-                df, 
-                x='Name', 
-                y='Utilization',
-                title='Shelter Capacity Utilization (%)',
-                color='Utilization',
-                color_continuous_scale='RdYlGn_r'
-            )
-            fig.update_layout(xaxis={'tickangle': 45})
-            fig.add_hline(y=80, line_dash="dash", line_color="red", 
-                         annotation_text="80% Capacity Warning")
+            fig = cached_figure("shelter_utilization", ("shelters",), shelter_utilization_figure)
             st.plotly_chart(fig, use_container_width=True)
             
             # Overall utilization
+            total_capacity = sum(s[5] for s in shelters)
+            total_occupancy = sum(s[6] for s in shelters)
             overall_utilization = (total_occupancy / total_capacity * 100) if total_capacity > 0 else 0
             st.metric("Overall Shelter Utilization", f"{overall_utilization:.1f}%")
             
@@ -463,6 +468,63 @@ def infrastructure_status():
         else:
             st.info("No shelter data available")
 
+def road_status_figure():
+    """Donut chart of road statuses"""
+    roads = get_roads()
+    if not roads:
+        return None
+    
+    road_status_counts = {}
+    for road in roads:
+        status = road[2]  # status field
+        road_status_counts[status] = road_status_counts.get(status, 0) + 1
+    
+    fig = px.pie(
+        values=list(road_status_counts.values()),
+        names=list(road_status_counts.keys()),
+        title="Road Network Status",
+        hole=0.4,
+        color_discrete_map={
+            'open': '#28a745',
+            'limited': '#ffc107',
+            'blocked': '#dc3545'
+        }
+    )
+    return fig
+
+def shelter_utilization_figure():
+    """Bar chart of each shelter's utilization with the 80% warning line"""
+    shelters = get_shelters()
+    if not shelters:
+        return None
+    
+    shelter_data = []
+    for shelter in shelters:
+        capacity = shelter[5]
+        occupancy = shelter[6]
+        utilization = (occupancy / capacity * 100) if capacity > 0 else 0
+        shelter_data.append({
+            'Name': shelter[1][:15] + '...' if len(shelter[1]) > 15 else shelter[1],
+            'Utilization': utilization,
+            'Status': shelter[7]
+        })
+    
+    df = pd.DataFrame(shelter_data)
+    
+    fig = px.bar(
+        df, 
+        x='Name', 
+        y='Utilization',
+        title='Shelter Capacity Utilization (%)',
+        color='Utilization',
+        color_continuous_scale='RdYlGn_r'
+    )
+    fig.update_layout(xaxis={'tickangle': 45})
+    fig.add_hline(y=80, line_dash="dash", line_color="red", 
+                 annotation_text="80% Capacity Warning")
+    return fig
+
+@st.fragment
 def trends_analytics():
     """Trends and analytics over time"""
     st.subheader("📈 Emergency Response Trends & Analytics")
@@ -470,59 +532,9 @@ def trends_analytics():
     # Time-based analysis
     st.write("**24-Hour Emergency Activity Trend**")
     
-    # Get hourly activity data
-    hourly_activity = execute_query("""
-        SELECT 
-            EXTRACT(HOUR FROM created_at) as hour,
-            COUNT(*) as count,
-            'Status Reports' as type
-        FROM status_reports 
-        WHERE created_at > NOW() - INTERVAL '24 hours'
-        GROUP BY EXTRACT(HOUR FROM created_at)
-        
-        UNION ALL
-        
-        SELECT 
-            EXTRACT(HOUR FROM created_at) as hour,
-            COUNT(*) as count,
-            'SOS Alerts' as type
-        FROM sos_alerts 
-        WHERE created_at > NOW() - INTERVAL '24 hours'
-        GROUP BY EXTRACT(HOUR FROM created_at)
-        
-        ORDER BY hour
-    """, fetch=True)
-    
-    if hourly_activity:
-        # Process data for visualization
-        hours = list(range(24))
-        status_counts = [0] * 24
-        sos_counts = [0] * 24
-        
-        for hour, count, activity_type in hourly_activity:
-            hour_idx = int(hour)
-            if activity_type == 'Status Reports':
-                status_counts[hour_idx] = count
-            else:
-                sos_counts[hour_idx] = count
-        
-        # Create line chart
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=hours, y=status_counts, mode='lines+markers',
-            name='Status Reports', line=dict(color='blue')
-        ))
-        fig.add_trace(go.Scatter(
-            x=hours, y=sos_counts, mode='lines+markers',
-            name='SOS Alerts', line=dict(color='red')
-        ))
-        
-        fig.update_layout(
-            title='24-Hour Emergency Activity Pattern',
-            xaxis_title='Hour of Day',
-            yaxis_title='Number of Reports',
-            xaxis=dict(tickmode='linear', tick0=0, dtick=2)
-        )
+    fig = cached_figure("hourly_activity", ("status_reports", "sos_alerts"), hourly_activity_figure,
+                        time_bucket=ACTIVITY_WINDOW_BUCKET)
+    if fig:
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Insufficient data for trend analysis")
@@ -573,38 +585,108 @@ def trends_analytics():
     with col2:
         st.write("**Emergency Type Distribution**")
         
-        # Analyze types of emergencies from SOS messages
-        emergency_types = execute_query("""
-            SELECT 
-                CASE 
-                    WHEN message LIKE '%medical%' THEN 'Medical Emergency'
-                    WHEN message LIKE '%trapped%' OR message LIKE '%TRAPPED%' THEN 'Trapped'
-                    WHEN message LIKE '%fire%' THEN 'Fire Emergency'
-                    WHEN message LIKE '%flood%' OR message LIKE '%water%' THEN 'Flood Related'
-                    ELSE 'General Emergency'
-                END as emergency_type,
-                COUNT(*) as count
-            FROM sos_alerts
-            WHERE created_at > NOW() - INTERVAL '7 days'
-            GROUP BY emergency_type
-            ORDER BY count DESC
-        """, fetch=True)
-        
-        if emergency_types:
-            types = [et[0] for et in emergency_types]
-            counts = [et[1] for et in emergency_types]
-            
-            fig = px.bar(
-                x=counts, y=types, orientation='h',
-                title='Emergency Types (Last 7 Days)',
-                labels={'x': 'Number of Incidents', 'y': 'Emergency Type'}
-            )
+        fig = cached_figure("emergency_types", ("sos_alerts",), emergency_types_figure,
+                            time_bucket=ACTIVITY_WINDOW_BUCKET)
+        if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No emergency type data available")
 
+def hourly_activity_figure():
+    """Line chart of status reports and SOS alerts per hour over the last 24 hours"""
+    window, window_params = recent_window(24)
+    hourly_activity = execute_query(f"""
+        SELECT 
+            EXTRACT(HOUR FROM created_at) as hour,
+            COUNT(*) as count,
+            'Status Reports' as type
+        FROM status_reports 
+        WHERE {window}
+        GROUP BY EXTRACT(HOUR FROM created_at)
+        
+        UNION ALL
+        
+        SELECT 
+            EXTRACT(HOUR FROM created_at) as hour,
+            COUNT(*) as count,
+            'SOS Alerts' as type
+        FROM sos_alerts 
+        WHERE {window}
+        GROUP BY EXTRACT(HOUR FROM created_at)
+        
+        ORDER BY hour
+    """, window_params * 2, fetch=True)
+    if not hourly_activity:
+        return None
+    
+    hours = list(range(24))
+    status_counts = [0] * 24
+    sos_counts = [0] * 24
+    
+    for hour, count, activity_type in hourly_activity:
+        hour_idx = int(hour)
+        if activity_type == 'Status Reports':
+            status_counts[hour_idx] = count
+        else:
+            sos_counts[hour_idx] = count
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=hours, y=status_counts, mode='lines+markers',
+        name='Status Reports', line=dict(color='blue')
+    ))
+    fig.add_trace(go.Scatter(
+        x=hours, y=sos_counts, mode='lines+markers',
+        name='SOS Alerts', line=dict(color='red')
+    ))
+    
+    fig.update_layout(
+        title='24-Hour Emergency Activity Pattern',
+        xaxis_title='Hour of Day',
+        yaxis_title='Number of Reports',
+        xaxis=dict(tickmode='linear', tick0=0, dtick=2)
+    )
+    return fig
+
+def emergency_types_figure():
+    """Bar chart of SOS emergency types over the last 7 days"""
+    window, window_params = recent_window(24 * 7)
+    emergency_types = execute_query(f"""
+        SELECT 
+            CASE 
+                WHEN message LIKE '%%medical%%' THEN 'Medical Emergency'
+                WHEN message LIKE '%%trapped%%' OR message LIKE '%%TRAPPED%%' THEN 'Trapped'
+                WHEN message LIKE '%%fire%%' THEN 'Fire Emergency'
+                WHEN message LIKE '%%flood%%' OR message LIKE '%%water%%' THEN 'Flood Related'
+                ELSE 'General Emergency'
+            END as emergency_type,
+            COUNT(*) as count
+        FROM sos_alerts
+        WHERE {window}
+        GROUP BY emergency_type
+        ORDER BY count DESC
+    """, window_params, fetch=True)
+    if not emergency_types:
+        return None
+    
+    types = [et[0] for et in emergency_types]
+    counts = [et[1] for et in emergency_types]
+    
+    return px.bar(
+        x=counts, y=types, orientation='h',
+        title='Emergency Types (Last 7 Days)',
+        labels={'x': 'Number of Incidents', 'y': 'Emergency Type'}
+    )
+
 def administrative_controls():
     """Administrative controls and system management"""
+    system_status_panel()
+    data_management_panel()
+    alert_settings_panel()
+
+@st.fragment
+def system_status_panel():
+    """System status and quick actions"""
     st.subheader("⚙️ Administrative Controls")
     
     # System status
@@ -636,8 +718,11 @@ def administrative_controls():
             for role, count in user_roles:
                 st.write(f"• {role.title()}: {count}")
         
-        # System uptime (placeholder - would need actual implementation)
-        st.write("**System Status:** 🟢 Operational")
+        status, reasons = system_health()
+        icon = {"operational": "🟢", "degraded": "🟡", "down": "🔴"}[status]
+        st.write(f"**System Status:** {icon} {status.title()}")
+        for reason in reasons:
+            st.caption(f"• {reason}")
         st.write("**Last Update:** " + format_datetime(datetime.now()))
     
     with col2:
@@ -658,7 +743,10 @@ def administrative_controls():
         if st.button("🔧 System Maintenance", use_container_width=True):
             st.info("Maintenance mode controls")
             # This would provide maintenance options
-    
+
+@st.fragment
+def data_management_panel():
+    """Statistics, export and maintenance tabs"""
     # Data management
     st.subheader("📊 Data Management")
     
@@ -670,14 +758,15 @@ def administrative_controls():
         
         with col1:
             st.write("**Emergency Data**")
+            # Totals include rows retention has moved to the archive
             total_sos = execute_query("SELECT COUNT(*) FROM sos_alerts", fetch=True)
-            total_sos = total_sos[0][0] if total_sos else 0
+            total_sos = (total_sos[0][0] if total_sos else 0) + get_archived_counts("sos_alerts")
             
             total_status = execute_query("SELECT COUNT(*) FROM status_reports", fetch=True)
-            total_status = total_status[0][0] if total_status else 0
+            total_status = (total_status[0][0] if total_status else 0) + get_archived_counts("status_reports")
             
             total_messages = execute_query("SELECT COUNT(*) FROM messages", fetch=True)
-            total_messages = total_messages[0][0] if total_messages else 0
+            total_messages = (total_messages[0][0] if total_messages else 0) + get_archived_counts("messages")
             
             st.metric("Total SOS Alerts", total_sos)
             st.metric("Total Status Reports", total_status)
@@ -706,7 +795,7 @@ def administrative_controls():
             resolved_alerts = execute_query("""
                 SELECT COUNT(*) FROM sos_alerts WHERE status = 'resolved'
             """, fetch=True)
-            resolved_count = resolved_alerts[0][0] if resolved_alerts else 0
+            resolved_count = (resolved_alerts[0][0] if resolved_alerts else 0) + get_archived_counts("sos_alerts", "resolved")
             
             resolution_rate = (resolved_count / total_sos * 100) if total_sos > 0 else 0
             st.metric("Alert Resolution Rate", f"{resolution_rate:.1f}%")
@@ -734,13 +823,90 @@ def administrative_controls():
             help="Select date range for data export"
         )
         
+        col_format, col_images = st.columns(2)
+        with col_format:
+            export_format = st.radio("Format", ["csv", "parquet"], format_func=str.upper, horizontal=True)
+        with col_images:
+            include_images = st.checkbox("Include report photos", value=False,
+                                         help="Photos are large; leave off unless you need them")
+            include_archived = st.checkbox("Include archived records", value=False,
+                                           help="Also export alerts, reports and messages moved out by retention")
+        
         if st.button("📥 Export Data", use_container_width=True):
-            if export_options:
-                st.success(f"Exporting {len(export_options)} datasets for date range: {date_range[0]} to {date_range[1]}")
-                st.info("Export functionality would generate CSV/Excel files with selected data")
-            else:
+            if not export_options:
                 st.error("Please select at least one dataset to export")
-    
+            elif len(date_range) != 2:
+                st.error("Please select a start and end date")
+            else:
+                from pathlib import Path
+                from data_export import export_data
+                
+                datasets = {
+                    "SOS Alerts": "sos_alerts",
+                    "Status Reports": "status_reports",
+                    "Messages": "messages",
+                    "Shelter Data": "shelters",
+                    "Road Status": "roads"
+                }
+                progress_bar = st.progress(0.0, text="Starting export...")
+                
+                def report_progress(dataset, written, total):
+                    progress_bar.progress(min(written / total, 1.0) if total else 1.0,
+                                          text=f"{dataset.replace('_', ' ').title()}: {written:,} of {total:,} rows")
+                
+                try:
+                    zip_path, counts = export_data(
+                        [datasets[option] for option in export_options],
+                        date_range[0],
+                        date_range[1],
+                        export_format,
+                        include_images,
+                        report_progress,
+                        include_archived=include_archived
+                    )
+                    progress_bar.progress(1.0, text="Export complete")
+                    st.success(f"Exported {sum(counts.values()):,} rows from {len(counts)} datasets for {date_range[0]} to {date_range[1]}")
+                    # The zip is only read from disk when the button is clicked
+                    st.download_button(
+                        "⬇️ Download export",
+                        data=Path(zip_path).read_bytes,
+                        file_name=Path(zip_path).name,
+                        mime="application/zip"
+                    )
+                except Exception as e:
+                    st.error(f"Export failed: {e}")
+
+        st.divider()
+        st.write("**Import Data**")
+
+        import_table = st.selectbox(
+            "Import into",
+            ["shelters", "roads", "status_reports", "sos_alerts", "messages", "users"],
+            format_func=lambda x: x.replace('_', ' ').title()
+        )
+        import_file_upload = st.file_uploader(
+            "CSV or JSON Lines file",
+            type=["csv", "jsonl", "ndjson"],
+            help="First row of a CSV must hold the column names; rows that fail validation are skipped"
+        )
+
+        if st.button("📤 Import Data", use_container_width=True, disabled=import_file_upload is None):
+            # Pandas/numpy loader is only imported when someone actually imports a file
+            from bulk_import import import_file
+
+            progress_text = st.empty()
+            try:
+                result = import_file(
+                    import_table,
+                    import_file_upload,
+                    progress=lambda r: progress_text.write(f"{r['rows_read']:,} rows read ({r['rows_per_sec']:,} rows/s)")
+                )
+                st.success(f"Imported {result['rows_loaded']:,} rows into {import_table} in {result['seconds']}s ({result['rows_per_sec']:,} rows/s)")
+                if result['rows_rejected']:
+                    st.warning(f"{result['rows_rejected']:,} rows were rejected by validation")
+            except ValueError as e:
+                st.error(f"Import failed: {e}")
+
     with tab3:
         st.write("**System Maintenance**")
         
@@ -749,14 +915,61 @@ def administrative_controls():
         with col1:
             st.write("**Database Maintenance**")
             
-            if st.button("🧹 Clean Old Data", use_container_width=True):
-                st.info("Would clean data older than specified retention period")
+            if st.button("🧹 Clean Old Data", use_container_width=True,
+                         help="Move resolved alerts older than 7 days and reports/messages older than 30 days to the archive"):
+                from retention import run_retention
+                
+                progress_text = st.empty()
+                moved, dropped, seconds = run_retention(
+                    progress=lambda table, count: progress_text.write(f"{table.replace('_', ' ').title()}: {count:,} archived")
+                )
+                progress_text.empty()
+                if any(moved.values()) or dropped:
+                    st.success("Archived " + ", ".join(f"{count:,} {table.replace('_', ' ')}" for table, count in moved.items())
+                               + f" and dropped {len(dropped)} empty daily partitions in {seconds}s")
+                else:
+                    st.info("No data past its retention period")
             
-            if st.button("📊 Optimize Database", use_container_width=True):
-                st.info("Database optimization initiated")
+            if st.button("📊 Optimize Database", use_container_width=True,
+                         help="Refresh statistics, vacuum, rebuild churned indexes and reconcile rollups now"):
+                from maintenance import run_maintenance
+                
+                with st.spinner("Running maintenance jobs..."):
+                    results = run_maintenance(force=True)
+                failed = [r for r in results if r['status'] == 'failed']
+                if failed:
+                    st.error("Failed: " + ", ".join(f"{r['job']} {r['target'] or ''}".strip() for r in failed))
+                else:
+                    st.success(f"Ran {len({r['job'] for r in results})} maintenance jobs")
+                st.dataframe(
+                    pd.DataFrame(
+                        [(r['job'], r['target'] or '(total)', r['status'], r['duration_ms']) for r in results],
+                        columns=['Job', 'Target', 'Status', 'Duration (ms)']
+                    ),
+                    hide_index=True,
+                    use_container_width=True
+                )
             
+            backup_kind = st.radio(
+                "Backup type",
+                ["Full snapshot", "Incremental segment"],
+                horizontal=True,
+                help="Incremental segments extend the newest snapshot with changes since its last segment"
+            )
             if st.button("💾 Backup Data", use_container_width=True):
-                st.success("Backup process started")
+                import backup
+
+                try:
+                    with st.spinner("Backing up..."):
+                        backups = backup.list_backups()
+                        if backup_kind == "Full snapshot" or not backups:
+                            target = os.path.join(backup.create_snapshot(), "base")
+                        else:
+                            target = backup.create_segment(backups[0])
+                    size, rows = backup.backup_size(target)
+                    st.success(f"Backed up {rows:,} rows ({size / 1e6:.1f} MB compressed) to {target}")
+                except Exception as e:
+                    st.error(f"Backup failed: {e}")
         
         with col2:
             st.write("**System Configuration**")
@@ -767,9 +980,87 @@ def administrative_controls():
             if st.button("👥 Manage Users", use_container_width=True):
                 st.info("User management interface")
             
-            if st.button("📝 View Logs", use_container_width=True):
-                st.info("System logs and audit trail")
+            show_logs = st.button("📝 View Logs", use_container_width=True)
+            
+            st.toggle("⏱️ Profile my page renders", key="profile_renders",
+                      help="Time data fetch, compute, figure building and element emission on every page you render")
+            show_profiles = st.button("⏱️ Render Profiles", use_container_width=True)
+        
+        if show_logs:
+            query_log_panel()
+        if show_profiles:
+            render_profile_panel()
+
+def query_log_panel():
+    """Slowest query call sites in this server process and the recent slow-query log"""
+    from query_stats import top_offenders, recent_slow_queries, SLOW_QUERY_MS
     
+    st.write("**Top Query Offenders** (this server process, by total time)")
+    offenders = top_offenders()
+    if offenders:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Call site": o["site"],
+                    "Function": o["function"],
+                    "Pages": ", ".join(o["pages"]),
+                    "Calls": o["calls"],
+                    "Total (ms)": round(o["total_ms"]),
+                    "p50 (ms)": o["p50_ms"],
+                    "p95 (ms)": o["p95_ms"],
+                    "p99 (ms)": o["p99_ms"],
+                    "Max (ms)": round(o["max_ms"], 1),
+                    "Rows/call": round(o["rows"] / o["calls"], 1),
+                    "KB fetched": round(o["bytes"] / 1024, 1),
+                    "Errors": o["errors"],
+                }
+                for o in offenders
+            ]),
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption("Percentiles are histogram bucket upper bounds.")
+    else:
+        st.info("No queries recorded yet")
+    
+    st.write(f"**Slow Query Log** (sampled, over {SLOW_QUERY_MS} ms, and failures)")
+    slow = recent_slow_queries()
+    if slow:
+        st.dataframe(
+            pd.DataFrame(slow, columns=["time", "ms", "page", "site", "function", "rows", "bytes", "sql", "error"]),
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.info("No slow queries logged")
+
+def render_profile_panel():
+    """Percentiles of the profiled page renders in this server process"""
+    from profiler import percentile_table, element_counts, PROFILE_ENV
+    
+    st.write("**Render Profiles** (this server process, recent profiled renders per page)")
+    rows = percentile_table()
+    if not rows:
+        st.info(f"No renders profiled yet. Turn on profiling above or set {PROFILE_ENV}=1 on the server.")
+        return
+    profiles = pd.DataFrame(rows)
+    st.dataframe(profiles, hide_index=True, use_container_width=True)
+    st.caption("Section times are sampled shares of each render's wall time; query time is measured exactly. "
+               "Peak memory is the Python heap growth during the render.")
+    
+    st.write("**Elements Emitted** (latest profiled render of each page)")
+    st.dataframe(
+        pd.DataFrame(
+            [(page, element, count) for page in profiles["page"].unique() for element, count in element_counts(page)],
+            columns=["Page", "Element", "Count"]
+        ),
+        hide_index=True,
+        use_container_width=True
+    )
+
+@st.fragment
+def alert_settings_panel():
+    """Threshold settings and the system alerts they drive"""
     # Alert and notification settings
     st.subheader("🔔 Alert & Notification Settings")
     
@@ -0,0 +1,95 @@
+import streamlit as st
+from database import get_latest_change_id, get_changes_since, get_last_location
+from event_bus import get_event_bus, role_topic, zone_topic, user_topic
+from utils import get_zone
+
+# How often live pages poll the change feed
+LIVE_REFRESH_SECONDS = 5
+# How often the sidebar drains the session's event bus subscription
+NOTIFICATION_POLL_SECONDS = 3
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_refresh(tables, key):
+    """Poll the change feed and rerun the page only when one of the given tables changed.
+
+    Call this at the top of a page, before its data is loaded, so changes
+    made while the page was rendering are never missed. The session keeps
+    a cursor per table (see get_changes_since). The whole page reruns:
+    Streamlit cannot rerun another fragment from a fragment's body.
+    """
+    cursors_key = f"live_cursors_{key}"
+    cursors = st.session_state.setdefault(cursors_key, {})
+    changed = False
+    for table in tables:
+        if table not in cursors:
+            cursors[table] = get_latest_change_id(table)
+            continue
+        changes = get_changes_since(cursors[table], (table,))
+        if changes:
+            cursors[table] = changes[-1][0]
+            changed = True
+    
+    if changed:
+        st.rerun()
+    
+    st.caption(f"🟢 Live · checking for updates every {LIVE_REFRESH_SECONDS}s")
+
+def subscribe_session(user_id, user_role):
+    """Subscribe the current session to its role and personal topics (once per session).
+
+    Citizens also follow the zone of their last reported location, to hear
+    about SOS alerts and help requests nearby.
+    """
+    if st.session_state.get('event_subscription') is None:
+        topics = [role_topic(user_role), user_topic(user_id)]
+        if user_role == "citizen":
+            location = get_last_location(user_id)
+            if location:
+                topics.append(zone_topic(get_zone(*location)))
+        st.session_state.event_subscription = get_event_bus().subscribe(topics)
+    return st.session_state.event_subscription
+
+def follow_zone(latitude, longitude):
+    """Move the session's zone subscription to the zone of a location the user just reported"""
+    subscription = st.session_state.get('event_subscription')
+    zone = get_zone(latitude, longitude)
+    if subscription is None or zone is None:
+        return
+    topics = {topic for topic in subscription.topics if not topic.startswith(zone_topic(""))}
+    topics.add(zone_topic(zone))
+    if topics != subscription.topics:
+        get_event_bus().resubscribe(subscription, topics)
+
+def unsubscribe_session():
+    """Close the current session's event bus subscription, if any"""
+    subscription = st.session_state.get('event_subscription')
+    if subscription is not None:
+        subscription.close()
+        st.session_state.event_subscription = None
+
+@st.fragment(run_every=NOTIFICATION_POLL_SECONDS)
+def live_notifications():
+    """Show toasts for events published to this session's topics"""
+    subscription = st.session_state.get('event_subscription')
+    if subscription is None:
+        return
+    
+    for event in subscription.drain():
+        payload = event["payload"]
+        if event["type"] in ("sos_alert", "status_report") and payload.get("user_id") == st.session_state.get("user_id"):
+            # The user's own alert or report, heard on their zone topic
+            continue
+        if event["type"] == "sos_alert":
+            st.toast(f"🆘 New SOS alert: {payload.get('location', 'unknown location')}")
+        elif event["type"] == "status_report":
+            if payload.get("status") in ("help", "trapped"):
+                st.toast(f"⚠️ Someone nearby needs help: {payload.get('location', 'unknown location')}")
+        elif event["type"] == "message":
+            if payload.get("message_type") == "sos_response":
+                st.toast("🚁 A rescue team responded to your SOS alert")
+            elif payload.get("message_type") == "alert":
+                st.toast("⚠️ New emergency alert in Messages")
+            else:
+                st.toast("💬 You have a new message")
+        elif event["type"] == "shelter_update":
+            st.toast(f"🏠 Shelter update: now {payload.get('status', 'updated')}")
@@ -1,7 +1,13 @@
 import streamlit as st
 from datetime import datetime
-from database import get_messages_for_user, send_message, execute_query
-from utils import format_datetime, create_alert_box, get_rescue_team_responses
+from database import send_message, send_geofenced_message, send_sos_response, execute_query, get_inbox, get_unread_counts, get_read_cursor, mark_messages_read, INBOX_PAGE_SIZE, UNREAD_COUNT_CAP, recent_window
+from utils import format_datetime, create_alert_box, get_rescue_team_responses, get_hyderabad_coordinates
+from components.live_updates import live_refresh
+from components.data_table import render_table
+from geofence import AREA_CENTERS, AREA_RADIUS_KM, area_geofence, circle_geofence, polygon_geofence, parse_polygon
+
+# Sent messages listed in the rescue team's recent-messages table
+RECENT_SENT_LIMIT = 100
 
 def messaging_page():
     """Messaging page for communication between users and rescue teams"""
@@ -18,30 +24,79 @@ def citizen_messaging_interface():
     """Messaging interface for citizens"""
     st.write("Receive updates from rescue teams and emergency services")
     
-    # Get messages for the user
-    messages = get_messages_for_user(st.session_state.user_id)
+    user_id = st.session_state.user_id
     
-    # Message statistics
-    col1, col2, col3 = st.columns(3)
+    # Rerun only when new messages arrive
+    live_refresh(("messages",), "citizen_inbox")
     
-    if messages:
-        sos_responses = [m for m in messages if m[4] == 'sos_response']
-        general_messages = [m for m in messages if m[4] == 'general']
-        alerts = [m for m in messages if m[4] == 'alert']
-    else:
-        sos_responses = general_messages = alerts = []
+    # Unread counters per message type (cached, capped)
+    unread_counts = get_unread_counts(user_id)
+    last_read_id = get_read_cursor(user_id)
+    
+    col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("SOS Responses", len(sos_responses))
+        st.metric("Unread SOS Responses", format_unread_count(unread_counts.get('sos_response', 0)))
     with col2:
-        st.metric("General Messages", len(general_messages))
+        st.metric("Unread General Messages", format_unread_count(unread_counts.get('general', 0)))
     with col3:
-        st.metric("Emergency Alerts", len(alerts))
+        st.metric("Unread Emergency Alerts", format_unread_count(unread_counts.get('alert', 0)))
     
     st.divider()
     
+    inbox_panel(user_id, last_read_id)
+    
+    st.divider()
+    
+    # Emergency communication tips
+    st.subheader("📱 Emergency Communication Tips")
+    
+    with st.expander("Communication Guidelines"):
+        st.markdown("""
+        **To ensure effective communication:**
+        
+        - **Keep your phone charged** - Use power-saving mode during emergencies
+        - **Check messages regularly** - Rescue teams may send time-sensitive updates
+        - **Save important numbers** - Have backup communication methods ready
+        - **Be specific in reports** - Provide clear location and situation details
+        - **Follow instructions** - Rescue teams provide expert guidance
+        
+        **If you don't receive responses:**
+        - Network congestion is common during disasters
+        - Emergency services prioritize life-threatening situations
+        - Keep reporting your status if conditions change
+        - Use alternative communication methods if available
+        """)
+
+@st.fragment
+def inbox_panel(user_id, last_read_id):
+    """Filtered, paginated message list; filtering and paging rerun only this panel"""
+    # Message filter (pushed down to the inbox query)
+    message_filter = st.selectbox(
+        "Filter messages",
+        ["all", "sos_response", "general", "alert"],
+        format_func=lambda x: {
+            "all": "All Messages",
+            "sos_response": "SOS Responses",
+            "general": "General Messages", 
+            "alert": "Emergency Alerts"
+        }[x]
+    )
+    
+    # Keyset cursor: a stack of before_ids, reset whenever the filter changes
+    if st.session_state.get('inbox_filter') != message_filter:
+        st.session_state.inbox_filter = message_filter
+        st.session_state.inbox_cursors = [None]
+    before_id = st.session_state.inbox_cursors[-1]
+    
+    messages = get_inbox(
+        user_id,
+        message_type=None if message_filter == "all" else message_filter,
+        before_id=before_id
+    )
+    
     # Display messages
-    if not messages:
+    if not messages and before_id is None and message_filter == "all":
         st.info("📭 No messages yet. Messages from rescue teams and emergency services will appear here.")
         
         # Show sample message format
@@ -55,36 +110,23 @@ def citizen_messaging_interface():
         - Rescue team coordination
         """)
         
-    else:
-        st.subheader(f"📬 Your Messages ({len(messages)})")
+    elif not messages:
+        st.info("No messages match this filter.")
         
-        # Message filter
-        message_filter = st.selectbox(
-            "Filter messages",
-            ["all", "sos_response", "general", "alert"],
-            format_func=lambda x: {
-                "all": "All Messages",
-                "sos_response": "SOS Responses",
-                "general": "General Messages", 
-                "alert": "Emergency Alerts"
-            }[x]
-        )
-        
-        # Filter messages
-        if message_filter != "all":
-            filtered_messages = [m for m in messages if m[4] == message_filter]
-        else:
-            filtered_messages = messages
+    else:
+        page_number = len(st.session_state.inbox_cursors)
+        st.subheader(f"📬 Your Messages (page {page_number})")
         
-        # Display filtered messages
-        for message in filtered_messages:
+        # Display this page of messages
+        for message in messages:
             message_id, sender_id, recipient_id, alert_id, message_text, message_type, created_at, sender_name = message
+            new_badge = "🆕 " if message_id > last_read_id else ""
             
             # Message styling based on type
             if message_type == "sos_response":
                 st.markdown(f"""
                 <div style="background-color: #e8f5e8; border-left: 5px solid #28a745; padding: 1rem; margin: 1rem 0; border-radius: 0 10px 10px 0;">
-                    <h4 style="color: #155724; margin: 0 0 0.5rem 0;">🆘 SOS Response from {sender_name}</h4>
+                    <h4 style="color: #155724; margin: 0 0 0.5rem 0;">{new_badge}🆘 SOS Response from {sender_name}</h4>
                     <p style="margin: 0; color: #155724;">{message_text}</p>
                     <small style="color: #6c757d;">📅 {format_datetime(created_at)}</small>
                 </div>
@@ -93,7 +135,7 @@ def citizen_messaging_interface():
             elif message_type == "alert":
                 st.markdown(f"""
                 <div style="background-color: #fff3cd; border-left: 5px solid #ffc107; padding: 1rem; margin: 1rem 0; border-radius: 0 10px 10px 0;">
-                    <h4 style="color: #856404; margin: 0 0 0.5rem 0;">⚠️ Emergency Alert</h4>
+                    <h4 style="color: #856404; margin: 0 0 0.5rem 0;">{new_badge}⚠️ Emergency Alert</h4>
                     <p style="margin: 0; color: #856404;">{message_text}</p>
                     <small style="color: #6c757d;">📅 {format_datetime(created_at)}</small>
                 </div>
@@ -102,38 +144,91 @@ def citizen_messaging_interface():
             else:  # general
                 st.markdown(f"""
                 <div style="background-color: #d1ecf1; border-left: 5px solid #17a2b8; padding: 1rem; margin: 1rem 0; border-radius: 0 10px 10px 0;">
-                    <h4 style="color: #0c5460; margin: 0 0 0.5rem 0;">💬 Message from {sender_name}</h4>
+                    <h4 style="color: #0c5460; margin: 0 0 0.5rem 0;">{new_badge}💬 Message from {sender_name}</h4>
                     <p style="margin: 0; color: #0c5460;">{message_text}</p>
                     <small style="color: #6c757d;">📅 {format_datetime(created_at)}</small>
                 </div>
                 """, unsafe_allow_html=True)
-    
-    st.divider()
-    
-    # Emergency communication tips
-    st.subheader("📱 Emergency Communication Tips")
-    
-    with st.expander("Communication Guidelines"):
-        st.markdown("""
-        **To ensure effective communication:**
         
-        - **Keep your phone charged** - Use power-saving mode during emergencies
-        - **Check messages regularly** - Rescue teams may send time-sensitive updates
-        - **Save important numbers** - Have backup communication methods ready
-        - **Be specific in reports** - Provide clear location and situation details
-        - **Follow instructions** - Rescue teams provide expert guidance
+        # Opening the newest page of the unfiltered inbox marks everything on it as read.
+        # There is one read cursor per user, so a filtered page must not advance it
+        # past unread messages of the other types.
+        if message_filter == "all" and before_id is None and messages[0][0] > last_read_id:
+            mark_messages_read(user_id, messages[0][0])
         
-        **If you don't receive responses:**
-        - Network congestion is common during disasters
-        - Emergency services prioritize life-threatening situations
-        - Keep reporting your status if conditions change
-        - Use alternative communication methods if available
-        """)
+        # Pagination controls
+        col_newer, col_older = st.columns(2)
+        with col_newer:
+            if len(st.session_state.inbox_cursors) > 1:
+                if st.button("⬅️ Newer messages", use_container_width=True):
+                    st.session_state.inbox_cursors.pop()
+                    st.rerun(scope="fragment")
+        with col_older:
+            if len(messages) == INBOX_PAGE_SIZE:
+                if st.button("Older messages ➡️", use_container_width=True):
+                    st.session_state.inbox_cursors.append(messages[-1][0])
+                    st.rerun(scope="fragment")
+
+def format_unread_count(count):
+    """Format a capped unread count for display"""
+    return f"{UNREAD_COUNT_CAP}+" if count > UNREAD_COUNT_CAP else count
+
+def broadcast_target_selector():
+    """Widgets for choosing a broadcast's target area; returns a geofence or None for everyone"""
+    target = st.radio(
+        "Target Area",
+        ["all", "areas", "radius", "polygon"],
+        format_func=lambda x: {
+            "all": "🌐 All citizens",
+            "areas": "🏘️ Named areas",
+            "radius": "📍 Radius around a point",
+            "polygon": "🔷 Custom polygon"
+        }[x],
+        horizontal=True
+    )
+    
+    if target == "areas":
+        areas = st.multiselect("Areas", list(AREA_CENTERS.keys()))
+        radius_km = st.slider("Radius around each area (km)", 0.5, 10.0, AREA_RADIUS_KM, 0.5)
+        return area_geofence(areas, radius_km)
+    
+    if target == "radius":
+        default_lat, default_lon = get_hyderabad_coordinates()
+        col_lat, col_lon, col_radius = st.columns(3)
+        with col_lat:
+            lat = st.number_input("Center Latitude", value=default_lat, format="%.6f")
+        with col_lon:
+            lon = st.number_input("Center Longitude", value=default_lon, format="%.6f")
+        with col_radius:
+            radius_km = st.number_input("Radius (km)", min_value=0.1, max_value=50.0, value=2.0)
+        return circle_geofence(lat, lon, radius_km)
+    
+    if target == "polygon":
+        polygon_text = st.text_area(
+            "Polygon vertices",
+            placeholder="17.4401, 78.3489\n17.4485, 78.3908\n17.4326, 78.4071",
+            help="One 'latitude, longitude' pair per line, at least three points"
+        )
+        polygon = parse_polygon(polygon_text)
+        if polygon_text and not polygon:
+            st.warning("Enter at least three valid 'latitude, longitude' lines")
+        return polygon_geofence(polygon) if polygon else None
+    
+    return None
 
 def rescue_team_messaging_interface():
     """Messaging interface for rescue teams"""
     st.write("Send messages and responses to citizens and coordinate with other teams")
     
+    compose_message_panel()
+    
+    st.divider()
+    
+    recent_sent_panel()
+
+@st.fragment
+def compose_message_panel():
+    """Message composition; its widgets rerun only this panel until a message is sent"""
     # Message composition section
     st.subheader("📝 Send Message")
     
@@ -145,19 +240,21 @@ def rescue_team_messaging_interface():
             "Message Type",
             ["broadcast", "sos_response", "individual"],
             format_func=lambda x: {
-                "broadcast": "📢 Broadcast to All Citizens",
+                "broadcast": "📢 Broadcast to Citizens",
                 "sos_response": "🆘 Response to SOS Alert",
                 "individual": "👤 Individual Message"
             }[x]
         )
         
+        geofence = None
         if message_type == "broadcast":
-            st.write("**Send message to all citizens in affected areas**")
+            st.write("**Send message to citizens in affected areas**")
             message_content = st.text_area(
                 "Broadcast Message",
                 placeholder="Enter emergency information, evacuation instructions, or safety updates...",
                 height=100
             )
+            geofence = broadcast_target_selector()
             
         elif message_type == "sos_response":
             # Get active SOS alerts for response
@@ -194,15 +291,16 @@ def rescue_team_messaging_interface():
         
         else:  # individual
             # Get list of users who have submitted reports or SOS alerts
-            recent_users = execute_query("""
+            window, window_params = recent_window(24)
+            recent_users = execute_query(f"""
                 SELECT DISTINCT u.id, u.username 
                 FROM users u 
                 WHERE u.id IN (
-                    SELECT user_id FROM status_reports WHERE created_at > NOW() - INTERVAL '24 hours'
+                    SELECT user_id FROM status_reports WHERE {window}
                     UNION 
-                    SELECT user_id FROM sos_alerts WHERE created_at > NOW() - INTERVAL '24 hours'
+                    SELECT user_id FROM sos_alerts WHERE {window}
                 ) AND u.role = 'citizen'
-            """, fetch=True)
+            """, window_params * 2, fetch=True)
             
             if recent_users:
                 selected_user = st.selectbox(
@@ -243,7 +341,18 @@ def rescue_team_messaging_interface():
     # Send message button
     if st.button("📤 Send Message", type="primary", use_container_width=True):
         if message_content:
-            if message_type == "broadcast":
+            if message_type == "broadcast" and geofence:
+                # Deliver only to citizens last seen inside the target area
+                result, delivered = send_geofenced_message(
+                    st.session_state.user_id,
+                    f"EMERGENCY BROADCAST:\n\n{message_content}",
+                    "alert",
+                    geofence
+                )
+                if result:
+                    st.info(f"📍 Delivered to {delivered} citizen(s) in the target area")
+                
+            elif message_type == "broadcast":
                 # Send to all citizens (recipient_id = None for broadcast)
                 result = send_message(
                     st.session_state.user_id,
@@ -253,14 +362,12 @@ def rescue_team_messaging_interface():
                 )
                 
             elif message_type == "sos_response" and sos_alerts:
-                # Send response to SOS alert
+                # Send response to the alert's reporter and co-located reporters
                 alert_id = selected_alert[0]
-                result = send_message(
+                result = send_sos_response(
                     st.session_state.user_id,
-                    None,  # Would need to get user_id from alert
-                    f"RESCUE TEAM RESPONSE:\n\n{message_content}",
-                    "sos_response",
-                    alert_id
+                    alert_id,
+                    f"RESCUE TEAM RESPONSE:\n\n{message_content}"
                 )
                 
             elif message_type == "individual" and recent_users:
@@ -282,24 +389,31 @@ def rescue_team_messaging_interface():
                 st.error("❌ Failed to send message. Please try again.")
         else:
             st.error("Please enter a message to send.")
-    
-    st.divider()
-    
+
+@st.fragment
+def recent_sent_panel():
+    """The rescue team member's most recent sent messages, up to RECENT_SENT_LIMIT"""
     # Recent messages sent
     st.subheader("📤 Recent Messages Sent")
     
     recent_sent = execute_query(
-        "SELECT message, message_type, created_at FROM messages WHERE sender_id = %s ORDER BY created_at DESC LIMIT 10",
-        (st.session_state.user_id,),
+        "SELECT message, message_type, created_at FROM messages WHERE sender_id = %s ORDER BY created_at DESC LIMIT %s",
+        (st.session_state.user_id, RECENT_SENT_LIMIT),
         fetch=True
     )
     
     if recent_sent:
-        for message_text, msg_type, created_at in recent_sent:
-            st.markdown(f"""
-            **{msg_type.replace('_', ' ').title()}** - {format_datetime(created_at)}
-            > {message_text[:100]}{'...' if len(message_text) > 100 else ''}
-            """)
+        render_table(
+            [(created_at, msg_type.replace('_', ' ').title(), message_text)
+             for message_text, msg_type, created_at in recent_sent],
+            ["Time", "Type", "Message"],
+            key="recent_sent",
+            filter_columns=["Type", "Message"],
+            column_config={
+                "Time": st.column_config.DatetimeColumn("Time", format="YYYY-MM-DD HH:mm"),
+                "Message": st.column_config.TextColumn("Message", width="large")
+            }
+        )
     else:
         st.info("No recent messages sent.")
 
@@ -307,6 +421,44 @@ def government_messaging_interface():
     """Messaging interface for government officials"""
     st.write("Monitor communication patterns and send official emergency broadcasts")
     
+    communication_statistics_panel()
+    
+    st.divider()
+    
+    official_broadcast_panel()
+    
+    st.divider()
+    
+    recent_activity_panel()
+    
+    # Communication guidelines
+    st.subheader("📋 Government Communication Guidelines")
+    
+    with st.expander("Official Broadcasting Guidelines"):
+        st.markdown("""
+        **When to send official broadcasts:**
+        - Immediate threats to public safety
+        - Evacuation orders or shelter-in-place instructions  
+        - Critical infrastructure failures
+        - Weather warnings and updates
+        - All-clear notifications after emergency ends
+        
+        **Message formatting requirements:**
+        - Clear, concise, and actionable language
+        - Specific geographic areas affected
+        - Official contact information included
+        - Time-sensitive information clearly marked
+        - Multiple language versions for diverse populations
+        
+        **Priority levels:**
+        - **HIGH:** Immediate life-threatening situations
+        - **MEDIUM:** Significant safety concerns
+        - **LOW:** General information and updates
+        """)
+
+@st.fragment
+def communication_statistics_panel():
+    """Message and rescue team counts"""
     # Communication statistics
     st.subheader("📊 Communication Statistics")
     
@@ -326,9 +478,10 @@ def government_messaging_interface():
     with col4:
         active_rescue_teams = execute_query("SELECT COUNT(*) FROM users WHERE role = 'rescue_team'", fetch=True)[0][0] if execute_query("SELECT COUNT(*) FROM users WHERE role = 'rescue_team'", fetch=True) else 0
         st.metric("Active Rescue Teams", active_rescue_teams)
-    
-    st.divider()
-    
+
+@st.fragment
+def official_broadcast_panel():
+    """Official broadcast form; submitting reruns only this panel"""
     # Official broadcast section
     st.subheader("📢 Send Official Emergency Broadcast")
     
@@ -399,12 +552,24 @@ Issued by: Telangana Emergency Management
 Contact Emergency Operations Center: +91-40-2345-1111
 """
                 
-                result = send_message(
-                    st.session_state.user_id,
-                    None,  # Broadcast to all
-                    official_message,
-                    "alert"
-                )
+                geofence = None if "All Hyderabad" in area_affected else area_geofence(area_affected)
+                if geofence:
+                    # Deliver only to citizens last seen in the selected areas
+                    result, delivered = send_geofenced_message(
+                        st.session_state.user_id,
+                        official_message,
+                        "alert",
+                        geofence
+                    )
+                    if result:
+                        st.info(f"📍 Delivered to {delivered} citizen(s) in the selected areas")
+                else:
+                    result = send_message(
+                        st.session_state.user_id,
+                        None,  # Broadcast to all
+                        official_message,
+                        "alert"
+                    )
                 
                 if result:
                     st.success("✅ Official broadcast sent successfully!")
@@ -413,9 +578,10 @@ Contact Emergency Operations Center: +91-40-2345-1111
                     st.error("❌ Failed to send broadcast. Please try again.")
             else:
                 st.error("Please enter a broadcast message.")
-    
-    st.divider()
-    
+
+@st.fragment
+def recent_activity_panel():
+    """Latest messages across all users"""
     # Recent activity monitoring
     st.subheader("📊 Recent Communication Activity")
     
@@ -444,28 +610,3 @@ Contact Emergency Operations Center: +91-40-2345-1111
         st.dataframe(df, use_container_width=True)
     else:
         st.info("No recent communication activity.")
-    
-    # Communication guidelines
-    st.subheader("📋 Government Communication Guidelines")
-    
-    with st.expander("Official Broadcasting Guidelines"):
-        st.markdown("""
-        **When to send official broadcasts:**
-        - Immediate threats to public safety
-        - Evacuation orders or shelter-in-place instructions  
-        - Critical infrastructure failures
-        - Weather warnings and updates
-        - All-clear notifications after emergency ends
-        
-        **Message formatting requirements:**
-        - Clear, concise, and actionable language
-        - Specific geographic areas affected
-        - Official contact information included
-        - Time-sensitive information clearly marked
-        - Multiple language versions for diverse populations
-        
-        **Priority levels:**
-        - **HIGH:** Immediate life-threatening situations
-        - **MEDIUM:** Significant safety concerns
-        - **LOW:** General information and updates
-        """)
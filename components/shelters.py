@@ -1,6 +1,7 @@
 import streamlit as st
-from database import get_shelters
+from database import get_shelters, update_shelter
 from utils import get_status_emoji, get_status_color, format_phone_number
+from components.data_table import render_table
 
 def shelters_page():
     """Shelters page showing available emergency shelters"""
@@ -14,45 +15,6 @@ def shelters_page():
         st.error("Unable to load shelter information. Please try again later.")
         return
     
-    # Filter and sort options
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        status_filter = st.selectbox(
-            "Filter by Availability",
-            ["all", "available", "limited", "full"],
-            format_func=lambda x: {
-                "all": "All Shelters",
-                "available": "Available",
-                "limited": "Limited Space",
-                "full": "Full"
-            }[x]
-        )
-    
-    with col2:
-        sort_by = st.selectbox(
-            "Sort by",
-            ["name", "capacity", "occupancy_rate"],
-            format_func=lambda x: {
-                "name": "Name",
-                "capacity": "Capacity",
-                "occupancy_rate": "Occupancy Rate"
-            }[x]
-        )
-    
-    # Filter shelters
-    filtered_shelters = shelters
-    if status_filter != "all":
-        filtered_shelters = [s for s in shelters if s[7] == status_filter]
-    
-    # Sort shelters
-    if sort_by == "name":
-        filtered_shelters = sorted(filtered_shelters, key=lambda x: x[1])
-    elif sort_by == "capacity":
-        filtered_shelters = sorted(filtered_shelters, key=lambda x: x[5], reverse=True)
-    elif sort_by == "occupancy_rate":
-        filtered_shelters = sorted(filtered_shelters, key=lambda x: (x[6]/x[5] if x[5] > 0 else 0))
-    
     # Summary statistics
     st.subheader("📊 Shelter Summary")
     
@@ -74,65 +36,55 @@ def shelters_page():
     
     st.divider()
     
-    # Display shelters
-    st.subheader(f"📋 Shelter List ({len(filtered_shelters)} shelters)")
+    # Shelter list as a single table; selecting a row opens its details below
+    st.subheader("📋 Shelter List")
     
-    if not filtered_shelters:
-        st.warning("No shelters match your current filter criteria.")
-        return
+    status_filter = st.selectbox(
+        "Filter by Availability",
+        ["all", "available", "limited", "full"],
+        format_func=lambda x: {
+            "all": "All Shelters",
+            "available": "Available",
+            "limited": "Limited Space",
+            "full": "Full"
+        }[x]
+    )
     
+    filtered_shelters = shelters
+    if status_filter != "all":
+        filtered_shelters = [s for s in shelters if s[7] == status_filter]
+    
+    rows = []
     for shelter in filtered_shelters:
         shelter_id, name, address, lat, lon, capacity, occupancy, status, contact, facilities, updated_at = shelter
-        
-        # Calculate occupancy rate
         occupancy_rate = (occupancy / capacity * 100) if capacity > 0 else 0
-        
-        # Status color and emoji
-        status_emoji = get_status_emoji(status)
-        status_color = get_status_color(status)
-        
-        # Create expandable container for each shelter
-        with st.expander(f"{status_emoji} {name} - {status.title()}", expanded=False):
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                st.markdown(f"""
-                **📍 Address:** {address}
-                
-                **📞 Contact:** {format_phone_number(contact)}
-                
-                **👥 Capacity:** {occupancy}/{capacity} people ({occupancy_rate:.1f}% full)
-                
-                **🛠️ Facilities:** {facilities}
-                
-                **⏰ Last Updated:** {updated_at.strftime('%Y-%m-%d %H:%M') if updated_at else 'N/A'}
-                """)
-                
-                # Status-specific information
-                if status == 'available':
-                    st.success(f"✅ {capacity - occupancy} spaces available")
-                elif status == 'limited':
-                    st.warning(f"⚠️ Limited space: {capacity - occupancy} spaces left")
-                else:
-                    st.error("❌ No spaces currently available")
-            
-            with col2:
-                # Progress bar for occupancy
-                st.metric("Occupancy Rate", f"{occupancy_rate:.1f}%")
-                st.progress(occupancy_rate / 100)
-                
-                # Quick action buttons
-                if st.session_state.user_role == "rescue_team":
-                    if st.button(f"Update {name}", key=f"update_{shelter_id}"):
-                        st.info("Shelter update feature would be implemented here")
-                
-                # Directions button (placeholder)
-                if st.button(f"Get Directions", key=f"directions_{shelter_id}"):
-                    if lat and lon:
-                        maps_url = f"https://www.google.com/maps/dir/?api=1&destination={lat},{lon}"
-                        st.markdown(f"[Open in Google Maps]({maps_url})")
-                    else:
-                        st.error("Location coordinates not available")
+        rows.append((shelter_id, f"{get_status_emoji(status)} {status.title()}", name, address,
+                     occupancy_rate, capacity, capacity - occupancy, format_phone_number(contact), facilities))
+    
+    selected = render_table(
+        rows,
+        ["ID", "Status", "Name", "Address", "Occupancy", "Capacity", "Free Spaces", "Contact", "Facilities"],
+        key="shelters",
+        filter_columns=["Name", "Address", "Facilities"],
+        sort_options={
+            "Name": ("Name", True),
+            "Capacity": ("Capacity", False),
+            "Occupancy Rate": ("Occupancy", True)
+        },
+        column_config={
+            "ID": None,
+            "Occupancy": st.column_config.ProgressColumn("Occupancy", format="%.1f%%", min_value=0, max_value=100)
+        },
+        selectable=True,
+        id_column="ID",
+        empty_message="No shelters match your current filter criteria."
+    )
+    
+    if selected is None:
+        st.caption("👆 Select a shelter to see details, directions and actions")
+    else:
+        shelter = next(s for s in filtered_shelters if s[0] == selected["ID"])
+        shelter_details(shelter)
     
     st.divider()
     
@@ -182,3 +134,70 @@ def shelters_page():
     
     # Map integration notice
     st.info("💡 **Tip:** Visit the Emergency Map section to see shelter locations and get visual directions.")
+
+def shelter_details(shelter):
+    """Details, occupancy and actions for one shelter"""
+    shelter_id, name, address, lat, lon, capacity, occupancy, status, contact, facilities, updated_at = shelter
+    
+    # Calculate occupancy rate
+    occupancy_rate = (occupancy / capacity * 100) if capacity > 0 else 0
+    status_emoji = get_status_emoji(status)
+    
+    st.markdown(f"#### {status_emoji} {name} - {status.title()}")
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        st.markdown(f"""
+        **📍 Address:** {address}
+        
+        **📞 Contact:** {format_phone_number(contact)}
+        
+        **👥 Capacity:** {occupancy}/{capacity} people ({occupancy_rate:.1f}% full)
+        
+        **🛠️ Facilities:** {facilities}
+        
+        **⏰ Last Updated:** {updated_at.strftime('%Y-%m-%d %H:%M') if updated_at else 'N/A'}
+        """)
+        
+        # Status-specific information
+        if status == 'available':
+            st.success(f"✅ {capacity - occupancy} spaces available")
+        elif status == 'limited':
+            st.warning(f"⚠️ Limited space: {capacity - occupancy} spaces left")
+        else:
+            st.error("❌ No spaces currently available")
+    
+    with col2:
+        # Progress bar for occupancy
+        st.metric("Occupancy Rate", f"{occupancy_rate:.1f}%")
+        st.progress(min(occupancy_rate / 100, 1.0))
+        
+        # Quick action buttons
+        if st.session_state.user_role == "rescue_team":
+            with st.popover(f"Update {name}"):
+                statuses = ["available", "limited", "full"]
+                new_occupancy = st.number_input(
+                    "Current occupancy",
+                    min_value=0,
+                    value=occupancy,
+                    key=f"occupancy_{shelter_id}"
+                )
+                new_status = st.selectbox(
+                    "Status",
+                    statuses,
+                    index=statuses.index(status) if status in statuses else 0,
+                    key=f"status_{shelter_id}"
+                )
+                if st.button("Save", key=f"update_{shelter_id}"):
+                    if update_shelter(shelter_id, new_occupancy, new_status):
+                        st.success("Shelter updated")
+                        st.rerun()
+                    else:
+                        st.error("Failed to update shelter")
+        
+        # Directions link
+        if lat and lon:
+            maps_url = f"https://www.google.com/maps/dir/?api=1&destination={lat},{lon}"
+            st.link_button("Get Directions", maps_url)
+        else:
+            st.error("Location coordinates not available")
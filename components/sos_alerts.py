@@ -1,6 +1,9 @@
 import streamlit as st
 from datetime import datetime
-from database import create_sos_alert, get_active_sos_alerts, send_message
+from database import get_active_sos_alerts, send_sos_response, get_alert_thread, get_alert_response_counts
+from components.live_updates import live_refresh, follow_zone
+from components.data_table import render_table
+from write_queue import submit_sos_alert, WriteQueueFull
 from utils import get_hyderabad_coordinates, create_alert_box, format_datetime, get_rescue_team_responses
 
 def sos_alerts_page():
@@ -119,16 +122,23 @@ IMMEDIATE DANGERS: {', '.join(dangers) if dangers else 'None specified'}
 DETAILS: {message}
 """
             
-            # Submit SOS alert
-            result = create_sos_alert(
-                st.session_state.user_id,
-                location,
-                latitude,
-                longitude,
-                full_message
-            )
+            # Submit SOS alert; it is saved as soon as the write queue acknowledges it
+            try:
+                result = submit_sos_alert(
+                    st.session_state.user_id,
+                    location,
+                    latitude,
+                    longitude,
+                    full_message
+                )
+            except WriteQueueFull:
+                st.error("The system is receiving a very high number of alerts. Please press send again, or call emergency services directly.")
+                return
+            except OSError:
+                result = None
             
             if result:
+                follow_zone(latitude, longitude)
                 st.success("🚨 SOS ALERT SENT SUCCESSFULLY!")
                 st.balloons()
                 
@@ -154,6 +164,9 @@ def rescue_team_sos_interface():
     """SOS interface for rescue teams"""
     st.write("Monitor and respond to active SOS alerts from flood victims")
     
+    # Rerun only when new alerts or responses arrive
+    live_refresh(("sos_alerts", "messages"), "rescue_sos")
+    
     # Get active SOS alerts
     sos_alerts = get_active_sos_alerts()
     
@@ -163,100 +176,178 @@ def rescue_team_sos_interface():
     
     st.subheader(f"🚨 Active SOS Alerts ({len(sos_alerts)})")
     
+    # Compact queue rows; response widgets are only built for the selected alert
+    response_counts = get_alert_response_counts([alert[0] for alert in sos_alerts])
+    drafts = st.session_state.setdefault("sos_drafts", {})
+    
+    queue_rows = []
     for alert in sos_alerts:
-        alert_id, username, location, lat, lon, message, created_at = alert
+        alert_id, username, location, lat, lon, message, created_at, reporter_id = alert
+        queue_rows.append((
+            alert_id,
+            created_at,
+            location,
+            username,
+            get_emergency_type(message),
+            response_counts.get(alert_id, 0),
+            "✏️" if drafts.get(alert_id) else ""
+        ))
+    
+    # The selection follows the alert id, so new alerts and re-sorting keep the open alert
+    selected = render_table(
+        queue_rows,
+        ["Alert", "Time", "Location", "Reporter", "Type", "Responses", "Draft"],
+        key="rescue_sos_queue",
+        filter_columns=["Location", "Reporter", "Type"],
+        sort_options={"Oldest first": ("Time", True), "Newest first": ("Time", False), "Unanswered first": ("Responses", True)},
+        column_config={"Time": st.column_config.DatetimeColumn("Time", format="YYYY-MM-DD HH:mm")},
+        selectable=True,
+        id_column="Alert"
+    )
+    
+    if selected is None:
+        st.caption("👆 Select an alert in the queue to view details and respond")
+        return
+    
+    alert = next(a for a in sos_alerts if a[0] == selected["Alert"])
+    sos_alert_card(alert, get_alert_thread(alert[0]))
+
+def get_emergency_type(message):
+    """Read the emergency type line written by the citizen SOS form"""
+    return next(
+        (line.replace('EMERGENCY TYPE: ', '') for line in message.splitlines() if line.startswith('EMERGENCY TYPE:')),
+        'General'
+    )
+
+def draft_key(alert_id, field):
+    """Widget key for part of a response draft, restoring the draft if the widget was unmounted.
+
+    Streamlit discards a widget's state once it is not rendered, so drafts are
+    copied to st.session_state.sos_drafts and put back when the alert is reselected.
+    """
+    key = f"{field}_{alert_id}"
+    draft = st.session_state.setdefault("sos_drafts", {}).get(alert_id, {})
+    if key not in st.session_state and key in draft:
+        st.session_state[key] = draft[key]
+    return key
+
+def save_draft(alert_id, *keys):
+    """Copy the current values of response widgets into the alert's draft"""
+    st.session_state.sos_drafts[alert_id] = {key: st.session_state[key] for key in keys if st.session_state.get(key)}
+
+@st.fragment
+def sos_alert_card(alert, thread):
+    """The selected SOS alert with its response widgets; reruns on its own when those widgets change"""
+    alert_id, username, location, lat, lon, message, created_at, reporter_id = alert
+    
+    with st.container(border=True):
+        st.markdown(f"#### 🆘 SOS Alert from {username} - {location}")
+        col1, col2 = st.columns([2, 1])
         
-        with st.expander(f"🆘 SOS Alert from {username} - {location}", expanded=True):
-            col1, col2 = st.columns([2, 1])
+        with col1:
+            st.markdown(f"""
+            **👤 Reporter:** {username}
+            **📍 Location:** {location}
+            **📌 Coordinates:** {lat:.6f}, {lon:.6f}
+            **⏰ Time:** {format_datetime(created_at)}
             
-            with col1:
-                st.markdown(f"""
-                **👤 Reporter:** {username}
-                **📍 Location:** {location}
-                **📌 Coordinates:** {lat:.6f}, {lon:.6f}
-                **⏰ Time:** {format_datetime(created_at)}
-                
-                **💬 Emergency Details:**
-                {message}
-                """)
-                
-                # Map link
-                if lat and lon:
-                    maps_url = f"https://www.google.com/maps/dir/?api=1&destination={lat},{lon}"
-                    st.markdown(f"[📍 Open location in Google Maps]({maps_url})")
+            **💬 Emergency Details:**
+            {message}
+            """)
+            
+            # Map link
+            if lat and lon:
+                maps_url = f"https://www.google.com/maps/dir/?api=1&destination={lat},{lon}"
+                st.markdown(f"[📍 Open location in Google Maps]({maps_url})")
             
-            with col2:
-                st.subheader("📞 Quick Response")
+            display_alert_thread(thread)
+        
+        with col2:
+            st.subheader("📞 Quick Response")
+            
+            # Predefined responses
+            type_key = draft_key(alert_id, "response_type")
+            response_type = st.selectbox(
+                "Response Type",
+                ["dispatch", "info_request", "safety_advice", "custom"],
+                format_func=lambda x: {
+                    "dispatch": "🚁 Dispatch rescue team",
+                    "info_request": "❓ Request more information",
+                    "safety_advice": "🛡️ Provide safety advice",
+                    "custom": "✏️ Custom message"
+                }[x],
+                key=type_key
+            )
+            
+            if response_type != "custom":
+                if response_type == "dispatch":
+                    predefined_messages = [
+                        "🚁 Rescue team dispatched to your location, ETA 15-20 minutes",
+                        "🛟 Boat rescue team en route, please stay visible",
+                        "⚡ Emergency response team activated, help is coming",
+                        "🏥 Medical rescue team dispatched with necessary equipment"
+                    ]
+                elif response_type == "info_request":
+                    predefined_messages = [
+                        "📍 Can you provide more specific location details?",
+                        "👥 How many people need rescue?",
+                        "🏥 Are there any medical emergencies?",
+                        "🌊 What is the current water level at your location?"
+                    ]
+                else:  # safety_advice
+                    predefined_messages = [
+                        "🛡️ Stay where you are, avoid moving through flood water",
+                        "🔋 Conserve phone battery, help is on the way",
+                        "📢 Make noise periodically to help us locate you",
+                        "⬆️ Move to higher ground if it's safe to do so"
+                    ]
                 
-                # Predefined responses
-                response_type = st.selectbox(
-                    "Response Type",
-                    ["dispatch", "info_request", "safety_advice", "custom"],
-                    format_func=lambda x: {
-                        "dispatch": "🚁 Dispatch rescue team",
-                        "info_request": "❓ Request more information",
-                        "safety_advice": "🛡️ Provide safety advice",
-                        "custom": "✏️ Custom message"
-                    }[x],
-                    key=f"response_type_{alert_id}"
+                message_key = draft_key(alert_id, f"predefined_msg_{response_type}")
+                response_message = st.selectbox(
+                    "Select message",
+                    predefined_messages,
+                    key=message_key
                 )
-                
-                if response_type != "custom":
-                    if response_type == "dispatch":
-                        predefined_messages = [
-                            "🚁 Rescue team dispatched to your location, ETA 15-20 minutes",
-                            "🛟 Boat rescue team en route, please stay visible",
-                            "⚡ Emergency response team activated, help is coming",
-                            "🏥 Medical rescue team dispatched with necessary equipment"
-                        ]
-                    elif response_type == "info_request":
-                        predefined_messages = [
-                            "📍 Can you provide more specific location details?",
-                            "👥 How many people need rescue?",
-                            "🏥 Are there any medical emergencies?",
-                            "🌊 What is the current water level at your location?"
-                        ]
-                    else:  # safety_advice
-                        predefined_messages = [
-                            "🛡️ Stay where you are, avoid moving through flood water",
-                            "🔋 Conserve phone battery, help is on the way",
-                            "📢 Make noise periodically to help us locate you",
-                            "⬆️ Move to higher ground if it's safe to do so"
-                        ]
-                    
-                    selected_message = st.selectbox(
-                        "Select message",
-                        predefined_messages,
-                        key=f"predefined_msg_{alert_id}"
-                    )
-                    response_message = selected_message
-                else:
-                    response_message = st.text_area(
-                        "Custom response",
-                        placeholder="Type your custom response...",
-                        key=f"custom_msg_{alert_id}"
+            else:
+                message_key = draft_key(alert_id, "custom_msg")
+                response_message = st.text_area(
+                    "Custom response",
+                    placeholder="Type your custom response...",
+                    key=message_key
+                )
+            
+            save_draft(alert_id, type_key, message_key)
+            
+            if st.button(f"Send Response", key=f"send_response_{alert_id}"):
+                if response_message:
+                    # Send to the reporter and anyone with a co-located active alert
+                    result = send_sos_response(
+                        st.session_state.user_id,
+                        alert_id,
+                        f"RESCUE TEAM RESPONSE to your SOS alert:\n\n{response_message}"
                     )
-                
-                if st.button(f"Send Response", key=f"send_response_{alert_id}"):
-                    if response_message:
-                        # Send message to the user who created the SOS alert
-                        # Note: We'd need to get the user_id from the username
-                        # For now, we'll broadcast the message
-                        result = send_message(
-                            st.session_state.user_id,
-                            None,  # Broadcast to all or specific user
-                            f"RESCUE TEAM RESPONSE to your SOS alert:\n\n{response_message}",
-                            "sos_response",
-                            alert_id
-                        )
-                        
-                        if result:
-                            st.success("✅ Response sent!")
-                        else:
-                            st.error("Failed to send response")
+                    
+                    if result:
+                        st.session_state.sos_drafts.pop(alert_id, None)
+                        st.success(f"✅ Response sent to {result} citizen(s)!")
                     else:
-                        st.error("Please enter a response message")
+                        st.error("Failed to send response")
+                else:
+                    st.error("Please enter a response message")
+
+def display_alert_thread(thread):
+    """Show the rescue responses already sent for an SOS alert"""
+    if not thread:
+        st.caption("💬 No responses sent yet")
+        return
+    
+    st.write(f"**💬 Response Thread ({len(thread)})**")
+    for message_id, sender_name, response, sent_at in thread:
+        # Drop the "RESCUE TEAM RESPONSE" header line added when sending
+        body = response.split("\n\n", 1)[-1]
+        st.markdown(f"> **{sender_name}** · {format_datetime(sent_at)}  \n> {body}")
 
+@st.fragment
 def government_sos_interface():
     """SOS interface for government officials"""
     st.write("Monitor SOS alert statistics and overall emergency response coordination")
@@ -281,32 +372,34 @@ def government_sos_interface():
     if sos_alerts:
         st.subheader("📊 SOS Alerts Overview")
         
-        # Create a simple table view for government monitoring
-        alert_data = []
+        # One table payload for all alerts
+        alert_rows = []
         for alert in sos_alerts:
-            alert_id, username, location, lat, lon, message, created_at = alert
-            alert_data.append({
-                "Time": format_datetime(created_at),
-                "Location": location,
-                "Reporter": username,
-                "Type": message.split('\n')[0].replace('EMERGENCY TYPE: ', '') if 'EMERGENCY TYPE:' in message else 'General',
-                "Status": "Active"
-            })
+            alert_id, username, location, lat, lon, message, created_at, reporter_id = alert
+            alert_rows.append((alert_id, created_at, location, username, get_emergency_type(message), "Active"))
         
-        import pandas as pd
-        df = pd.DataFrame(alert_data)
-        st.dataframe(df, use_container_width=True)
+        render_table(
+            alert_rows,
+            ["Alert", "Time", "Location", "Reporter", "Type", "Status"],
+            key="government_sos",
+            filter_columns=["Location", "Reporter", "Type"],
+            sort_options={"Newest first": ("Time", False), "Oldest first": ("Time", True), "Location": ("Location", True)},
+            column_config={"Time": st.column_config.DatetimeColumn("Time", format="YYYY-MM-DD HH:mm:ss")}
+        )
         
         # Geographic distribution
         st.subheader("📍 Geographic Distribution")
-        if sos_alerts:
-            locations = [alert[2] for alert in sos_alerts]
-            location_counts = {}
-            for loc in locations:
-                area = loc.split(',')[0] if ',' in loc else loc
-                location_counts[area] = location_counts.get(area, 0) + 1
-            
-            for area, count in location_counts.items():
-                st.write(f"**{area}:** {count} alert(s)")
+        location_counts = {}
+        for alert in sos_alerts:
+            loc = alert[2]
+            area = loc.split(',')[0] if ',' in loc else loc
+            location_counts[area] = location_counts.get(area, 0) + 1
+        
+        render_table(
+            sorted(location_counts.items(), key=lambda item: item[1], reverse=True),
+            ["Area", "Alerts"],
+            key="government_sos_areas",
+            height=250
+        )
     else:
         st.success("✅ No active SOS alerts - situation under control")
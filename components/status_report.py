@@ -1,5 +1,6 @@
 import streamlit as st
-from database import create_status_report
+from write_queue import submit_status_report, WriteQueueFull
+from components.live_updates import follow_zone
 from utils import process_uploaded_image, create_alert_box, get_hyderabad_coordinates
 
 def status_report_page():
@@ -95,18 +96,25 @@ def status_report_page():
             if uploaded_file is not None:
                 photo_data = process_uploaded_image(uploaded_file)
             
-            # Submit to database
-            result = create_status_report(
-                st.session_state.user_id,
-                status,
-                location,
-                latitude,
-                longitude,
-                description,
-                photo_data
-            )
+            # Submit through the write queue; the report is saved once acknowledged
+            try:
+                result = submit_status_report(
+                    st.session_state.user_id,
+                    status,
+                    location,
+                    latitude,
+                    longitude,
+                    description,
+                    photo_data
+                )
+            except WriteQueueFull:
+                st.error("The system is receiving a very high number of reports. Please submit again in a moment.")
+                return
+            except OSError:
+                result = None
             
             if result:
+                follow_zone(latitude, longitude)
                 status_text = {
                     "safe": "✅ Safe status reported successfully!",
                     "help": "⚠️ Help request submitted! Rescue teams have been notified.",
@@ -0,0 +1,217 @@
+import os
+import re
+import csv
+import time
+import shutil
+import secrets
+import zipfile
+import argparse
+from datetime import date, timedelta
+from database import ARCHIVED_TABLES, execute_query, stream_query
+
+# Each export is written to its own directory under here
+EXPORT_ROOT = "exports"
+# Finished exports are removed after this many seconds
+EXPORT_RETENTION_SECONDS = 3600
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Dataset -> (SELECT ... FROM ..., timestamp column filtered by the date range or None)
+# Shelters and roads are current-state tables, so they are exported whole.
+EXPORT_DATASETS = {
+    "sos_alerts": (
+        "SELECT s.id, s.user_id, u.username, s.location, s.latitude, s.longitude, s.message, s.status, s.created_at "
+        "FROM sos_alerts s LEFT JOIN users u ON s.user_id = u.id",
+        "s.created_at",
+    ),
+    "status_reports": (
+        "SELECT s.id, s.user_id, u.username, s.status, s.location, s.latitude, s.longitude, s.description, "
+        "{photo_column} s.created_at "
+        "FROM status_reports s LEFT JOIN users u ON s.user_id = u.id",
+        "s.created_at",
+    ),
+    "messages": (
+        "SELECT m.id, m.sender_id, m.recipient_id, m.alert_id, m.message_type, m.message, m.geofence, m.created_at "
+        "FROM messages m",
+        "m.created_at",
+    ),
+    "shelters": (
+        "SELECT id, name, address, latitude, longitude, capacity, current_occupancy, status, contact_number, facilities, updated_at "
+        "FROM shelters",
+        None,
+    ),
+    "roads": (
+        "SELECT id, name, status, description, latitude, longitude, updated_at FROM roads",
+        None,
+    ),
+}
+
+def build_export_query(dataset, start_date, end_date, include_images=False, include_archived=False):
+    """Return (query, params, count query) for a dataset over an inclusive date range.
+
+    With include_archived, rows retention.py moved to the dataset's archive
+    table are exported too; the date filter still prunes archive partitions.
+    """
+    select, time_column = EXPORT_DATASETS[dataset]
+    select = select.replace("{photo_column}", "s.photo_path, " if include_images else "")
+    if include_archived and dataset in ARCHIVED_TABLES:
+        alias = time_column.split(".")[0]
+        columns = ", ".join(sorted(set(re.findall(rf"\b{alias}\.(\w+)", select))))
+        select = select.replace(
+            f"FROM {dataset} {alias}",
+            f"FROM (SELECT {columns} FROM {dataset} UNION ALL SELECT {columns} FROM {dataset}_archive) {alias}"
+        )
+    if time_column is None:
+        return f"{select} ORDER BY id", (), f"SELECT COUNT(*) FROM ({select}) export"
+    where = f" WHERE {time_column} >= %s AND {time_column} < %s"
+    params = (start_date, end_date + timedelta(days=1))
+    order_column = time_column.split(".")[0] + ".id"
+    return (
+        f"{select}{where} ORDER BY {order_column}",
+        params,
+        f"SELECT COUNT(*) FROM ({select}{where}) export",
+    )
+
+class CsvChunkWriter:
+    """Appends row chunks to a CSV file, created with its header on the first chunk"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.writer = None
+
+    def write(self, description, rows):
+        if self.writer is None:
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow([column[0] for column in description])
+        self.writer.writerows(rows)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+class ParquetChunkWriter:
+    """Appends row chunks to a Parquet file, one row group per chunk"""
+
+    # PostgreSQL type OIDs -> Arrow types; anything else is written as text
+    ARROW_TYPES = {16: "bool_", 20: "int64", 21: "int32", 23: "int32", 700: "float32", 701: "float64", 1082: "date32"}
+    TIMESTAMP_OIDS = (1114, 1184)
+
+    def __init__(self, path):
+        # pyarrow ships with Streamlit but is only needed for Parquet exports
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.writer = None
+        self.schema = None
+
+    def _schema(self, description):
+        fields = []
+        for column in description:
+            name, type_code = column[0], column[1]
+            if type_code in self.TIMESTAMP_OIDS:
+                arrow_type = self.pa.timestamp("us")
+            elif type_code in self.ARROW_TYPES:
+                arrow_type = getattr(self.pa, self.ARROW_TYPES[type_code])()
+            else:
+                arrow_type = self.pa.string()
+            fields.append(self.pa.field(name, arrow_type))
+        return self.pa.schema(fields)
+
+    def write(self, description, rows):
+        if self.writer is None:
+            self.schema = self._schema(description)
+            self.writer = self.pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        columns = list(zip(*rows))
+        arrays = []
+        for field, values in zip(self.schema, columns):
+            if self.pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+def export_dataset(dataset, path, start_date, end_date, file_format="csv", include_images=False, progress=None,
+                   include_archived=False):
+    """Stream one dataset to a file with a server-side cursor; returns rows written.
+
+    progress, if given, is called as progress(dataset, rows_written, total_rows)
+    after every fetched chunk.
+    """
+    query, params, count_query = build_export_query(dataset, start_date, end_date, include_images, include_archived)
+    total = execute_query(count_query, params, fetch=True)
+    total = total[0][0] if total else 0
+
+    writer = ParquetChunkWriter(path) if file_format == "parquet" else CsvChunkWriter(path)
+    written = 0
+    try:
+        for description, rows in stream_query(query, params):
+            writer.write(description, rows)
+            written += len(rows)
+            if progress:
+                progress(dataset, written, total)
+    finally:
+        writer.close()
+    return written
+
+def export_data(datasets, start_date, end_date, file_format="csv", include_images=False, progress=None, out_dir=None,
+                include_archived=False):
+    """Export datasets to one zip file; returns (zip path, {dataset: rows})"""
+    if out_dir is None:
+        prune_exports()
+        out_dir = os.path.join(EXPORT_ROOT, secrets.token_urlsafe(16))
+    os.makedirs(out_dir, exist_ok=True)
+
+    counts = {}
+    extension = "parquet" if file_format == "parquet" else "csv"
+    zip_path = os.path.join(out_dir, f"floodaid_export_{start_date}_{end_date}.zip")
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for dataset in datasets:
+            file_path = os.path.join(out_dir, f"{dataset}.{extension}")
+            counts[dataset] = export_dataset(dataset, file_path, start_date, end_date, file_format, include_images, progress,
+                                             include_archived)
+            # Datasets with no rows in the range produce no file
+            if os.path.exists(file_path):
+                # zipfile copies the file in blocks, so this stays constant-memory too
+                archive.write(file_path, arcname=os.path.basename(file_path))
+                os.remove(file_path)
+    return zip_path, counts
+
+def prune_exports(max_age=EXPORT_RETENTION_SECONDS):
+    """Delete export directories older than max_age seconds"""
+    if not os.path.isdir(EXPORT_ROOT):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(EXPORT_ROOT):
+        path = os.path.join(EXPORT_ROOT, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export emergency data as CSV or Parquet")
+    parser.add_argument("datasets", nargs="+", choices=sorted(EXPORT_DATASETS))
+    parser.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=7))
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--include-images", action="store_true", help="include status report photo data")
+    parser.add_argument("--include-archived", action="store_true", help="include rows moved to the archive tables")
+    parser.add_argument("--out", default=EXPORT_ROOT)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    last_report = [0.0]
+
+    def report(dataset, written, total):
+        if time.perf_counter() - last_report[0] > 1 or written == total:
+            last_report[0] = time.perf_counter()
+            print(f"{dataset}: {written}/{total} rows", flush=True)
+
+    zip_path, counts = export_data(args.datasets, args.start, args.end, args.format, args.include_images, report, args.out,
+                                   args.include_archived)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {zip_path}: {sum(counts.values())} rows in {elapsed:.1f}s")
@@ -1,8 +1,53 @@
 conn = None
 import sqlite3
+import io
 import os
-from datetime import datetime
+import csv
+import time
+import logging
+from datetime import datetime, timedelta
+import psycopg2
 import streamlit as st
+from utils import get_zone
+from event_bus import publish, role_topic, zone_topic, alert_topic, user_topic
+from cache import get_cache, dumps_rows, loads_rows
+from query_stats import record_query
+from metrics import SOS_ALERTS, STATUS_REPORTS
+from geofence import geofence_to_json, circle_geofence, geofence_bbox, geofence_contains
+
+# Message types shown in the inbox
+MESSAGE_TYPES = ('sos_response', 'general', 'alert')
+INBOX_PAGE_SIZE = 20
+# Unread counts are capped so counting never scans more than this per type
+UNREAD_COUNT_CAP = 99
+UNREAD_CACHE_TTL = 30
+# Active SOS alerts this close to a responded alert are treated as the same incident
+COLOCATED_RADIUS_KM = 0.2
+# Rows per multi-row INSERT when fanning out deliveries or bulk loading
+BATCH_INSERT_SIZE = 1000
+# Rows fetched per round trip when streaming large results
+EXPORT_FETCH_SIZE = 5000
+# Tables retention.py archives, with the column their archived row counts are grouped by
+ARCHIVED_TABLES = {'sos_alerts': 'status', 'status_reports': 'status', 'messages': 'message_type'}
+
+# Tables partitioned by day of created_at, and how many days ahead partitions are created
+PARTITIONED_TABLES = ('sos_alerts', 'status_reports')
+# Tables whose rows report where their user is (see user_last_location)
+LOCATION_TABLES = ('sos_alerts', 'status_reports')
+PARTITION_DAYS_AHEAD = 7
+
+# Set once init_database has created/migrated the schema in this process
+_schema_ready = False
+# Database clock minus this process's clock, measured on first use by db_now
+_db_clock_offset = None
+
+# user_id -> (cached_at, {message_type: unread_count})
+_unread_cache = {}
+
+logger = logging.getLogger(__name__)
+
+class DatabaseUnavailable(Exception):
+    """Raised by the batch writers when the database cannot be reached (as opposed to a bad row)"""
 
 def get_connection():
     """Get database connection using environment variables"""
@@ -14,7 +59,11 @@ def get_connection():
         return None
 
 def init_database():
-    """Initialize database tables"""
+    """Initialize database tables (once per process; app.py calls this on every rerun)"""
+    global _schema_ready
+    if _schema_ready:
+        return True
+    
     conn = get_connection()
     if not conn:
         return False
@@ -33,33 +82,25 @@ def init_database():
             )
         """)
         
-        # Status reports table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS status_reports (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id),
-                status VARCHAR(20) NOT NULL,
-                location VARCHAR(255),
-                latitude FLOAT,
-                longitude FLOAT,
-                description TEXT,
-                photo_path VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+        # Status reports and SOS alerts are partitioned by day of created_at
+        _create_partitioned_table(cursor, "status_reports", """
+            user_id INTEGER REFERENCES users(id),
+            status VARCHAR(20) NOT NULL,
+            location VARCHAR(255),
+            latitude FLOAT,
+            longitude FLOAT,
+            description TEXT,
+            photo_path TEXT,
+            submission_id VARCHAR(32)
         """)
-        
-        # SOS alerts table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sos_alerts (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id),
-                location VARCHAR(255),
-                latitude FLOAT,
-                longitude FLOAT,
-                message TEXT,
-                status VARCHAR(20) DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+        _create_partitioned_table(cursor, "sos_alerts", """
+            user_id INTEGER REFERENCES users(id),
+            location VARCHAR(255),
+            latitude FLOAT,
+            longitude FLOAT,
+            message TEXT,
+            status VARCHAR(20) DEFAULT 'active',
+            submission_id VARCHAR(32)
         """)
         
         # Messages table
@@ -105,6 +146,123 @@ def init_database():
             )
         """)
         
+        # Per-user read cursor for the inbox (highest message id seen)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_read_cursors (
+                user_id INTEGER PRIMARY KEY,
+                last_read_id INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Geofenced broadcasts keep their target area; deliveries are materialized per user
+        cursor.execute("ALTER TABLE messages ADD COLUMN IF NOT EXISTS geofence TEXT")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS message_deliveries (
+                message_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                message_type VARCHAR(20) DEFAULT 'general',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, message_id)
+            )
+        """)
+        
+        # Inbox indexes: direct messages, global broadcasts and deliveries are paged separately by id
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient_id, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_recipient_type ON messages (recipient_id, message_type, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_global_broadcast ON messages (id) WHERE recipient_id IS NULL AND geofence IS NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_global_broadcast_type ON messages (message_type, id) WHERE recipient_id IS NULL AND geofence IS NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_user_type ON message_deliveries (user_id, message_type, message_id)")
+        
+        # Change feed: append-only log of every create/update, polled by live pages
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS change_events (
+                id SERIAL PRIMARY KEY,
+                table_name VARCHAR(50) NOT NULL,
+                operation VARCHAR(20) NOT NULL,
+                row_id INTEGER,
+                zone VARCHAR(20),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_events_table ON change_events (table_name, id)")
+        
+        # Queued submissions carry a client-generated id so replaying the write journal is
+        # idempotent; ids are claimed here since partitioned tables cannot enforce it alone
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                submission_id VARCHAR(32) PRIMARY KEY,
+                table_name VARCHAR(50) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_submissions_created ON submissions (created_at)")
+        
+        # Data versions: a counter per table, bumped by every write
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS data_versions (
+                table_name VARCHAR(50) PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        
+        # SOS response threads and co-located duplicate lookup
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_alert ON messages (alert_id, id) WHERE alert_id IS NOT NULL")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sos_alerts_active_location ON sos_alerts (latitude, longitude) WHERE status = 'active'")
+        
+        # Archives: rows retention.py moved out of the live tables, partitioned by month of
+        # created_at (partitions are created as rows arrive), plus daily counts for trends
+        for table in ARCHIVED_TABLES:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table} (created_at)")
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table}_archive (
+                    LIKE {table},
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    archive_event_id INTEGER
+                ) PARTITION BY RANGE (created_at)
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_archive_id ON {table}_archive (id)")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_archive_event ON {table}_archive (archive_event_id)")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archive_daily_counts (
+                table_name VARCHAR(50) NOT NULL,
+                day DATE NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                row_count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (table_name, day, status)
+            )
+        """)
+        
+        # One row per maintenance.py job run on one target, with its duration
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS maintenance_runs (
+                id SERIAL PRIMARY KEY,
+                job VARCHAR(30) NOT NULL,
+                target VARCHAR(100),
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration_ms FLOAT,
+                status VARCHAR(20) NOT NULL,
+                detail TEXT
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_runs_job ON maintenance_runs (job, target, id)")
+        
+        # Each user's latest reported location, kept up to date by every report/alert insert;
+        # geofenced broadcasts look recipients up here by bounding box
+        cursor.execute("SELECT to_regclass('user_last_location')")
+        backfill = cursor.fetchone()[0] is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_last_location (
+                user_id INTEGER PRIMARY KEY,
+                latitude FLOAT NOT NULL,
+                longitude FLOAT NOT NULL,
+                reported_at TIMESTAMP NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_last_location_lat_lon ON user_last_location (latitude, longitude)")
+        if backfill:
+            rebuild_last_locations(cursor)
+        
         conn.commit()
         
         # Insert default users if not exists
@@ -115,6 +273,7 @@ def init_database():
         
         cursor.close()
         conn.close()
+        _schema_ready = True
         return True
         
     except Exception as e:
@@ -123,6 +282,190 @@ def init_database():
             conn.close()
         return False
 
+def _create_partitioned_table(cursor, table, columns):
+    """Create a table range-partitioned by day on created_at, with a default partition.
+
+    columns is the column list besides id and created_at. An existing
+    unpartitioned table of that name is migrated: its rows are copied into
+    daily partitions and it is dropped, keeping its id sequence.
+    """
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    existing = cursor.fetchone()
+    if existing and existing[0] == 'p':
+        return
+    if existing:
+        # Free the old table's index names for the new table
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        cursor.execute(f"ALTER TABLE {table}_unpartitioned RENAME CONSTRAINT {table}_pkey TO {table}_unpartitioned_pkey")
+        cursor.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname <> %s",
+            (f"{table}_unpartitioned", f"{table}_unpartitioned_pkey")
+        )
+        for (index,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {index}")
+    
+    cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {table}_id_seq")
+    cursor.execute(f"""
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL DEFAULT nextval('{table}_id_seq'),
+            {columns.strip()},
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    cursor.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    # Catches rows outside the created partitions so no write is ever refused
+    cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    cursor.execute("SELECT CURRENT_DATE")
+    today = cursor.fetchone()[0]
+    ensure_daily_partitions(cursor, table, [today + timedelta(days=n) for n in range(PARTITION_DAYS_AHEAD + 1)])
+    
+    if existing:
+        cursor.execute(f"SELECT DISTINCT created_at::date FROM {table}_unpartitioned WHERE created_at IS NOT NULL")
+        ensure_daily_partitions(cursor, table, [row[0] for row in cursor.fetchall()])
+        cursor.execute(f"SELECT * FROM {table}_unpartitioned LIMIT 0")
+        old_columns = [column[0] for column in cursor.description]
+        cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+        copied = [column for column in old_columns if column in {c[0] for c in cursor.description}]
+        select = ", ".join("COALESCE(created_at, CURRENT_TIMESTAMP)" if column == 'created_at' else column for column in copied)
+        cursor.execute(f"INSERT INTO {table} ({', '.join(copied)}) SELECT {select} FROM {table}_unpartitioned")
+        cursor.execute(f"DROP TABLE {table}_unpartitioned")
+
+def ensure_daily_partitions(cursor, table, days):
+    """Create the daily partitions of a partitioned table for the given dates, if missing.
+
+    Rows for a new day that already landed in the default partition are
+    moved into the new partition.
+    """
+    for day in sorted(set(days)):
+        name = f"{table}_p{day:%Y%m%d}"
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0]:
+            continue
+        bounds = (day, day + timedelta(days=1))
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE created_at >= %s AND created_at < %s)",
+            bounds
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)", bounds)
+            continue
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table}_default WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, bounds)
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+
+def list_daily_partitions(table):
+    """[(date, partition name)] of a partitioned table's daily partitions, oldest first"""
+    rows = execute_query(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+        (table,), fetch=True
+    )
+    prefix = f"{table}_p"
+    return [(datetime.strptime(name[len(prefix):], "%Y%m%d").date(), name)
+            for (name,) in rows if name.startswith(prefix) and name[len(prefix):].isdigit()]
+
+def create_daily_partitions(table, days):
+    """Create a partitioned table's partitions for the given dates in one transaction; returns success"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    try:
+        cursor = conn.cursor()
+        ensure_daily_partitions(cursor, table, days)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+        
+    except Exception as e:
+        st.error(f"Creating partitions of {table} failed: {e}")
+        if conn:
+            conn.close()
+        return False
+
+def maintain_partitions():
+    """Create the coming days' partitions and split rows out of the default partitions.
+
+    Run daily (and after restores or imports of historical data). Returns
+    the number of days checked across tables.
+    """
+    result = execute_query("SELECT CURRENT_DATE", fetch=True)
+    if not result:
+        return 0
+    upcoming = [result[0][0] + timedelta(days=n) for n in range(PARTITION_DAYS_AHEAD + 1)]
+    checked = 0
+    for table in PARTITIONED_TABLES:
+        stray = execute_query(f"SELECT DISTINCT created_at::date FROM {table}_default", fetch=True)
+        days = set(upcoming) | {row[0] for row in stray}
+        if create_daily_partitions(table, days):
+            checked += len(days)
+    return checked
+
+def drop_partitions_before(table, day, only_empty=True):
+    """Drop a partitioned table's daily partitions for dates before day; returns their names.
+
+    Dropping a partition removes its files without scanning or deleting rows.
+    With only_empty, partitions still holding rows (e.g. active alerts
+    retention keeps live) are left in place.
+    """
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        cursor = conn.cursor()
+        dropped = []
+        for partition_day, name in list_daily_partitions(table):
+            if partition_day >= day:
+                break
+            if only_empty:
+                cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {name})")
+                if cursor.fetchone()[0]:
+                    continue
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+        if dropped:
+            _bump_versions(cursor, table)
+            cursor.execute(
+                "INSERT INTO change_events (table_name, operation) VALUES (%s, 'drop_partition')",
+                (table,)
+            )
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return dropped
+        
+    except Exception as e:
+        st.error(f"Dropping partitions of {table} failed: {e}")
+        if conn:
+            conn.close()
+        return []
+
+def recent_window(hours, column="created_at"):
+    """SQL condition and params selecting rows created in the last hours.
+
+    The bound is passed as a literal timestamp: on the daily-partitioned
+    tables a NOW() - INTERVAL bound makes the planner consider every
+    partition (they are only pruned at run time), while a literal lets it
+    plan just the partitions inside the window.
+    """
+    return f"{column} > %s", (db_now() - timedelta(hours=hours),)
+
+def db_now():
+    """The database's current local time, from this process's clock and its measured offset"""
+    global _db_clock_offset
+    if _db_clock_offset is None:
+        result = execute_query("SELECT LOCALTIMESTAMP", fetch=True)
+        _db_clock_offset = (result[0][0] - datetime.now()) if result else timedelta(0)
+    return datetime.now() + _db_clock_offset
+
 def insert_default_data(cursor):
     """Insert default users and sample data"""
     import hashlib
@@ -151,11 +494,13 @@ def insert_default_data(cursor):
         ('Old City Relief Point', 'Old City, Hyderabad', 17.3753, 78.4744, 400, 0, 'limited', '+91-9876543214', 'Food, Water')
     ]
     
-    for shelter in shelters:
-        cursor.execute(
-            "INSERT INTO shelters (name, address, latitude, longitude, capacity, current_occupancy, status, contact_number, facilities) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
-            shelter
-        )
+    _insert_batch(
+        cursor,
+        "INSERT INTO shelters (name, address, latitude, longitude, capacity, current_occupancy, status, contact_number, facilities) VALUES ",
+        "(%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        shelters,
+        ""
+    )
     
     # Default roads
     roads = [
@@ -166,15 +511,18 @@ def insert_default_data(cursor):
         ('Kondapur Main Road', 'blocked', 'Completely flooded - road closed', 17.4648, 78.3574)
     ]
     
-    for road in roads:
-        cursor.execute(
-            "INSERT INTO roads (name, status, description, latitude, longitude) VALUES (%s, %s, %s, %s, %s)",
-            road
-        )
+    _insert_batch(
+        cursor,
+        "INSERT INTO roads (name, status, description, latitude, longitude) VALUES ",
+        "(%s, %s, %s, %s, %s)",
+        roads,
+        ""
+    )
 
 # Database operation functions
 def execute_query(query, params=None, fetch=False):
-    """Execute a database query"""
+    """Execute a database query (timed per call site, see query_stats)"""
+    started = time.perf_counter()
     conn = get_connection()
     if not conn:
         return [] if fetch else 0
@@ -187,20 +535,412 @@ def execute_query(query, params=None, fetch=False):
             result = cursor.fetchall()
             cursor.close()
             conn.close()
+            record_query(query, started, len(result), result)
             return result or []
         else:
             result = cursor.rowcount
             conn.commit()
             cursor.close()
             conn.close()
+            record_query(query, started, result)
             return result
         
     except Exception as e:
+        record_query(query, started, error=e)
         st.error(f"Database query failed: {e}")
         if conn:
             conn.close()
         return [] if fetch else 0
 
+def cached_query(cache_key, tables, query, params=None):
+    """Run a read query through the cache, reusing its rows until a write bumps one of tables.
+
+    Rows are serialized, so with a shared cache backend every server process
+    reuses them. Empty results are not cached since execute_query also
+    returns [] when the query fails.
+    """
+    cache = get_cache()
+    versions = get_table_versions(tables)
+    payload = cache.get(cache_key, versions)
+    if payload is not None:
+        return loads_rows(payload)
+    
+    rows = execute_query(query, params, fetch=True)
+    if rows:
+        cache.set(cache_key, versions, dumps_rows(rows))
+    return rows
+
+def stream_query(query, params=None, chunk_size=EXPORT_FETCH_SIZE):
+    """Yield (description, rows) chunks of a large result without loading it all.
+
+    Uses a server-side (named) cursor where the driver supports one, so
+    memory stays bounded by chunk_size; description is the cursor's
+    column description. Errors are raised to the caller.
+    """
+    conn = get_connection()
+    if not conn:
+        return
+    
+    try:
+        try:
+            cursor = conn.cursor(name=f"stream_{os.getpid()}_{time.monotonic_ns()}")
+            cursor.itersize = chunk_size
+        except TypeError:
+            # Driver without named cursors (e.g. sqlite3 already steps through results lazily)
+            cursor = conn.cursor()
+        cursor.execute(query, params or ())
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield cursor.description, rows
+        cursor.close()
+    finally:
+        conn.close()
+
+def execute_write(query, params=None, table_name=None, operation='insert', row_id=None, zone=None, location=None):
+    """Execute a create/update and append a change event in the same transaction.
+
+    Inserts get "RETURNING id" appended and return the new row id; updates
+    must pass row_id and return the number of affected rows. location, a
+    (user_id, latitude, longitude) the write reports, is recorded as that
+    user's last known location.
+    """
+    conn = get_connection()
+    if not conn:
+        return None if operation == 'insert' else 0
+    
+    try:
+        cursor = conn.cursor()
+        if operation == 'insert':
+            cursor.execute(query + " RETURNING id", params)
+            row_id = result = cursor.fetchone()[0]
+        else:
+            cursor.execute(query, params)
+            result = cursor.rowcount
+        
+        if result:
+            _record_change(cursor, table_name, operation, row_id, zone)
+            if location:
+                _record_locations(cursor, [location + (None,)])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return result
+        
+    except Exception as e:
+        st.error(f"Database query failed: {e}")
+        if conn:
+            conn.close()
+        return None if operation == 'insert' else 0
+
+def _record_change(cursor, table_name, operation, row_id=None, zone=None):
+    """Append an event to the change feed and bump data versions using the caller's transaction.
+
+    The version is bumped first: its row lock, held until commit, makes
+    writers to a table take event ids in commit order, so a per-table
+    cursor on the feed never skips an event that commits late.
+    """
+    _bump_versions(cursor, table_name)
+    cursor.execute(
+        "INSERT INTO change_events (table_name, operation, row_id, zone) VALUES (%s, %s, %s, %s)",
+        (table_name, operation, row_id, zone)
+    )
+
+def _record_locations(cursor, locations):
+    """Upsert users' last known locations from (user_id, latitude, longitude, reported_at) rows.
+
+    Rows without coordinates are skipped; a reported_at of None means now.
+    For each user the latest row wins (the last one among equal times), and
+    it never replaces a newer stored location, e.g. when history is bulk loaded.
+    """
+    rows = [(position, user_id, lat, lon, reported_at)
+            for position, (user_id, lat, lon, reported_at) in enumerate(locations)
+            if user_id is not None and lat is not None and lon is not None]
+    for i in range(0, len(rows), BATCH_INSERT_SIZE):
+        batch = rows[i:i + BATCH_INSERT_SIZE]
+        cursor.execute(
+            "INSERT INTO user_last_location (user_id, latitude, longitude, reported_at) "
+            "SELECT DISTINCT ON (user_id) user_id, latitude, longitude, reported_at FROM (VALUES "
+            + ", ".join(["(%s, %s::int, %s::float, %s::float, COALESCE(%s::timestamp, CURRENT_TIMESTAMP))"] * len(batch))
+            + ") AS v (position, user_id, latitude, longitude, reported_at) "
+            "ORDER BY user_id, reported_at DESC, position DESC "
+            "ON CONFLICT (user_id) DO UPDATE SET latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, "
+            "reported_at = EXCLUDED.reported_at WHERE user_last_location.reported_at <= EXCLUDED.reported_at",
+            [value for row in batch for value in row]
+        )
+
+def rebuild_last_locations(cursor):
+    """Recompute user_last_location from the status reports and SOS alerts (after a restore or migration)"""
+    cursor.execute("DELETE FROM user_last_location")
+    cursor.execute("""
+        INSERT INTO user_last_location (user_id, latitude, longitude, reported_at)
+        SELECT DISTINCT ON (user_id) user_id, latitude, longitude, created_at
+        FROM (
+            SELECT user_id, latitude, longitude, created_at FROM status_reports WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            UNION ALL
+            SELECT user_id, latitude, longitude, created_at FROM sos_alerts WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        ) locations
+        WHERE user_id IS NOT NULL
+        ORDER BY user_id, created_at DESC
+    """)
+
+def _bump_versions(cursor, table_name):
+    """Increment the table's data version"""
+    cursor.execute(
+        "INSERT INTO data_versions (table_name, version) VALUES (%s, 1)"
+        " ON CONFLICT (table_name) DO UPDATE SET version = data_versions.version + 1",
+        (table_name,)
+    )
+
+def execute_batch_insert(table, columns, rows, batch_size=BATCH_INSERT_SIZE, on_conflict=""):
+    """Insert rows with multi-row VALUES statements, committing once per batch.
+
+    Returns the number of rows inserted.
+    """
+    conn = get_connection()
+    if not conn:
+        return 0
+    
+    placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    inserted = 0
+    
+    try:
+        cursor = conn.cursor()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                inserted += _insert_batch(cursor, prefix, placeholder, batch, on_conflict)
+                _bump_versions(cursor, table)
+                conn.commit()
+                batch = []
+        if batch:
+            inserted += _insert_batch(cursor, prefix, placeholder, batch, on_conflict)
+            _bump_versions(cursor, table)
+            conn.commit()
+        cursor.close()
+        conn.close()
+        return inserted
+        
+    except Exception as e:
+        st.error(f"Batch insert into {table} failed: {e}")
+        if conn:
+            conn.close()
+        return inserted
+
+def _insert_batch(cursor, prefix, placeholder, batch, on_conflict):
+    """Run one multi-row INSERT for a batch of rows"""
+    params = [value for row in batch for value in row]
+    cursor.execute(prefix + ", ".join([placeholder] * len(batch)) + (" " + on_conflict if on_conflict else ""), params)
+    return cursor.rowcount
+
+def _csv_locations(columns, csv_data):
+    """(user_id, latitude, longitude, created_at) of each CSV row loaded into a location table"""
+    position = {column: i for i, column in enumerate(columns)}
+    for row in csv.reader(io.StringIO(csv_data)):
+        values = [row[position[column]] or None if column in position else None
+                  for column in ('user_id', 'latitude', 'longitude', 'created_at')]
+        yield tuple(values)
+
+def copy_rows(table, columns, csv_data):
+    """Bulk load CSV text (no header) into a table with COPY, in one transaction.
+
+    Loads of this size do not log a change event per row: one 'bulk_insert'
+    event is recorded and the table's data version is bumped (loading
+    messages also drops every cached unread count). Falls back to
+    multi-row INSERTs when the driver has no COPY support.
+    Returns the number of rows loaded, or None on failure.
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                io.StringIO(csv_data)
+            )
+            loaded = cursor.rowcount
+        else:
+            rows = [[value if value != '' else None for value in row] for row in csv.reader(io.StringIO(csv_data))]
+            placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+            prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+            loaded = sum(
+                _insert_batch(cursor, prefix, placeholder, rows[i:i + BATCH_INSERT_SIZE], "")
+                for i in range(0, len(rows), BATCH_INSERT_SIZE)
+            )
+        if table in LOCATION_TABLES:
+            _record_locations(cursor, _csv_locations(columns, csv_data))
+        _bump_versions(cursor, table)
+        cursor.execute(
+            "INSERT INTO change_events (table_name, operation) VALUES (%s, 'bulk_insert')",
+            (table,)
+        )
+        conn.commit()
+        cursor.close()
+        conn.close()
+        if table == 'messages':
+            invalidate_unread_counts()
+        return loaded
+        
+    except Exception as e:
+        st.error(f"Bulk load into {table} failed: {e}")
+        if conn:
+            conn.close()
+        return None
+
+def archive_rows(table, condition, params=(), limit=BATCH_INSERT_SIZE):
+    """Move up to limit rows matching condition into the table's archive, in one transaction.
+
+    Rows keep their ids. Locked rows are skipped so writers are never waited
+    on, the day's counts in archive_daily_counts are incremented, messages
+    lose their per-user deliveries, and one 'archive' change event is
+    recorded. Returns the number of rows moved, or None on failure.
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT id, created_at FROM {table} WHERE {condition} "
+            "ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED",
+            tuple(params) + (limit,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            conn.close()
+            return 0
+        ids = [row[0] for row in rows]
+        times = [row[1] for row in rows]
+        ensure_archive_partitions(
+            cursor, table, {created.replace(day=1, hour=0, minute=0, second=0, microsecond=0) for created in times}
+        )
+        
+        cursor.execute(
+            "INSERT INTO change_events (table_name, operation) VALUES (%s, 'archive') RETURNING id",
+            (table,)
+        )
+        event_id = cursor.fetchone()[0]
+        cursor.execute(f"SELECT * FROM {table} LIMIT 0")
+        columns = ", ".join(column[0] for column in cursor.description)
+        group_column = ARCHIVED_TABLES[table]
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {table} WHERE id = ANY(%s) AND created_at BETWEEN %s AND %s RETURNING {columns}
+            ), archived AS (
+                INSERT INTO {table}_archive ({columns}, archive_event_id)
+                SELECT {columns}, %s FROM moved
+                RETURNING created_at, {group_column}
+            )
+            INSERT INTO archive_daily_counts (table_name, day, status, row_count)
+            SELECT %s, created_at::date, COALESCE({group_column}, ''), COUNT(*) FROM archived GROUP BY 2, 3
+            ON CONFLICT (table_name, day, status) DO UPDATE SET row_count = archive_daily_counts.row_count + EXCLUDED.row_count
+        """, (ids, min(times), max(times), event_id, table))
+        if table == 'messages':
+            cursor.execute("DELETE FROM message_deliveries WHERE message_id = ANY(%s)", (ids,))
+        _bump_versions(cursor, table)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return len(ids)
+        
+    except Exception as e:
+        st.error(f"Archiving {table} failed: {e}")
+        if conn:
+            conn.close()
+        return None
+
+def ensure_archive_partitions(cursor, table, months):
+    """Create the monthly archive partitions covering the given month starts"""
+    for month in sorted(months):
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_archive_{month:%Y%m} PARTITION OF {table}_archive "
+            "FOR VALUES FROM (%s) TO (%s)",
+            (month, next_month)
+        )
+
+def get_archived_counts(table, status=None):
+    """Total rows of a table moved to its archive, optionally only those with the given status"""
+    query = "SELECT COALESCE(SUM(row_count), 0)::bigint FROM archive_daily_counts WHERE table_name = %s"
+    params = (table,)
+    if status is not None:
+        query += " AND status = %s"
+        params += (status,)
+    result = execute_query(query, params, fetch=True)
+    return result[0][0] if result else 0
+
+def _insert_submissions(table, columns, records):
+    """Insert queued submissions in one transaction, with their change events and version bumps.
+
+    records are dicts holding submission_id and the given columns. Rows whose
+    submission_id is already stored are skipped, so a batch can be retried
+    safely. Returns {submission_id: row_id} for the rows inserted, or None
+    if the rows were rejected. Raises DatabaseUnavailable if there is no
+    connection or it failed, so the caller can keep the rows for later.
+    Runs on the write queue's flusher thread, so failures are logged rather
+    than shown with st.error.
+    """
+    conn = get_connection()
+    if not conn:
+        raise DatabaseUnavailable(f"no connection for insert into {table}")
+    
+    all_columns = ('submission_id',) + tuple(columns)
+    placeholder = "(" + ", ".join(["%s"] * len(all_columns)) + ")"
+    
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO submissions (submission_id, table_name) VALUES "
+            + ", ".join(["(%s, %s)"] * len(records))
+            + " ON CONFLICT (submission_id) DO NOTHING RETURNING submission_id",
+            [value for record in records for value in (record['submission_id'], table)]
+        )
+        claimed = {row[0] for row in cursor.fetchall()}
+        fresh = [record for record in records if record['submission_id'] in claimed]
+        inserted = {}
+        if fresh:
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(all_columns)}) VALUES "
+                + ", ".join([placeholder] * len(fresh))
+                + " RETURNING id, submission_id",
+                [record[column] for record in fresh for column in all_columns]
+            )
+            inserted = {submission_id: row_id for row_id, submission_id in cursor.fetchall()}
+        
+        events = []
+        for record in records:
+            if record['submission_id'] in inserted:
+                zone = get_zone(record['latitude'], record['longitude'])
+                events.append((table, 'insert', inserted[record['submission_id']], zone))
+        if events:
+            _bump_versions(cursor, table)
+            cursor.execute(
+                "INSERT INTO change_events (table_name, operation, row_id, zone) VALUES "
+                + ", ".join(["(%s, %s, %s, %s)"] * len(events)),
+                [value for event in events for value in event]
+            )
+            _record_locations(cursor, [(record['user_id'], record['latitude'], record['longitude'], None)
+                                       for record in records if record['submission_id'] in inserted])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return inserted
+        
+    except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+        conn.close()
+        raise DatabaseUnavailable(f"insert into {table} failed: {e}") from e
+    except Exception as e:
+        logger.warning("Batch insert of %d rows into %s failed: %s", len(records), table, e)
+        conn.close()
+        return None
+
 def get_user_by_username(username):
     """Get user by username"""
     return execute_query(
@@ -211,64 +951,464 @@ def get_user_by_username(username):
 
 def create_user(username, password_hash, role):
     """Create a new user"""
-    return execute_query(
+    return execute_write(
         "INSERT INTO users (username, password_hash, role) VALUES (%s, %s, %s)",
-        (username, password_hash, role)
+        (username, password_hash, role),
+        table_name='users'
     )
 
 def create_status_report(user_id, status, location, latitude, longitude, description, photo_path=None):
     """Create a status report"""
-    return execute_query(
+    zone = get_zone(latitude, longitude)
+    report_id = execute_write(
         "INSERT INTO status_reports (user_id, status, location, latitude, longitude, description, photo_path) VALUES (%s, %s, %s, %s, %s, %s, %s)",
-        (user_id, status, location, latitude, longitude, description, photo_path)
+        (user_id, status, location, latitude, longitude, description, photo_path),
+        table_name='status_reports',
+        zone=zone,
+        location=(user_id, latitude, longitude)
     )
+    if report_id:
+        STATUS_REPORTS.inc(path='direct')
+        _publish_status_report(report_id, user_id, status, location, zone)
+    return report_id
+
+def _publish_status_report(report_id, user_id, status, location, zone):
+    """Tell sessions following the report's zone about it"""
+    if zone:
+        publish([zone_topic(zone)], 'status_report',
+                {'report_id': report_id, 'user_id': user_id, 'status': status, 'location': location, 'zone': zone})
+
+def _publish_sos_alert(alert_id, user_id, location, zone):
+    """Tell rescue teams, the government, the alert's followers and its zone about a new SOS alert"""
+    topics = [role_topic('rescue_team'), role_topic('government'), alert_topic(alert_id)]
+    if zone:
+        topics.append(zone_topic(zone))
+    publish(topics, 'sos_alert', {'alert_id': alert_id, 'user_id': user_id, 'location': location, 'zone': zone})
 
 def create_sos_alert(user_id, location, latitude, longitude, message):
     """Create an SOS alert"""
-    return execute_query(
+    zone = get_zone(latitude, longitude)
+    alert_id = execute_write(
         "INSERT INTO sos_alerts (user_id, location, latitude, longitude, message) VALUES (%s, %s, %s, %s, %s)",
-        (user_id, location, latitude, longitude, message)
+        (user_id, location, latitude, longitude, message),
+        table_name='sos_alerts',
+        zone=zone,
+        location=(user_id, latitude, longitude)
     )
+    if alert_id:
+        SOS_ALERTS.inc(path='direct')
+        _publish_sos_alert(alert_id, user_id, location, zone)
+    return alert_id
+
+def create_status_reports(reports):
+    """Create many status reports in one transaction (used by the write queue).
+
+    Sessions following each report's zone are notified after the commit.
+    Returns {submission_id: report_id} for newly inserted reports, or None
+    if the batch was rejected; raises DatabaseUnavailable if the database
+    cannot be reached.
+    """
+    inserted = _insert_submissions(
+        'status_reports',
+        ('user_id', 'status', 'location', 'latitude', 'longitude', 'description', 'photo_path'),
+        reports
+    )
+    if inserted:
+        STATUS_REPORTS.inc(len(inserted), path='queue')
+    for report in reports if inserted else []:
+        report_id = inserted.get(report['submission_id'])
+        if report_id:
+            _publish_status_report(report_id, report['user_id'], report['status'], report['location'],
+                                   get_zone(report['latitude'], report['longitude']))
+    return inserted
+
+def create_sos_alerts(alerts):
+    """Create many SOS alerts in one transaction (used by the write queue).
+
+    Rescue teams are notified of each new alert after the commit. Returns
+    {submission_id: alert_id} for newly inserted alerts, or None if the
+    batch was rejected; raises DatabaseUnavailable if the database cannot
+    be reached.
+    """
+    inserted = _insert_submissions(
+        'sos_alerts',
+        ('user_id', 'location', 'latitude', 'longitude', 'message'),
+        alerts
+    )
+    if inserted:
+        SOS_ALERTS.inc(len(inserted), path='queue')
+    for alert in alerts if inserted else []:
+        alert_id = inserted.get(alert['submission_id'])
+        if alert_id:
+            _publish_sos_alert(alert_id, alert['user_id'], alert['location'],
+                               get_zone(alert['latitude'], alert['longitude']))
+    return inserted
 
 def get_active_sos_alerts():
-    """Get all active SOS alerts"""
-    return execute_query(
-        "SELECT s.id, u.username, s.location, s.latitude, s.longitude, s.message, s.created_at FROM sos_alerts s JOIN users u ON s.user_id = u.id WHERE s.status = 'active' ORDER BY s.created_at DESC",
-        fetch=True
+    """Get all active SOS alerts, including the reporter's user_id"""
+    return cached_query(
+        "active_sos_alerts",
+        ("sos_alerts", "users"),
+        "SELECT s.id, u.username, s.location, s.latitude, s.longitude, s.message, s.created_at, s.user_id FROM sos_alerts s JOIN users u ON s.user_id = u.id WHERE s.status = 'active' ORDER BY s.created_at DESC"
     )
 
 def get_shelters():
     """Get all shelters"""
-    return execute_query(
-        "SELECT * FROM shelters ORDER BY name",
-        fetch=True
+    return cached_query(
+        "shelters",
+        ("shelters",),
+        "SELECT * FROM shelters ORDER BY name"
     )
 
 def get_roads():
     """Get all roads"""
-    return execute_query(
-        "SELECT * FROM roads ORDER BY name",
-        fetch=True
+    return cached_query(
+        "roads",
+        ("roads",),
+        "SELECT * FROM roads ORDER BY name"
     )
 
+def update_shelter(shelter_id, current_occupancy, status):
+    """Update a shelter's occupancy and availability status"""
+    result = execute_write(
+        "UPDATE shelters SET current_occupancy = %s, status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+        (current_occupancy, status, shelter_id),
+        table_name='shelters',
+        operation='update',
+        row_id=shelter_id
+    )
+    if result:
+        publish(
+            [role_topic('citizen'), role_topic('rescue_team'), role_topic('government')],
+            'shelter_update',
+            {'shelter_id': shelter_id, 'current_occupancy': current_occupancy, 'status': status}
+        )
+    return result
+
 def send_message(sender_id, recipient_id, message, message_type='general', alert_id=None):
     """Send a message"""
-    return execute_query(
+    result = execute_write(
         "INSERT INTO messages (sender_id, recipient_id, message, message_type, alert_id) VALUES (%s, %s, %s, %s, %s)",
-        (sender_id, recipient_id, message, message_type, alert_id)
+        (sender_id, recipient_id, message, message_type, alert_id),
+        table_name='messages'
     )
+    invalidate_unread_counts(recipient_id)
+    if result:
+        topics = [user_topic(recipient_id)] if recipient_id else [role_topic('citizen')]
+        if alert_id:
+            topics.append(alert_topic(alert_id))
+        publish(topics, 'message', {'message_id': result, 'message_type': message_type})
+    return result
 
-def get_messages_for_user(user_id):
-    """Get messages for a user"""
-    return execute_query(
-        "SELECT m.*, u.username as sender_name FROM messages m JOIN users u ON m.sender_id = u.id WHERE m.recipient_id = %s OR m.recipient_id IS NULL ORDER BY m.created_at DESC",
+def get_status_reports():
+    """Get all status reports for dashboard"""
+    # Explicit columns: pages unpack these rows positionally, and the table
+    # has gained columns (submission_id) they do not expect. The cache key
+    # changed with the row shape so shared caches never serve the old one.
+    return cached_query(
+        "status_report_rows",
+        ("status_reports", "users"),
+        "SELECT s.id, s.user_id, s.status, s.location, s.latitude, s.longitude, s.description, s.photo_path, "
+        "s.created_at, u.username FROM status_reports s JOIN users u ON s.user_id = u.id ORDER BY s.created_at DESC"
+    )
+
+def get_inbox(user_id, message_type=None, before_id=None, limit=INBOX_PAGE_SIZE):
+    """Get one page of a user's inbox, newest first.
+
+    The inbox is direct messages, global broadcasts and geofenced broadcasts
+    delivered to the user. Pages are keyset-paginated on message id: pass the
+    smallest id of the previous page as before_id to fetch the next, older page.
+    """
+    message_filters, message_params = _inbox_filters("id", message_type, before_id)
+    delivery_filters, delivery_params = _inbox_filters("message_id", message_type, before_id)
+    
+    # Each branch walks its own index and stops after one page
+    query = f"""
+        SELECT m.id, m.sender_id, m.recipient_id, m.alert_id, m.message, m.message_type, m.created_at, u.username as sender_name
+        FROM (
+            (SELECT id FROM messages WHERE recipient_id = %s{message_filters} ORDER BY id DESC LIMIT %s)
+            UNION ALL
+            (SELECT id FROM messages WHERE recipient_id IS NULL AND geofence IS NULL{message_filters} ORDER BY id DESC LIMIT %s)
+            UNION ALL
+            (SELECT message_id FROM message_deliveries WHERE user_id = %s{delivery_filters} ORDER BY message_id DESC LIMIT %s)
+        ) page
+        JOIN messages m ON m.id = page.id
+        JOIN users u ON m.sender_id = u.id
+        ORDER BY m.id DESC
+        LIMIT %s
+    """
+    params = ([user_id] + message_params + [limit] + message_params + [limit]
+              + [user_id] + delivery_params + [limit, limit])
+    return execute_query(query, tuple(params), fetch=True)
+
+def _inbox_filters(id_column, message_type=None, boundary_id=None, newer=False):
+    """SQL filter fragment and params shared by the inbox branches"""
+    filters = ""
+    params = []
+    if message_type:
+        filters += " AND message_type = %s"
+        params.append(message_type)
+    if boundary_id:
+        filters += f" AND {id_column} {'>' if newer else '<'} %s"
+        params.append(boundary_id)
+    return filters, params
+
+def get_read_cursor(user_id):
+    """Get the id of the newest message the user has seen"""
+    result = execute_query(
+        "SELECT last_read_id FROM message_read_cursors WHERE user_id = %s",
         (user_id,),
         fetch=True
     )
+    return result[0][0] if result else 0
 
-def get_status_reports():
-    """Get all status reports for dashboard"""
+def mark_messages_read(user_id, last_message_id):
+    """Advance a user's read cursor; it never moves backwards"""
+    result = execute_query(
+        """
+        INSERT INTO message_read_cursors (user_id, last_read_id) VALUES (%s, %s)
+        ON CONFLICT (user_id) DO UPDATE
+        SET last_read_id = GREATEST(message_read_cursors.last_read_id, EXCLUDED.last_read_id),
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (user_id, last_message_id)
+    )
+    invalidate_unread_counts(user_id)
+    return result
+
+def get_unread_counts(user_id):
+    """Get unread message counts per type, capped at UNREAD_COUNT_CAP and cached briefly"""
+    cached = _unread_cache.get(user_id)
+    if cached and time.time() - cached[0] < UNREAD_CACHE_TTL:
+        return cached[1]
+    
+    last_read_id = get_read_cursor(user_id)
+    cap = UNREAD_COUNT_CAP + 1
+    counts = {}
+    for message_type in MESSAGE_TYPES:
+        message_filters, message_params = _inbox_filters("id", message_type, last_read_id, newer=True)
+        delivery_filters, delivery_params = _inbox_filters("message_id", message_type, last_read_id, newer=True)
+        result = execute_query(
+            f"""
+            SELECT COUNT(*) FROM (
+                (SELECT id FROM messages WHERE recipient_id = %s{message_filters} ORDER BY id DESC LIMIT %s)
+                UNION ALL
+                (SELECT id FROM messages WHERE recipient_id IS NULL AND geofence IS NULL{message_filters} ORDER BY id DESC LIMIT %s)
+                UNION ALL
+                (SELECT message_id FROM message_deliveries WHERE user_id = %s{delivery_filters} ORDER BY message_id DESC LIMIT %s)
+            ) unread
+            """,
+            tuple([user_id] + message_params + [cap] + message_params + [cap] + [user_id] + delivery_params + [cap]),
+            fetch=True
+        )
+        counts[message_type] = min(result[0][0], cap) if result else 0
+    
+    _unread_cache[user_id] = (time.time(), counts)
+    return counts
+
+def invalidate_unread_counts(user_id=None):
+    """Drop cached unread counts for one user, or for everyone after a broadcast"""
+    if user_id is None:
+        _unread_cache.clear()
+    else:
+        _unread_cache.pop(user_id, None)
+
+def get_last_location(user_id):
+    """Get a user's last reported (latitude, longitude), or None if they never reported one"""
+    rows = execute_query(
+        "SELECT latitude, longitude FROM user_last_location WHERE user_id = %s", (user_id,), fetch=True
+    )
+    return rows[0] if rows else None
+
+def get_citizens_in_geofence(geofence):
+    """Ids of citizens whose last known location is inside the geofence.
+
+    The lat/lon index narrows user_last_location to each shape's bounding
+    box; the exact containment test then runs on those candidates only.
+    """
+    shapes = geofence["shapes"] if geofence["type"] == "multi" else [geofence]
+    boxes = [geofence_bbox(shape) for shape in shapes]
+    rows = execute_query(
+        "SELECT l.user_id, l.latitude, l.longitude FROM user_last_location l JOIN users u ON u.id = l.user_id "
+        "WHERE u.role = 'citizen' AND ("
+        + " OR ".join(["(l.latitude BETWEEN %s AND %s AND l.longitude BETWEEN %s AND %s)"] * len(boxes))
+        + ")",
+        [value for min_lat, min_lon, max_lat, max_lon in boxes for value in (min_lat, max_lat, min_lon, max_lon)],
+        fetch=True
+    )
+    return [user_id for user_id, lat, lon in rows if geofence_contains(geofence, lat, lon)]
+
+def send_geofenced_message(sender_id, message, message_type, geofence):
+    """Send a broadcast to citizens whose last known location is inside the geofence.
+
+    The message is stored once with its target area; one delivery row per
+    matching user is then bulk inserted. Returns (message_id, recipient_count).
+    """
+    message_id = execute_write(
+        "INSERT INTO messages (sender_id, recipient_id, message, message_type, geofence) VALUES (%s, %s, %s, %s, %s)",
+        (sender_id, None, message, message_type, geofence_to_json(geofence)),
+        table_name='messages'
+    )
+    if not message_id:
+        return None, 0
+    
+    # Fan-out: citizens located inside the area, then batched delivery inserts
+    recipients = [user_id for user_id in get_citizens_in_geofence(geofence) if user_id != sender_id]
+    
+    delivered = execute_batch_insert(
+        "message_deliveries",
+        ("message_id", "user_id", "message_type"),
+        ((message_id, user_id, message_type) for user_id in recipients),
+        on_conflict="ON CONFLICT DO NOTHING"
+    )
+    for user_id in recipients:
+        invalidate_unread_counts(user_id)
+    if recipients:
+        publish([user_topic(user_id) for user_id in recipients], 'message',
+                {'message_id': message_id, 'message_type': message_type})
+    return message_id, delivered
+
+def get_colocated_reporters(alert_id):
+    """Get (reporter_id, [co-located reporter ids]) for an SOS alert.
+
+    Co-located reporters are users with another active SOS alert within
+    COLOCATED_RADIUS_KM of this one, i.e. likely duplicates of the same incident.
+    """
+    alert = execute_query(
+        "SELECT user_id, latitude, longitude FROM sos_alerts WHERE id = %s",
+        (alert_id,),
+        fetch=True
+    )
+    if not alert:
+        return None, []
+    reporter_id, lat, lon = alert[0]
+    if lat is None or lon is None:
+        return reporter_id, []
+    
+    area = circle_geofence(lat, lon, COLOCATED_RADIUS_KM)
+    min_lat, min_lon, max_lat, max_lon = geofence_bbox(area)
+    nearby = execute_query(
+        """
+        SELECT DISTINCT user_id, latitude, longitude FROM sos_alerts
+        WHERE status = 'active' AND id <> %s
+        AND latitude BETWEEN %s AND %s AND longitude BETWEEN %s AND %s
+        """,
+        (alert_id, min_lat, max_lat, min_lon, max_lon),
+        fetch=True
+    )
+    duplicates = {user_id for user_id, n_lat, n_lon in nearby
+                  if user_id != reporter_id and geofence_contains(area, n_lat, n_lon)}
+    return reporter_id, sorted(duplicates)
+
+def send_sos_response(sender_id, alert_id, message):
+    """Send a rescue response to an SOS alert's reporter and co-located duplicate reporters.
+
+    The response is stored once, addressed to the reporter and threaded by
+    alert_id; duplicate reporters get delivery rows. Returns the number of
+    citizens reached (0 on failure).
+    """
+    reporter_id, duplicate_ids = get_colocated_reporters(alert_id)
+    if reporter_id is None:
+        return 0
+    
+    message_id = execute_write(
+        "INSERT INTO messages (sender_id, recipient_id, message, message_type, alert_id) VALUES (%s, %s, %s, %s, %s)",
+        (sender_id, reporter_id, message, 'sos_response', alert_id),
+        table_name='messages'
+    )
+    if not message_id:
+        return 0
+    invalidate_unread_counts(reporter_id)
+    
+    if duplicate_ids:
+        execute_batch_insert(
+            "message_deliveries",
+            ("message_id", "user_id", "message_type"),
+            [(message_id, user_id, 'sos_response') for user_id in duplicate_ids],
+            on_conflict="ON CONFLICT DO NOTHING"
+        )
+        for user_id in duplicate_ids:
+            invalidate_unread_counts(user_id)
+    publish([user_topic(user_id) for user_id in [reporter_id] + duplicate_ids] + [alert_topic(alert_id)],
+            'message', {'message_id': message_id, 'message_type': 'sos_response', 'alert_id': alert_id})
+    return 1 + len(duplicate_ids)
+
+def get_alert_threads(alert_ids):
+    """Get response threads for several SOS alerts as {alert_id: [(id, sender_name, message, created_at), ...]}"""
+    if not alert_ids:
+        return {}
+    rows = execute_query(
+        """
+        SELECT m.alert_id, m.id, u.username, m.message, m.created_at
+        FROM messages m JOIN users u ON m.sender_id = u.id
+        WHERE m.alert_id = ANY(%s)
+        ORDER BY m.alert_id, m.id
+        """,
+        (list(alert_ids),),
+        fetch=True
+    )
+    threads = {}
+    for alert_id, message_id, sender_name, message, created_at in rows:
+        threads.setdefault(alert_id, []).append((message_id, sender_name, message, created_at))
+    return threads
+
+def get_alert_response_counts(alert_ids):
+    """Count the responses sent for several SOS alerts as {alert_id: count}"""
+    if not alert_ids:
+        return {}
+    rows = execute_query(
+        "SELECT alert_id, COUNT(*) FROM messages WHERE alert_id = ANY(%s) GROUP BY alert_id",
+        (list(alert_ids),),
+        fetch=True
+    )
+    return dict(rows) if rows else {}
+
+def get_alert_thread(alert_id):
+    """Get the response thread for one SOS alert, oldest first"""
+    return get_alert_threads([alert_id]).get(alert_id, [])
+
+def get_latest_change_id(table_name=None):
+    """Get the id of the newest change event, optionally on one table (0 if there is none)"""
+    if table_name:
+        result = execute_query(
+            "SELECT COALESCE(MAX(id), 0) FROM change_events WHERE table_name = %s", (table_name,), fetch=True
+        )
+    else:
+        result = execute_query("SELECT COALESCE(MAX(id), 0) FROM change_events", fetch=True)
+    return result[0][0] if result else 0
+
+def get_changes_since(cursor_id, tables=None, limit=500):
+    """Poll the change feed for events after cursor_id, optionally limited to some tables.
+
+    Returns rows of (id, table_name, operation, row_id, zone, created_at),
+    oldest first. Events on one table commit in id order, so keep a cursor
+    per table; across tables a lower id can still commit after a higher
+    one. Archive events are the exception: they are recorded without
+    holding up writers and may commit out of order.
+    """
+    if tables:
+        return execute_query(
+            "SELECT id, table_name, operation, row_id, zone, created_at FROM change_events WHERE id > %s AND table_name = ANY(%s) ORDER BY id LIMIT %s",
+            (cursor_id, list(tables), limit),
+            fetch=True
+        )
     return execute_query(
-        "SELECT s.*, u.username FROM status_reports s JOIN users u ON s.user_id = u.id ORDER BY s.created_at DESC",
+        "SELECT id, table_name, operation, row_id, zone, created_at FROM change_events WHERE id > %s ORDER BY id LIMIT %s",
+        (cursor_id, limit),
         fetch=True
     )
+
+def get_versions():
+    """Get every table's data version as {table_name: version}.
+
+    Versions only ever increase, so a caller can remember the value it last
+    saw and skip re-reading a table while it is unchanged. Tables never
+    written since the versions table was created are absent (version 0).
+    """
+    rows = execute_query("SELECT table_name, version FROM data_versions", fetch=True)
+    return dict(rows) if rows else {}
+
+def get_table_versions(tables):
+    """Get the data versions of several tables as a tuple in the given order, for cache keys"""
+    versions = get_versions()
+    return tuple(versions.get(table, 0) for table in tables)
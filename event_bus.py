@@ -0,0 +1,184 @@
+import os
+import json
+import glob
+import time
+import socket
+import threading
+from collections import deque
+
+# Events kept per subscriber before the oldest are dropped
+SUBSCRIPTION_QUEUE_SIZE = 100
+# Subscriptions not drained for this long are assumed to belong to closed sessions
+SUBSCRIPTION_IDLE_TIMEOUT = 600
+# Set to a directory to fan events out across Streamlit worker processes on one host
+BUS_DIR_ENV = "FLOODAID_EVENT_BUS_DIR"
+MAX_DATAGRAM_SIZE = 65000
+
+def role_topic(role):
+    return f"role:{role}"
+
+def zone_topic(zone):
+    """Topic of a grid zone (see utils.get_zone)"""
+    return f"zone:{zone}"
+
+def alert_topic(alert_id):
+    return f"alert:{alert_id}"
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+class Subscription:
+    """A session's bounded queue of events for a set of topics"""
+
+    def __init__(self, bus, topics):
+        self.bus = bus
+        self.topics = set(topics)
+        self.events = deque(maxlen=SUBSCRIPTION_QUEUE_SIZE)
+        self.last_drained = time.time()
+        self._lock = threading.Lock()
+
+    def push(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self):
+        """Return and clear all pending events, oldest first"""
+        with self._lock:
+            events = list(self.events)
+            self.events.clear()
+            self.last_drained = time.time()
+        return events
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class EventBus:
+    """In-process publish/subscribe bus shared by every session of a Streamlit server"""
+
+    def __init__(self):
+        self._topics = {}
+        self._lock = threading.Lock()
+        self.bridge = None
+
+    def subscribe(self, topics):
+        """Subscribe to one or more topics and return the Subscription"""
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._remove(subscription)
+
+    def resubscribe(self, subscription, topics):
+        """Change a subscription's topics, keeping the events already queued for it"""
+        with self._lock:
+            self._remove(subscription)
+            subscription.topics = set(topics)
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+
+    def _remove(self, subscription):
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topics, event_type, payload=None, forward=True):
+        """Deliver an event to every subscription on any of the topics (each at most once)"""
+        event = {
+            "type": event_type,
+            "topics": list(topics),
+            "payload": payload or {},
+            "published_at": time.time(),
+        }
+        self._deliver(event)
+        if forward and self.bridge:
+            self.bridge.send(event)
+        return event
+
+    def _deliver(self, event):
+        now = time.time()
+        with self._lock:
+            recipients = set()
+            for topic in event["topics"]:
+                recipients.update(self._topics.get(topic, ()))
+        stale = []
+        for subscription in recipients:
+            if now - subscription.last_drained > SUBSCRIPTION_IDLE_TIMEOUT:
+                stale.append(subscription)
+            else:
+                subscription.push(event)
+        for subscription in stale:
+            self.unsubscribe(subscription)
+
+class SocketBridge:
+    """Fans bus events out to other processes over Unix datagram sockets.
+
+    Every process binds <directory>/<pid>.sock and sends each locally
+    published event to every other socket in the directory. Sockets left
+    behind by dead processes are removed on the first failed send.
+    """
+
+    def __init__(self, bus, directory):
+        self.bus = bus
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.send_sock.setblocking(False)
+        threading.Thread(target=self._receive_loop, name="event-bus-bridge", daemon=True).start()
+
+    def send(self, event):
+        data = json.dumps(event, default=str).encode()
+        if len(data) > MAX_DATAGRAM_SIZE:
+            return
+        for peer in glob.glob(os.path.join(self.directory, "*.sock")):
+            if peer == self.path:
+                continue
+            try:
+                self.send_sock.sendto(data, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is bound to this socket any more
+                try:
+                    os.remove(peer)
+                except OSError:
+                    pass
+            except (BlockingIOError, OSError):
+                # Peer is backed up; live notifications are best effort
+                pass
+
+    def _receive_loop(self):
+        while True:
+            try:
+                data = self.sock.recv(MAX_DATAGRAM_SIZE)
+                event = json.loads(data)
+                self.bus._deliver(event)
+            except (OSError, ValueError):
+                time.sleep(0.1)
+
+_bus = None
+_bus_lock = threading.Lock()
+
+def get_event_bus():
+    """Get this process's event bus, attaching the cross-process bridge if configured"""
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = EventBus()
+            bus_dir = os.environ.get(BUS_DIR_ENV)
+            if bus_dir:
+                _bus.bridge = SocketBridge(_bus, bus_dir)
+        return _bus
+
+def publish(topics, event_type, payload=None):
+    """Publish an event on this process's bus"""
+    return get_event_bus().publish(topics, event_type, payload)
@@ -0,0 +1,31 @@
+import json
+import time
+from cache import get_cache
+from database import get_table_versions
+
+def cached_figure(chart_id, tables, build, time_bucket=None):
+    """Return a chart's figure as a plotly dict, rebuilding it only when its data changed.
+
+    build() queries the data and returns a plotly Figure, or None when there
+    is nothing to plot. The figure JSON is kept in the shared cache until a
+    write bumps the data version of one of tables; charts over a sliding
+    time window should also pass time_bucket (seconds) so they are rebuilt
+    as the window moves. Like cached_query, empty results are not cached:
+    execute_query also returns no rows when the query fails.
+    """
+    cache = get_cache()
+    key = f"figure:{chart_id}"
+    versions = get_table_versions(tables)
+    if time_bucket:
+        versions += (int(time.time() // time_bucket),)
+    
+    figure_json = cache.get(key, versions)
+    if figure_json is not None:
+        return json.loads(figure_json)
+    
+    figure = build()
+    if figure is None or not figure.data:
+        return None
+    figure_json = figure.to_json().encode()
+    cache.set(key, versions, figure_json)
+    return json.loads(figure_json)
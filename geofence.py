@@ -0,0 +1,93 @@
+import json
+import math
+
+# Approximate centres of the areas offered in the broadcast forms
+AREA_CENTERS = {
+    "Gachibowli": (17.4401, 78.3489),
+    "Hitech City": (17.4435, 78.3772),
+    "Jubilee Hills": (17.4326, 78.4071),
+    "Banjara Hills": (17.4142, 78.4382),
+    "Kondapur": (17.4648, 78.3574),
+    "Madhapur": (17.4485, 78.3908),
+    "Kukatpally": (17.4851, 78.4056),
+    "Secunderabad": (17.5040, 78.4993),
+    "Old City": (17.3616, 78.4747),
+}
+AREA_RADIUS_KM = 3.0
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def point_in_polygon(lat, lon, polygon):
+    """Ray-casting test for a polygon given as [(lat, lon), ...]"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+def circle_geofence(lat, lon, radius_km):
+    """Geofence covering a radius around a point"""
+    return {"type": "circle", "lat": float(lat), "lon": float(lon), "radius_km": float(radius_km)}
+
+def polygon_geofence(points):
+    """Geofence covering a polygon given as [(lat, lon), ...]"""
+    return {"type": "polygon", "points": [[float(lat), float(lon)] for lat, lon in points]}
+
+def area_geofence(areas, radius_km=AREA_RADIUS_KM):
+    """Geofence covering named areas, or None when no known area is selected"""
+    shapes = [circle_geofence(*AREA_CENTERS[a], radius_km) for a in areas if a in AREA_CENTERS]
+    if not shapes:
+        return None
+    return shapes[0] if len(shapes) == 1 else {"type": "multi", "shapes": shapes}
+
+def parse_polygon(text):
+    """Parse 'lat, lon' lines into a polygon, or None if fewer than three valid points"""
+    points = []
+    for line in text.strip().splitlines():
+        parts = [p.strip() for p in line.split(',')]
+        if len(parts) != 2:
+            continue
+        try:
+            points.append((float(parts[0]), float(parts[1])))
+        except ValueError:
+            continue
+    return points if len(points) >= 3 else None
+
+def geofence_to_json(geofence):
+    return json.dumps(geofence, separators=(',', ':'))
+
+def geofence_from_json(text):
+    return json.loads(text) if text else None
+
+def geofence_bbox(geofence):
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) of a geofence"""
+    if geofence["type"] == "circle":
+        dlat = geofence["radius_km"] / 111.0
+        dlon = geofence["radius_km"] / (111.0 * math.cos(math.radians(geofence["lat"])))
+        return (geofence["lat"] - dlat, geofence["lon"] - dlon, geofence["lat"] + dlat, geofence["lon"] + dlon)
+    if geofence["type"] == "polygon":
+        lats = [p[0] for p in geofence["points"]]
+        lons = [p[1] for p in geofence["points"]]
+        return (min(lats), min(lons), max(lats), max(lons))
+    boxes = [geofence_bbox(shape) for shape in geofence["shapes"]]
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def geofence_contains(geofence, lat, lon):
+    """Exact containment test for a geofence"""
+    if geofence["type"] == "circle":
+        return haversine_km(geofence["lat"], geofence["lon"], lat, lon) <= geofence["radius_km"]
+    if geofence["type"] == "polygon":
+        return point_in_polygon(lat, lon, geofence["points"])
+    return any(geofence_contains(shape, lat, lon) for shape in geofence["shapes"])
@@ -0,0 +1,223 @@
+import os
+import json
+import math
+import shutil
+import threading
+import numpy as np
+from PIL import Image
+
+# Tiles are written under Streamlit's static folder so folium can load them by URL
+TILE_SIZE = 256
+TILE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "heatmap")
+TILE_URL_ROOT = "/app/static/heatmap"
+MANIFEST_PATH = os.path.join(TILE_ROOT, "manifest.json")
+
+# Citywide zoom levels that get a pre-rendered density layer
+HEATMAP_MIN_ZOOM = 10
+HEATMAP_MAX_ZOOM = 14
+
+# Gaussian blur radius in pixels; points this close to a tile edge also touch the neighbour
+BLUR_RADIUS = 12
+# Density at which a pixel reaches ~63% of full colour
+SATURATION = 2.5
+
+_lock = threading.Lock()
+
+def _build_colormap():
+    """Build a 256-entry RGBA lookup table from transparent blue to red"""
+    stops = [
+        (0.00, (0, 0, 255, 0)),
+        (0.25, (0, 128, 255, 120)),
+        (0.50, (0, 255, 0, 160)),
+        (0.75, (255, 255, 0, 200)),
+        (1.00, (255, 0, 0, 230)),
+    ]
+    positions = np.linspace(0, 1, 256)
+    xs = [s[0] for s in stops]
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    for channel in range(4):
+        lut[:, channel] = np.interp(positions, xs, [s[1][channel] for s in stops]).astype(np.uint8)
+    return lut
+
+_COLORMAP = _build_colormap()
+
+def _gaussian_kernel(radius):
+    """1-D gaussian kernel spanning +/- radius pixels"""
+    sigma = radius / 3.0
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-(offsets ** 2) / (2 * sigma ** 2))
+    return kernel / kernel.max()
+
+_KERNEL = _gaussian_kernel(BLUR_RADIUS)
+
+def latlon_to_pixels(lat, lon, zoom):
+    """Convert lat/lon arrays to global Web Mercator pixel coordinates"""
+    lat = np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511)
+    lon = np.asarray(lon, dtype=float)
+    scale = TILE_SIZE * (2 ** zoom)
+    x = (lon + 180.0) / 360.0 * scale
+    lat_rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * scale
+    return x, y
+
+def _touched_tiles(px, py, zoom):
+    """Return the set of (z, x, y) tiles whose rendering is affected by the given pixels"""
+    tiles = set()
+    for dx in (-BLUR_RADIUS, 0, BLUR_RADIUS):
+        for dy in (-BLUR_RADIUS, 0, BLUR_RADIUS):
+            tx = np.floor((px + dx) / TILE_SIZE).astype(int)
+            ty = np.floor((py + dy) / TILE_SIZE).astype(int)
+            tiles.update((zoom, int(x), int(y)) for x, y in zip(tx, ty))
+    return tiles
+
+def _blur(grid):
+    """Separable gaussian blur using shifted sums"""
+    r = BLUR_RADIUS
+    padded = np.pad(grid, r)
+    rows = sum(_KERNEL[i] * padded[:, i:i + grid.shape[1]] for i in range(len(_KERNEL)))
+    return sum(_KERNEL[i] * rows[i:i + grid.shape[0], :] for i in range(len(_KERNEL)))
+
+def render_tile(px, py, weights, tile_x, tile_y):
+    """Render one RGBA heatmap tile from global pixel coordinates, or None if empty"""
+    margin = BLUR_RADIUS
+    left = tile_x * TILE_SIZE - margin
+    top = tile_y * TILE_SIZE - margin
+    size = TILE_SIZE + 2 * margin
+
+    local_x = px - left
+    local_y = py - top
+    inside = (local_x >= 0) & (local_x < size) & (local_y >= 0) & (local_y < size)
+    if not inside.any():
+        return None
+
+    grid, _, _ = np.histogram2d(
+        local_y[inside], local_x[inside],
+        bins=size, range=[[0, size], [0, size]],
+        weights=weights[inside]
+    )
+    density = _blur(grid)[margin:margin + TILE_SIZE, margin:margin + TILE_SIZE]
+    if density.max() <= 0.01:
+        return None
+
+    # Fixed saturation curve keeps neighbouring tiles seamless without a global max
+    intensity = 1.0 - np.exp(-density / SATURATION)
+    rgba = _COLORMAP[(intensity * 255).astype(np.uint8)]
+    rgba[intensity < 0.02] = 0
+    return Image.fromarray(rgba, mode="RGBA")
+
+def _tile_path(version, z, x, y):
+    return os.path.join(TILE_ROOT, f"v{version}", str(z), str(x), f"{y}.png")
+
+def _load_manifest():
+    """Load the cache manifest describing the current version, points and tiles"""
+    if not os.path.exists(MANIFEST_PATH):
+        return {"version": 0, "points": {}, "tiles": {}}
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": 0, "points": {}, "tiles": {}}
+
+def _save_manifest(manifest):
+    """Atomically replace the cache manifest"""
+    os.makedirs(TILE_ROOT, exist_ok=True)
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def _carry_forward(old_version, new_version, z, x, y):
+    """Reuse an untouched tile in the new version directory without re-rendering it"""
+    src = _tile_path(old_version, z, x, y)
+    dst = _tile_path(new_version, z, x, y)
+    if not os.path.exists(src):
+        return False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return True
+
+def _prune_old_versions(keep):
+    """Delete version directories other than the ones listed in keep"""
+    if not os.path.isdir(TILE_ROOT):
+        return
+    for entry in os.listdir(TILE_ROOT):
+        if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) not in keep:
+            shutil.rmtree(os.path.join(TILE_ROOT, entry), ignore_errors=True)
+
+def update_heatmap(points):
+    """Bring the tile cache up to date with the given incident points.
+
+    points maps a stable key (e.g. "sos:12") to (latitude, longitude, weight).
+    Only tiles touched by added, moved or removed points are re-rendered; the
+    rest are carried forward into the new data version. Returns the version.
+    """
+    with _lock:
+        manifest = _load_manifest()
+        old_points = manifest["points"]
+        new_points = {k: [float(v[0]), float(v[1]), float(v[2])] for k, v in points.items()}
+
+        changed = [k for k in new_points if old_points.get(k) != new_points[k]]
+        changed += [k for k in old_points if k not in new_points]
+        if not changed and manifest["version"] > 0:
+            return manifest["version"]
+
+        old_version = manifest["version"]
+        new_version = old_version + 1
+
+        changed_coords = [new_points.get(k) or old_points[k] for k in changed]
+        changed_lat = np.array([c[0] for c in changed_coords])
+        changed_lon = np.array([c[1] for c in changed_coords])
+
+        all_lat = np.array([p[0] for p in new_points.values()])
+        all_lon = np.array([p[1] for p in new_points.values()])
+        all_weights = np.array([p[2] for p in new_points.values()])
+
+        tiles = {}
+        for zoom in range(HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM + 1):
+            cpx, cpy = latlon_to_pixels(changed_lat, changed_lon, zoom)
+            touched = _touched_tiles(cpx, cpy, zoom) if old_version else set()
+
+            px, py = latlon_to_pixels(all_lat, all_lon, zoom)
+            if not old_version:
+                # Cold cache: every tile holding a point needs rendering
+                touched = _touched_tiles(px, py, zoom)
+
+            for key, tile_version in manifest["tiles"].items():
+                z, x, y = (int(part) for part in key.split("/"))
+                if z == zoom and (z, x, y) not in touched:
+                    if _carry_forward(old_version, new_version, z, x, y):
+                        tiles[key] = new_version
+
+            for z, x, y in touched:
+                image = render_tile(px, py, all_weights, x, y)
+                if image is None:
+                    continue
+                path = _tile_path(new_version, z, x, y)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                image.save(path, format="PNG", optimize=True)
+                tiles[f"{z}/{x}/{y}"] = new_version
+
+        _save_manifest({"version": new_version, "points": new_points, "tiles": tiles})
+        # Keep the previous version so maps already open in a browser still resolve
+        _prune_old_versions({old_version, new_version})
+        return new_version
+
+def get_heatmap_tile_url(version):
+    """Leaflet URL template for a given data version"""
+    return f"{TILE_URL_ROOT}/v{version}/{{z}}/{{x}}/{{y}}.png"
+
+def incident_points(sos_alerts, status_reports):
+    """Build heatmap points from SOS alerts and help/trapped status reports"""
+    points = {}
+    for alert in sos_alerts or []:
+        alert_id, lat, lon = alert[0], alert[3], alert[4]
+        if lat and lon:
+            points[f"sos:{alert_id}"] = (lat, lon, 1.0)
+    for report in status_reports or []:
+        report_id, status, lat, lon = report[0], report[2], report[4], report[5]
+        if lat and lon and status in ('help', 'trapped'):
+            points[f"report:{report_id}"] = (lat, lon, 1.0 if status == 'trapped' else 0.6)
+    return points
@@ -0,0 +1,239 @@
+import json
+import time
+import argparse
+from database import ARCHIVED_TABLES, PARTITIONED_TABLES, execute_query, get_connection, maintain_partitions
+
+# Observed writes per second (rows inserted, updated or deleted) below which
+# traffic counts as low and heavy jobs may run
+LOW_TRAFFIC_WRITES_PER_SEC = 50
+# Heavy jobs already running stop between targets above this rate, unless overdue
+HIGH_TRAFFIC_WRITES_PER_SEC = 500
+WRITE_RATE_SAMPLE_SECONDS = 2.0
+# vacuum_cost_delay (ms) for vacuums that run under write load
+VACUUM_COST_DELAY_MS = 10
+# Tables are vacuumed once dead rows exceed this share of live rows and VACUUM_MIN_DEAD_ROWS
+VACUUM_DEAD_RATIO = 0.1
+VACUUM_MIN_DEAD_ROWS = 1000
+VACUUM_TABLES_PER_RUN = 5
+# Tables are analyzed once this share of their rows changed since the last analyze
+ANALYZE_CHANGE_RATIO = 0.05
+ANALYZE_MIN_CHANGES = 1000
+# Indexes are rebuilt once their table has churned (rows updated + deleted)
+# this many times its live rows since the last rebuild
+REINDEX_CHURN_RATIO = 1.0
+REINDEX_MIN_BYTES = 1024 * 1024
+# Seconds between scheduler ticks in --loop mode
+SCHEDULER_INTERVAL = 300
+
+# Job -> (hours between runs, heavy, hours after which a heavy job runs despite write load)
+JOBS = {
+    "partitions": (6, False, None),
+    "analyze": (1, False, None),
+    "rollups": (1, False, None),
+    "vacuum": (6, True, 24),
+    "reindex": (24 * 7, True, 24 * 14),
+}
+
+def _write_counter():
+    result = execute_query(
+        "SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)::bigint FROM pg_stat_user_tables",
+        fetch=True
+    )
+    return result[0][0] if result else 0
+
+def observed_write_rate(sample_seconds=WRITE_RATE_SAMPLE_SECONDS):
+    """Rows written per second across all tables, sampled from the statistics collector"""
+    first = _write_counter()
+    started = time.perf_counter()
+    time.sleep(sample_seconds)
+    return (_write_counter() - first) / (time.perf_counter() - started)
+
+def hours_since_last_run(job):
+    """Hours since the job last completed, or since it was first deferred if it never has (None if neither)"""
+    result = execute_query("""
+        SELECT EXTRACT(EPOCH FROM NOW() - COALESCE(MAX(started_at) FILTER (WHERE status = 'ok'), MIN(started_at))) / 3600
+        FROM maintenance_runs WHERE job = %s AND target IS NULL
+    """, (job,), fetch=True)
+    return float(result[0][0]) if result and result[0][0] is not None else None
+
+def _last_detail(job, target):
+    """detail of the newest successful run of a job on a target, as a dict"""
+    result = execute_query(
+        "SELECT detail FROM maintenance_runs WHERE job = %s AND target = %s AND status = 'ok' ORDER BY id DESC LIMIT 1",
+        (job, target), fetch=True
+    )
+    return json.loads(result[0][0]) if result and result[0][0] else {}
+
+def _record(job, target, duration_ms, status, detail=None):
+    execute_query(
+        "INSERT INTO maintenance_runs (job, target, duration_ms, status, detail) VALUES (%s, %s, %s, %s, %s)",
+        (job, target, duration_ms, status, json.dumps(detail) if detail else None)
+    )
+    return {"job": job, "target": target, "status": status, "duration_ms": round(duration_ms, 1), "detail": detail}
+
+def _analyze_targets(cursor):
+    # Autovacuum never analyzes partitioned parents, so their planner statistics
+    # only come from here
+    targets = list(PARTITIONED_TABLES) + [f"{table}_archive" for table in ARCHIVED_TABLES]
+    cursor.execute(
+        "SELECT relname FROM pg_stat_user_tables "
+        "WHERE n_mod_since_analyze > GREATEST(%s * n_live_tup, %s) ORDER BY n_mod_since_analyze DESC",
+        (ANALYZE_CHANGE_RATIO, ANALYZE_MIN_CHANGES)
+    )
+    targets += [row[0] for row in cursor.fetchall() if row[0] not in targets]
+    return [(table, f'ANALYZE "{table}"', None) for table in targets]
+
+def _vacuum_targets(cursor):
+    cursor.execute(
+        "SELECT relname, n_dead_tup FROM pg_stat_user_tables "
+        "WHERE n_dead_tup > GREATEST(%s * n_live_tup, %s) ORDER BY n_dead_tup DESC LIMIT %s",
+        (VACUUM_DEAD_RATIO, VACUUM_MIN_DEAD_ROWS, VACUUM_TABLES_PER_RUN)
+    )
+    return [(table, f'VACUUM (ANALYZE) "{table}"', {"dead_rows": dead}) for table, dead in cursor.fetchall()]
+
+def _reindex_targets(cursor):
+    cursor.execute(
+        "SELECT relname, n_tup_upd + n_tup_del, n_live_tup FROM pg_stat_user_tables "
+        "WHERE pg_indexes_size(relid) > %s",
+        (REINDEX_MIN_BYTES,)
+    )
+    targets = []
+    for table, churn, live in cursor.fetchall():
+        previous = _last_detail("reindex", table).get("churn", 0)
+        # Statistics resets restart the counter
+        since = churn - previous if churn >= previous else churn
+        if since > REINDEX_CHURN_RATIO * max(live, 1):
+            targets.append((table, f'REINDEX TABLE CONCURRENTLY "{table}"', {"churn": churn}))
+    return targets
+
+def _reconcile_rollups(conn):
+    """Recount archive_daily_counts for days archived since the last reconciliation"""
+    results = []
+    for table, group_column in ARCHIVED_TABLES.items():
+        started = time.perf_counter()
+        last_event = _last_detail("rollups", table).get("event_id", 0)
+        cursor = conn.cursor()
+        # Archive batches wait while the days are recounted
+        cursor.execute("BEGIN")
+        cursor.execute("LOCK TABLE archive_daily_counts IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(f"SELECT COALESCE(MAX(archive_event_id), 0) FROM {table}_archive")
+        high = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT DISTINCT created_at::date FROM {table}_archive WHERE archive_event_id > %s AND archive_event_id <= %s",
+            (last_event, high)
+        )
+        days = [row[0] for row in cursor.fetchall()]
+        if days:
+            cursor.execute("DELETE FROM archive_daily_counts WHERE table_name = %s AND day = ANY(%s)", (table, days))
+            cursor.execute(f"""
+                INSERT INTO archive_daily_counts (table_name, day, status, row_count)
+                SELECT %s, created_at::date, COALESCE({group_column}, ''), COUNT(*) FROM {table}_archive
+                WHERE created_at >= %s AND created_at < %s::date + 1 AND created_at::date = ANY(%s)
+                GROUP BY 2, 3
+            """, (table, min(days), max(days), days))
+        cursor.execute("COMMIT")
+        results.append(_record("rollups", table, (time.perf_counter() - started) * 1000, "ok",
+                               {"event_id": high, "days": len(days)}))
+    return results
+
+def _run_statements(job, targets, conn, throttle):
+    """Run (target, statement, detail) steps, recording each; stops early if throttle() says so"""
+    results = []
+    cursor = conn.cursor()
+    for target, statement, detail in targets:
+        if throttle():
+            results.append(_record(job, target, 0, "deferred"))
+            break
+        started = time.perf_counter()
+        try:
+            cursor.execute(statement)
+            status = "ok"
+        except Exception as e:
+            status = "failed"
+            detail = dict(detail or {}, error=str(e))
+        results.append(_record(job, target, (time.perf_counter() - started) * 1000, status, detail))
+    return results
+
+def run_job(job, write_rate, overdue=False, forced=False):
+    """Run one job now, recording every target and a summary row; returns the result rows"""
+    conn = get_connection()
+    if not conn:
+        return []
+    started = time.perf_counter()
+    results = []
+    status = "ok"
+    detail = {"writes_per_sec": round(write_rate)}
+
+    def throttle():
+        # Heavy work already underway backs off when a surge starts, unless it cannot wait
+        return (JOBS[job][1] and not (overdue or forced)
+                and observed_write_rate(WRITE_RATE_SAMPLE_SECONDS / 2) > HIGH_TRAFFIC_WRITES_PER_SEC)
+
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        # Vacuums under load yield I/O to the writers
+        cursor.execute(f"SET vacuum_cost_delay = {VACUUM_COST_DELAY_MS if write_rate > LOW_TRAFFIC_WRITES_PER_SEC else 0}")
+        if job == "partitions":
+            detail["days_checked"] = maintain_partitions()
+        elif job == "rollups":
+            results = _reconcile_rollups(conn)
+        else:
+            targets = {"analyze": _analyze_targets, "vacuum": _vacuum_targets, "reindex": _reindex_targets}[job](cursor)
+            results = _run_statements(job, targets, conn, throttle)
+        if any(result["status"] == "failed" for result in results):
+            status = "failed"
+    except Exception as e:
+        status = "failed"
+        detail["error"] = str(e)
+    finally:
+        conn.close()
+    results.append(_record(job, None, (time.perf_counter() - started) * 1000, status, detail))
+    return results
+
+def run_maintenance(force=False, jobs=None, progress=None):
+    """Run the jobs that are due, heavy ones only while write traffic is low.
+
+    A heavy job is deferred while writes exceed LOW_TRAFFIC_WRITES_PER_SEC,
+    unless it is overdue, so statistics and bloat do not drift for the
+    length of a multi-day flood; overdue vacuums run with a cost delay.
+    force runs every (selected) job now. Returns the recorded result rows.
+    progress, if given, is called with each job name before it runs.
+    """
+    write_rate = observed_write_rate()
+    results = []
+    for job, (interval, heavy, max_defer) in JOBS.items():
+        if jobs and job not in jobs:
+            continue
+        age = hours_since_last_run(job)
+        if not force and age is not None and age < interval:
+            continue
+        overdue = age is not None and max_defer is not None and age >= max_defer
+        if heavy and not force and not overdue and write_rate > LOW_TRAFFIC_WRITES_PER_SEC:
+            results.append(_record(job, None, 0, "deferred", {"writes_per_sec": round(write_rate)}))
+            continue
+        if progress:
+            progress(job)
+        results += run_job(job, write_rate, overdue, force)
+    return results
+
+def job_history(limit=50):
+    """Recent job runs, newest first: (job, target, started_at, duration_ms, status)"""
+    return execute_query(
+        "SELECT job, COALESCE(target, '(job)'), started_at, duration_ms, status FROM maintenance_runs ORDER BY id DESC LIMIT %s",
+        (limit,), fetch=True
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run database maintenance jobs when they are due")
+    parser.add_argument("--job", action="append", choices=sorted(JOBS), help="limit to these jobs (repeatable)")
+    parser.add_argument("--force", action="store_true", help="run now regardless of schedule and write load")
+    parser.add_argument("--loop", action="store_true", help=f"keep running, checking every {SCHEDULER_INTERVAL}s")
+    args = parser.parse_args()
+
+    while True:
+        for result in run_maintenance(args.force, args.job, lambda job: print(f"Running {job}...", flush=True)):
+            print(f"{result['job']:<10} {result['target'] or '(job)':<40} {result['status']:<8} {result['duration_ms']:>10.1f} ms")
+        if not args.loop:
+            break
+        time.sleep(SCHEDULER_INTERVAL)
@@ -0,0 +1,304 @@
+import os
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Port of the local /metrics endpoint; unset disables it
+METRICS_PORT_ENV = "FLOODAID_METRICS_PORT"
+METRICS_ADDRESS = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Histogram bucket upper bounds in seconds
+RENDER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+IMAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+# System status thresholds used by system_health
+QUEUE_DEGRADED_FRACTION = 0.8
+RENDER_DEGRADED_SECONDS = 5
+
+_metrics = []
+# Callables returning (name, type, help, [(labels, value)]) at scrape time
+_collectors = []
+_server = None
+_server_lock = threading.Lock()
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric with one value per label combination"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=RENDER_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def quantile(self, fraction, **labels):
+        """Upper bound of the bucket holding the given fraction of observations (None if none)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            counts = list(state[0]) if state else None
+        if not counts or not sum(counts):
+            return None
+        threshold = fraction * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            seen += count
+            if seen >= threshold:
+                return bound
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+    def label_sets(self):
+        with self._lock:
+            return [dict(key) for key in self._values]
+
+def collector(function):
+    """Register a function that reports metrics computed at scrape time"""
+    _collectors.append(function)
+    return function
+
+@collector
+def _write_queue_metrics():
+    import write_queue
+    queue = write_queue.current_write_queue()
+    if queue is None:
+        return []
+    stats = queue.stats()
+    return [
+        ("floodaid_write_queue_depth", "gauge", "Writes accepted and not yet committed",
+         [((), stats["outstanding"])]),
+        ("floodaid_write_queue_capacity", "gauge", "Outstanding writes beyond which submissions wait",
+         [((), queue.max_size)]),
+        ("floodaid_write_queue_submissions_total", "counter", "Writes by outcome since the process started",
+         [((("outcome", outcome),), stats[outcome]) for outcome in ("submitted", "committed", "rejected", "failed")]),
+        ("floodaid_write_queue_ack_seconds", "gauge", "Acknowledgement latency over recent submissions",
+         [((("quantile", "0.5"),), stats["ack_p50_ms"] / 1000), ((("quantile", "0.99"),), stats["ack_p99_ms"] / 1000)]),
+    ]
+
+@collector
+def _cache_metrics():
+    from cache import get_cache
+    lookups = get_cache().lookup_counts()
+    ratios = []
+    for kind in sorted({kind for kind, _ in lookups}):
+        hits = lookups.get((kind, "hit"), 0)
+        total = hits + lookups.get((kind, "miss"), 0)
+        ratios.append(((("cache", kind),), hits / total if total else 0.0))
+    return [
+        ("floodaid_cache_lookups_total", "counter", "Versioned cache lookups by cache and result",
+         [((("cache", kind), ("result", result)), count) for (kind, result), count in sorted(lookups.items())]),
+        ("floodaid_cache_hit_ratio", "gauge", "Share of versioned cache lookups that hit", ratios),
+    ]
+
+@collector
+def _query_metrics():
+    from query_stats import LATENCY_BUCKETS_MS, snapshot
+    by_function = {}
+    for entry in snapshot():
+        state = by_function.setdefault(entry["function"], [[0] * len(entry["buckets"]), 0.0, 0])
+        state[0] = [a + b for a, b in zip(state[0], entry["buckets"])]
+        state[1] += entry["total_ms"] / 1000
+        state[2] += entry["errors"]
+    histogram = []
+    errors = []
+    for function, (buckets, total, failed) in sorted(by_function.items()):
+        labels = (("function", function),)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (float("inf"),), buckets):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _format_value(bound / 1000)
+            histogram.append((labels + (("le", le),), cumulative, "_bucket"))
+        histogram.append((labels, total, "_sum"))
+        histogram.append((labels, cumulative, "_count"))
+        errors.append((labels, failed))
+    return [
+        ("floodaid_db_query_duration_seconds", "histogram", "execute_query latency by database function", histogram),
+        ("floodaid_db_query_errors_total", "counter", "Failed queries by database function", errors),
+    ]
+
+@collector
+def _connection_metrics():
+    # Each query opens its own connection (there is no pool), so usage is
+    # read from the server: this database's backends against the server limit
+    from database import execute_query
+    rows = execute_query(
+        "SELECT COALESCE(state, 'unknown'), COUNT(*) FROM pg_stat_activity WHERE datname = current_database() GROUP BY 1",
+        fetch=True
+    )
+    limit = execute_query("SELECT current_setting('max_connections')::int", fetch=True)
+    return [
+        ("floodaid_db_connections", "gauge", "Connections to the application database by state",
+         [((("state", state),), count) for state, count in rows]),
+        ("floodaid_db_max_connections", "gauge", "Server connection limit",
+         [((), limit[0][0])] if limit else []),
+    ]
+
+SOS_ALERTS = Counter("floodaid_sos_alerts_total", "SOS alerts stored, by write path", ("path",))
+STATUS_REPORTS = Counter("floodaid_status_reports_total", "Status reports stored, by write path", ("path",))
+PAGE_RENDER_SECONDS = Histogram("floodaid_page_render_seconds", "Page render time by page and role", ("page", "role"))
+IMAGE_PROCESSING_SECONDS = Histogram(
+    "floodaid_image_processing_seconds", "Uploaded photo resize and encode time, by outcome", ("outcome",),
+    buckets=IMAGE_BUCKETS
+)
+PROCESS_START = Gauge("floodaid_process_start_time_seconds", "Unix time the server process started")
+PROCESS_START.set(time.time())
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for function in _collectors:
+        try:
+            families = function()
+        except Exception:
+            # One failing source (e.g. the database being down) must not hide the rest
+            families = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                labels, value = sample[0], sample[1]
+                suffix = sample[2] if len(sample) > 2 else ""
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the server log
+        pass
+
+def start_metrics_server(port=None):
+    """Serve /metrics on METRICS_ADDRESS in a background thread, once per process.
+
+    port defaults to $FLOODAID_METRICS_PORT; returns the server, or None if
+    no port is configured or it is taken (e.g. by another server process).
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        port = port if port is not None else os.environ.get(METRICS_PORT_ENV)
+        if not port:
+            return None
+        try:
+            _server = ThreadingHTTPServer((METRICS_ADDRESS, int(port)), MetricsHandler)
+        except OSError:
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+def system_health():
+    """(status, reasons) from the live metrics: 'operational', 'degraded' or 'down'"""
+    from database import execute_query
+    import write_queue
+    if not execute_query("SELECT 1", fetch=True):
+        return "down", ["database unreachable"]
+
+    reasons = []
+    queue = write_queue.current_write_queue()
+    if queue is not None:
+        stats = queue.stats()
+        if stats["outstanding"] >= QUEUE_DEGRADED_FRACTION * queue.max_size:
+            reasons.append(f"write queue {stats['outstanding']}/{queue.max_size} full")
+        if stats["rejected"]:
+            reasons.append(f"{stats['rejected']} submissions rejected by backpressure")
+        if stats["failed"]:
+            reasons.append(f"{stats['failed']} writes dead-lettered")
+        if stats["outage_retries"]:
+            reasons.append(f"write queue waiting for the database ({stats['outage_retries']} retries)")
+    for labels in PAGE_RENDER_SECONDS.label_sets():
+        p95 = PAGE_RENDER_SECONDS.quantile(0.95, **labels)
+        if p95 is not None and p95 > RENDER_DEGRADED_SECONDS:
+            reasons.append(f"{labels['page']} p95 render over {RENDER_DEGRADED_SECONDS}s for {labels['role']}")
+    return ("degraded" if reasons else "operational"), reasons
+
@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import functools
+import threading
+import contextlib
+import tracemalloc
+from collections import Counter, defaultdict, deque
+
+# Profile every render in this process; otherwise only sessions that turned it on
+PROFILE_ENV = "FLOODAID_PROFILE_PAGES"
+# Seconds between stack samples of a profiled render
+SAMPLE_INTERVAL = 0.005
+# Renders kept per page for the percentile tables
+PROFILE_HISTORY = 200
+# tracemalloc slows allocation-heavy code several times over, so peak memory
+# is traced on one in this many profiled renders of a page, and those renders
+# are left out of the timing percentiles
+MEMORY_TRACE_EVERY = 4
+PERCENTILES = (0.5, 0.9, 0.99)
+SECTIONS = ("data fetch", "compute", "figure build", "element emission")
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+# Repo modules whose time counts as data fetch
+_DATA_FILES = ("database.py", "cache.py", "query_stats.py")
+# Library packages entered from repo code decide the section; anything else is compute
+_LIBRARY_SECTIONS = (
+    (f"{os.sep}psycopg2{os.sep}", "data fetch"),
+    (f"{os.sep}streamlit{os.sep}runtime{os.sep}caching{os.sep}", "data fetch"),
+    (f"{os.sep}plotly{os.sep}", "figure build"),
+    (f"{os.sep}folium{os.sep}", "figure build"),
+    (f"{os.sep}streamlit{os.sep}", "element emission"),
+)
+
+# Page -> recent render profiles, newest last
+_renders = defaultdict(lambda: deque(maxlen=PROFILE_HISTORY))
+_render_counts = Counter()
+# Thread ident -> profile of the render running on it
+_active = {}
+_tracing = 0
+_lock = threading.Lock()
+_installed = False
+
+def enabled(session_flag=False):
+    """Whether this render should be profiled"""
+    return bool(session_flag) or os.environ.get(PROFILE_ENV) == "1"
+
+@functools.lru_cache(maxsize=4096)
+def _section_of(filename):
+    """Section a frame's file belongs to, or None for repo code outside the data layer"""
+    if filename.startswith(_ROOT) and "site-packages" not in filename:
+        return "data fetch" if filename.endswith(_DATA_FILES) else None
+    for marker, section in _LIBRARY_SECTIONS:
+        if marker in filename:
+            return section
+    return "compute"
+
+def classify(frame):
+    """Section of a stack sample.
+
+    Any data-layer frame makes it data fetch. Otherwise the first library
+    section entered below the innermost repo frame wins, so Streamlit
+    wrappers (fragments, cached functions) calling back into repo code do
+    not count as element emission.
+    """
+    filenames = []
+    while frame is not None:
+        filenames.append(frame.f_code.co_filename)
+        frame = frame.f_back
+    in_app = False
+    entered = "compute"
+    # Outermost first; frames before the first repo frame are Streamlit's script runner
+    for filename in reversed(filenames):
+        section = _section_of(filename)
+        if section is None:
+            in_app = True
+            entered = "compute"
+        elif section == "data fetch" and (in_app or filename.startswith(_ROOT)):
+            return section
+        elif in_app and entered == "compute":
+            entered = section
+    return entered
+
+class RenderProfile:
+    """Samples one render's stack on a background thread and counts its queries and elements"""
+
+    def __init__(self, page, trace_memory):
+        self.page = page
+        self.trace_memory = trace_memory
+        self.thread = threading.get_ident()
+        self.samples = Counter()
+        self.elements = Counter()
+        self.queries = 0
+        self.query_ms = 0.0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{page}", daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread)
+            if frame is not None:
+                self.samples[classify(frame)] += 1
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+def _on_query(elapsed_ms, rows, nbytes):
+    profile = _active.get(threading.get_ident())
+    if profile is not None:
+        profile.queries += 1
+        profile.query_ms += elapsed_ms
+
+def _install():
+    """Hook query recording and element emission once per process"""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        from query_stats import add_observer
+        from streamlit.delta_generator import DeltaGenerator
+        add_observer(_on_query)
+
+        # Every element, container and chart Streamlit sends goes through _enqueue
+        enqueue = DeltaGenerator._enqueue
+
+        @functools.wraps(enqueue)
+        def counting_enqueue(self, delta_type, *args, **kwargs):
+            profile = _active.get(threading.get_ident())
+            if profile is not None:
+                profile.elements[delta_type] += 1
+            return enqueue(self, delta_type, *args, **kwargs)
+
+        DeltaGenerator._enqueue = counting_enqueue
+        _installed = True
+
+@contextlib.contextmanager
+def profile_render(page):
+    """Profile the render inside the block and add it to the page's history.
+
+    Section times split the wall time in proportion to the stack samples
+    taken in each section; query time is exact. On every
+    MEMORY_TRACE_EVERY-th render of a page, peak memory is the Python heap
+    high-water mark above its level at the start of the render (renders
+    overlapping in other sessions inflate each other's peaks and times).
+    """
+    global _tracing
+    _install()
+    with _lock:
+        profile = RenderProfile(page, _render_counts[page] % MEMORY_TRACE_EVERY == 0)
+        _render_counts[page] += 1
+        if profile.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            elif not _tracing:
+                tracemalloc.reset_peak()
+            _tracing += 1
+            base_memory = tracemalloc.get_traced_memory()[0]
+        _active[profile.thread] = profile
+    started = time.perf_counter()
+    profile.start()
+    try:
+        yield profile
+    finally:
+        # st.rerun() and st.stop() end renders with an exception; they are still recorded
+        wall_ms = (time.perf_counter() - started) * 1000
+        profile.stop()
+        peak_bytes = None
+        with _lock:
+            del _active[profile.thread]
+            if profile.trace_memory:
+                peak_bytes = max(tracemalloc.get_traced_memory()[1] - base_memory, 0)
+                _tracing -= 1
+                if not _tracing:
+                    tracemalloc.stop()
+        _record(profile, wall_ms, peak_bytes)
+
+def _record(profile, wall_ms, peak_bytes):
+    total_samples = sum(profile.samples.values())
+    if total_samples:
+        sections = {section: wall_ms * profile.samples[section] / total_samples for section in SECTIONS}
+    else:
+        # Too short to sample
+        sections = dict.fromkeys(SECTIONS, 0.0)
+        sections["compute"] = wall_ms
+    entry = {
+        "time": time.time(),
+        "wall_ms": wall_ms,
+        "sections": sections,
+        "query_ms": profile.query_ms,
+        "queries": profile.queries,
+        "elements": sum(profile.elements.values()),
+        "element_types": dict(profile.elements),
+        "peak_kb": None if peak_bytes is None else peak_bytes / 1024,
+    }
+    with _lock:
+        _renders[profile.page].append(entry)
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+def percentile_table():
+    """Per page and metric: renders, p50/p90/p99 and max over the recent renders"""
+    with _lock:
+        renders = {page: list(entries) for page, entries in _renders.items()}
+    rows = []
+    for page, entries in sorted(renders.items()):
+        traced = [entry for entry in entries if entry["peak_kb"] is not None]
+        # Timings come from untraced renders once there are any
+        timed = [entry for entry in entries if entry["peak_kb"] is None] or entries
+        metrics = {"wall (ms)": [entry["wall_ms"] for entry in timed]}
+        for section in SECTIONS:
+            metrics[f"{section} (ms)"] = [entry["sections"][section] for entry in timed]
+        metrics["query time (ms)"] = [entry["query_ms"] for entry in timed]
+        metrics["queries"] = [entry["queries"] for entry in entries]
+        metrics["elements"] = [entry["elements"] for entry in entries]
+        metrics["peak memory (KB)"] = [entry["peak_kb"] for entry in traced]
+        for metric, values in metrics.items():
+            if not values:
+                continue
+            row = {"page": page, "metric": metric, "renders": len(values)}
+            for fraction in PERCENTILES:
+                row[f"p{round(fraction * 100)}"] = round(_percentile(values, fraction), 1)
+            row["max"] = round(max(values), 1)
+            rows.append(row)
+    return rows
+
+def element_counts(page):
+    """Element types emitted by a page's most recent profiled render, most frequent first"""
+    with _lock:
+        entries = _renders.get(page)
+        latest = entries[-1]["element_types"] if entries else {}
+    return sorted(latest.items(), key=lambda item: item[1], reverse=True)
+
+def reset():
+    """Forget the render profiles recorded so far in this process"""
+    with _lock:
+        _renders.clear()
+        _render_counts.clear()
@@ -0,0 +1,219 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import functools
+import threading
+import contextvars
+from datetime import datetime
+
+# Latency histogram bucket upper bounds in milliseconds (the last bucket is unbounded)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Queries slower than this are candidates for the slow-query log
+SLOW_QUERY_MS = 250
+# Share of slow queries written to the log; failures and queries over
+# SLOW_QUERY_ALWAYS_MS are always written
+SLOW_LOG_SAMPLE_RATE = 0.2
+SLOW_QUERY_ALWAYS_MS = 2000
+SLOW_LOG_ENV = "FLOODAID_SLOW_QUERY_LOG"
+DEFAULT_SLOW_LOG = os.path.join("logs", "slow_queries.jsonl")
+# The log is rotated to <path>.1 past this size
+SLOW_LOG_MAX_BYTES = 10 * 1024 * 1024
+# Bytes fetched are estimated from this many rows of each result
+BYTES_SAMPLE_ROWS = 100
+
+# Page being rendered in this script run, set by app.render_page
+_current_page = contextvars.ContextVar("query_stats_page", default=None)
+
+# (call site, database function) -> stats dict
+_stats = {}
+# Callables notified of every query as (elapsed_ms, rows, bytes), see add_observer
+_observers = []
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_DATABASE_FILES = ("database.py", "query_stats.py")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def set_page(page_name):
+    """Attribute queries made by this script run to a page"""
+    _current_page.set(page_name)
+
+def add_observer(callback):
+    """Call callback(elapsed_ms, rows, bytes) after every recorded query, in the querying thread"""
+    if callback not in _observers:
+        _observers.append(callback)
+
+def normalize_sql(query):
+    """Collapse whitespace and replace literals and placeholders with ?, so repeated shapes group together"""
+    query = _STRING_LITERAL.sub("?", query)
+    query = _PLACEHOLDER.sub("?", query)
+    query = _NUMBER.sub("?", query)
+    query = _VALUE_LIST.sub("(...)", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+@functools.lru_cache(maxsize=None)
+def _display_path(filename):
+    return os.path.relpath(filename, _ROOT)
+
+def _call_site():
+    """(caller outside database.py as 'file:line function', database.py function, outermost component module)"""
+    frame = sys._getframe(2)
+    db_function = "execute_query"
+    site = None
+    component = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if site is None:
+            if filename.endswith(_DATABASE_FILES):
+                if db_function == "execute_query" and frame.f_code.co_name not in ("execute_query", "cached_query"):
+                    db_function = frame.f_code.co_name
+            else:
+                site = f"{_display_path(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        if f"components{os.sep}" in filename:
+            component = os.path.splitext(os.path.basename(filename))[0]
+        frame = frame.f_back
+    return site or "unknown", db_function, component
+
+def _estimate_bytes(rows):
+    """Approximate size of fetched rows from a sample of them"""
+    if not rows:
+        return 0
+    sample = rows[:BYTES_SAMPLE_ROWS]
+    size = 0
+    for row in sample:
+        for value in row:
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+            elif value is not None:
+                size += 8
+    return size * len(rows) // len(sample)
+
+def record_query(query, started, rows=0, result=None, error=None):
+    """Record one execute_query call that began at started (a perf_counter value)"""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    site, db_function, component = _call_site()
+    page = _current_page.get() or component
+    nbytes = _estimate_bytes(result) if result else 0
+    bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), len(LATENCY_BUCKETS_MS))
+
+    key = (site, db_function)
+    with _lock:
+        stats = _stats.get(key)
+        if stats is None:
+            stats = _stats[key] = {
+                "site": site,
+                "function": db_function,
+                "calls": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "rows": 0,
+                "bytes": 0,
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                "pages": set(),
+            }
+        stats["calls"] += 1
+        stats["errors"] += error is not None
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["rows"] += rows or 0
+        stats["bytes"] += nbytes
+        stats["buckets"][bucket] += 1
+        if page:
+            stats["pages"].add(page)
+
+    for observer in _observers:
+        observer(elapsed_ms, rows or 0, nbytes)
+
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    if error is not None or elapsed_ms >= SLOW_QUERY_ALWAYS_MS or (slow and random.random() < SLOW_LOG_SAMPLE_RATE):
+        _log_slow({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "ms": round(elapsed_ms, 1),
+            "page": page,
+            "site": site,
+            "function": db_function,
+            "rows": rows or 0,
+            "bytes": nbytes,
+            "sql": normalize_sql(query),
+            "error": str(error) if error is not None else None,
+        })
+
+def _slow_log_path():
+    return os.environ.get(SLOW_LOG_ENV, DEFAULT_SLOW_LOG)
+
+def _log_slow(entry):
+    path = _slow_log_path()
+    line = json.dumps(entry) + "\n"
+    with _log_lock:
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > SLOW_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            # Losing a log line must never fail the query that produced it
+            pass
+
+def percentile_ms(buckets, fraction):
+    """Upper bound of the histogram bucket holding the given fraction of calls"""
+    total = sum(buckets)
+    if not total:
+        return 0
+    threshold = fraction * total
+    seen = 0
+    for i, count in enumerate(buckets):
+        seen += count
+        if seen >= threshold:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float("inf")
+    return float("inf")
+
+def snapshot():
+    """Copy of the per-call-site stats of this process, with percentile estimates"""
+    with _lock:
+        entries = [dict(stats, buckets=list(stats["buckets"]), pages=sorted(stats["pages"])) for stats in _stats.values()]
+    for entry in entries:
+        entry["avg_ms"] = entry["total_ms"] / entry["calls"]
+        entry["p50_ms"] = percentile_ms(entry["buckets"], 0.5)
+        entry["p95_ms"] = percentile_ms(entry["buckets"], 0.95)
+        entry["p99_ms"] = percentile_ms(entry["buckets"], 0.99)
+    return entries
+
+def top_offenders(limit=20, sort_by="total_ms"):
+    """Call sites with the most total (or other sort_by) query time"""
+    return sorted(snapshot(), key=lambda entry: entry[sort_by], reverse=True)[:limit]
+
+def reset():
+    """Forget the stats recorded so far in this process"""
+    with _lock:
+        _stats.clear()
+
+def recent_slow_queries(limit=50, max_bytes=256 * 1024):
+    """Newest entries of the slow-query log, newest first"""
+    path = _slow_log_path()
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        f.seek(max(0, os.path.getsize(path) - max_bytes))
+        lines = f.read().decode("utf-8", errors="replace").splitlines()
+    entries = []
+    # The first line may be cut by the seek
+    for line in reversed(lines):
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+        if len(entries) >= limit:
+            break
+    return entries
@@ -0,0 +1,164 @@
+import time
+import argparse
+from datetime import timedelta
+from database import (
+    ARCHIVED_TABLES, PARTITIONED_TABLES, archive_rows, execute_query, get_archived_counts, get_connection,
+    db_now, drop_partitions_before, maintain_partitions, list_daily_partitions
+)
+
+# Rows moved per transaction, and the pause between batches so writers and
+# replication keep up with a large backlog
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_BATCH_PAUSE = 0.05
+
+# Table -> (days kept live, extra condition for rows that may be archived)
+RETENTION_POLICIES = {
+    # Active alerts stay live however old they are
+    "sos_alerts": (7, "status = 'resolved'"),
+    "status_reports": (30, None),
+    # Responses stay with their alert while it is still active
+    "messages": (30, "(alert_id IS NULL OR alert_id NOT IN (SELECT id FROM sos_alerts WHERE status = 'active'))"),
+}
+# Claimed write-queue submission ids are kept this long; journals are replayed within minutes
+SUBMISSION_RETENTION_DAYS = 7
+# Change events are kept this long. Backup segments find updated and archived
+# rows through them, so segments must be taken more often than this.
+CHANGE_EVENT_RETENTION_DAYS = 30
+
+def retention_condition(table, days=None):
+    """SQL condition and params selecting a table's rows past retention.
+
+    The cutoff is a literal timestamp, as in recent_window, so the planner
+    prunes the daily partitions after it instead of scanning them all.
+    """
+    default_days, extra = RETENTION_POLICIES[table]
+    condition = "created_at < %s"
+    if extra:
+        condition += f" AND {extra}"
+    return condition, (db_now() - timedelta(days=default_days if days is None else days),)
+
+def count_expired(table, days=None):
+    """Rows of a table that the next run would archive"""
+    condition, params = retention_condition(table, days)
+    result = execute_query(f"SELECT COUNT(*) FROM {table} WHERE {condition}", params, fetch=True)
+    return result[0][0] if result else 0
+
+def archive_table(table, days=None, batch_size=ARCHIVE_BATCH_SIZE, max_batches=None, progress=None):
+    """Archive a table's expired rows in bounded batches; returns the number moved.
+
+    Each batch is its own short transaction. Stops when no expired rows are
+    left, after max_batches, or when a batch fails. progress, if given, is
+    called as progress(table, rows_moved) after every batch.
+    """
+    condition, params = retention_condition(table, days)
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_rows(table, condition, params, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+        if progress:
+            progress(table, moved)
+        if count < batch_size:
+            break
+        time.sleep(ARCHIVE_BATCH_PAUSE)
+    return moved
+
+def run_retention(tables=None, batch_size=ARCHIVE_BATCH_SIZE, progress=None, vacuum=True):
+    """Archive expired rows of every policy table.
+
+    Daily partitions left empty before the retention cutoff are then
+    dropped whole, and other tables that lost rows are vacuumed so new rows
+    reuse the freed space and live scans stay proportional to the data
+    still live. Claimed submission ids and change events past their own
+    retention are deleted. Returns {table: rows moved}, the dropped
+    partition names and the seconds taken.
+    """
+    started = time.perf_counter()
+    moved = {}
+    dropped = []
+    for table in tables or RETENTION_POLICIES:
+        moved[table] = archive_table(table, batch_size=batch_size, progress=progress)
+        if table in PARTITIONED_TABLES:
+            cutoff = db_now().date() - timedelta(days=RETENTION_POLICIES[table][0])
+            dropped += drop_partitions_before(table, cutoff)
+    execute_query(
+        "DELETE FROM submissions WHERE created_at < %s",
+        (db_now() - timedelta(days=SUBMISSION_RETENTION_DAYS),)
+    )
+    pruned_events = prune_change_events()
+    maintain_partitions()
+    if vacuum:
+        vacuum_tables([table for table, count in moved.items() if count and table not in PARTITIONED_TABLES]
+                      + (["change_events"] if pruned_events else []))
+    return moved, dropped, round(time.perf_counter() - started, 3)
+
+def prune_change_events(days=CHANGE_EVENT_RETENTION_DAYS):
+    """Delete change events older than days; returns the number deleted.
+
+    Ids grow with time, so everything below the oldest id still inside the
+    window goes, walking the primary key rather than scanning by created_at.
+    After a quiet spell with no event inside the window, that is every event.
+    """
+    return execute_query(
+        "DELETE FROM change_events WHERE id < COALESCE("
+        "(SELECT MIN(id) FROM change_events WHERE created_at >= %s), "
+        "(SELECT MAX(id) + 1 FROM change_events))",
+        (db_now() - timedelta(days=days),)
+    )
+
+def vacuum_tables(tables):
+    """VACUUM ANALYZE tables; runs outside a transaction and does not block writers"""
+    if not tables:
+        return
+    conn = get_connection()
+    if not conn:
+        return
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        for table in tables:
+            cursor.execute(f"VACUUM (ANALYZE) {table}")
+        cursor.close()
+    finally:
+        conn.close()
+
+def archive_summary():
+    """Per archived table: live rows, archived rows, archive partitions and live daily partitions"""
+    summary = {}
+    for table in ARCHIVED_TABLES:
+        live = execute_query(f"SELECT COUNT(*) FROM {table}", fetch=True)
+        partitions = execute_query(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            (f"{table}_archive",), fetch=True
+        )
+        summary[table] = {
+            "live_rows": live[0][0] if live else 0,
+            "archived_rows": get_archived_counts(table),
+            "partitions": [row[0] for row in partitions],
+            "live_partitions": [name for _, name in list_daily_partitions(table)] if table in PARTITIONED_TABLES else [],
+        }
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move expired reports, alerts and messages to archive tables")
+    parser.add_argument("command", choices=["run", "status"])
+    parser.add_argument("--table", action="append", choices=sorted(RETENTION_POLICIES),
+                        help="limit to these tables (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only count the rows a run would archive")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for table, info in archive_summary().items():
+            print(f"{table}: {info['live_rows']} live, {info['archived_rows']} archived in {len(info['partitions'])} partitions")
+    elif args.dry_run:
+        for table in args.table or RETENTION_POLICIES:
+            print(f"{table}: {count_expired(table)} rows past retention")
+    else:
+        moved, dropped, seconds = run_retention(args.table, args.batch_size,
+                                                lambda table, count: print(f"{table}: {count} archived", flush=True))
+        print(f"Archived {sum(moved.values())} rows and dropped {len(dropped)} empty partitions in {seconds}s")
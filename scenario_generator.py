@@ -0,0 +1,377 @@
+import io
+import time
+import zlib
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from bulk_import import IMPORT_CHUNK_SIZE, load_chunk
+from database import execute_query
+from geofence import AREA_CENTERS
+
+# Generated coordinates stay inside (min lat, min lon, max lat, max lon)
+HYDERABAD_BOUNDS = (17.25, 78.25, 17.60, 78.65)
+KM_PER_DEG_LAT = 111.0
+
+# Low-lying areas that flood first: area -> (relative weight, spread in km)
+DEFAULT_HOTSPOTS = {
+    "Old City": (4.0, 2.0),
+    "Kukatpally": (3.0, 1.5),
+    "Secunderabad": (2.0, 1.5),
+    "Banjara Hills": (1.0, 1.0),
+    "Gachibowli": (1.0, 1.5),
+}
+# Share of incidents drawn around hotspots; the rest fall anywhere in the bounds
+HOTSPOT_SHARE = 0.7
+
+# Surge curves: (fraction of the scenario elapsed, relative incident rate), interpolated linearly
+SURGE_CURVES = {
+    # One cloudburst: a sharp peak early on, then a long tail of stranded people
+    "flash": ((0, 0.2), (0.08, 1), (0.2, 10), (0.35, 4), (1, 1)),
+    # Two rain bands, the second heavier after the ground is saturated
+    "monsoon": ((0, 1), (0.2, 4), (0.35, 2), (0.6, 8), (0.8, 3), (1, 1)),
+    "steady": ((0, 1), (1, 1)),
+}
+DEFAULT_CURVE = "monsoon"
+DEFAULT_HOURS = 72
+
+# Rows per status report at a given scale, and the minimum of each
+SCALE_RATIOS = {"users": 0.05, "shelters": 0.002, "roads": 0.005, "sos_alerts": 0.25, "messages": 0.5}
+MIN_COUNTS = {"users": 50, "shelters": 5, "roads": 5, "sos_alerts": 1, "messages": 1}
+ROLE_SHARES = (("citizen", 0.975), ("rescue_team", 0.02), ("government", 0.005))
+# Share of status reports with a photo (each about 100 KB, as uploads are), and how
+# many distinct photos are generated
+PHOTO_SHARE = 0.02
+PHOTO_VARIANTS = 8
+PHOTO_SIZE = (640, 480)
+# Message mix: sos_response replies to alerts, direct general messages, broadcast alerts
+MESSAGE_MIX = (("sos_response", 0.5), ("general", 0.35), ("alert", 0.15))
+# Every generated user logs in with this password
+SIM_PASSWORD_HASH = "ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f"  # sha256("password123")
+
+ROAD_NAMES = (
+    "Outer Ring Road", "Inner Ring Road", "Jubilee Hills Road", "Banjara Hills Main Road", "Madhapur Road",
+    "Kondapur Main Road", "Mehdipatnam Road", "Tank Bund Road", "Necklace Road", "Old Mumbai Highway",
+    "Nagarjuna Sagar Road", "Musheerabad Road", "Begumpet Road", "Chandrayangutta Road", "Malakpet Road",
+)
+FACILITIES = ("Medical aid", "Food", "Water", "Blankets", "Children care", "Power backup", "Sanitation")
+REPORT_TEXT = {
+    "safe": ("Water receding, family safe", "Moved to first floor, all safe", "Safe at relative's house"),
+    "help": ("Need drinking water and food", "Elderly person needs medicine", "Water entering ground floor"),
+    "trapped": ("Water up to first floor, cannot leave", "Stuck on roof with children", "Car stranded in flood water"),
+}
+SOS_TEXT = (
+    "Trapped on rooftop with family", "Water rising fast, need boat", "Elderly person needs evacuation",
+    "Medical emergency, road flooded", "Child missing near the nala", "House wall collapsed",
+)
+MESSAGE_TEXT = {
+    "sos_response": ("Rescue team dispatched, ETA 20 minutes", "Boat on the way, stay on the roof", "Team reached your area"),
+    "general": ("Is the road to the shelter open?", "Shelter has space for 50 more", "Please share your exact location"),
+    "alert": ("Heavy rain expected in the next 3 hours", "Move to higher ground immediately", "Musi river level rising"),
+}
+
+def scenario_counts(reports):
+    """Row counts per table for a scenario with this many status reports"""
+    counts = {table: max(int(reports * ratio), MIN_COUNTS[table]) for table, ratio in SCALE_RATIOS.items()}
+    counts["status_reports"] = reports
+    return counts
+
+class ScenarioGenerator:
+    """Deterministic synthetic flood data, loaded through the bulk import path.
+
+    Every table draws from its own random stream seeded from (seed, table),
+    so a seed always produces the same rows, and changing one table's count
+    does not change the others. Timestamps are laid out between start and
+    start + hours following the surge curve.
+    """
+
+    def __init__(self, seed=0, start=None, hours=DEFAULT_HOURS, curve=DEFAULT_CURVE, hotspots=None,
+                 photo_share=PHOTO_SHARE):
+        self.seed = seed
+        self.photo_share = photo_share
+        self.hours = hours
+        self.start = start or datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours)
+        self.curve = SURGE_CURVES[curve] if isinstance(curve, str) else curve
+        self.hotspots = hotspots or DEFAULT_HOTSPOTS
+        self.users = {}
+
+    def _rng(self, table):
+        return np.random.default_rng([self.seed, zlib.crc32(table.encode())])
+
+    def intensity(self, fraction):
+        """Surge curve intensity (0-1, relative to its peak) at fractions of the scenario elapsed"""
+        xs, ys = zip(*self.curve)
+        return np.interp(fraction, xs, ys) / max(ys)
+
+    def times(self, rng, n):
+        """n sorted timestamps (as scenario fractions) distributed by the surge curve"""
+        minutes = int(self.hours * 60)
+        weights = self.intensity((np.arange(minutes) + 0.5) / minutes)
+        picks = rng.choice(minutes, size=n, p=weights / weights.sum())
+        return np.sort((picks + rng.random(n)) / minutes)
+
+    def to_timestamps(self, fractions):
+        return pd.Timestamp(self.start) + pd.to_timedelta(fractions * self.hours * 3600, unit="s")
+
+    def points(self, rng, n):
+        """(latitudes, longitudes, whether each point is in a hotspot) for n incidents"""
+        names = list(self.hotspots)
+        weights = np.array([self.hotspots[name][0] for name in names])
+        in_hotspot = rng.random(n) < HOTSPOT_SHARE
+        spot = rng.choice(len(names), size=n, p=weights / weights.sum())
+        centers = np.array([AREA_CENTERS[name] for name in names])[spot]
+        spread_km = np.array([self.hotspots[name][1] for name in names])[spot]
+        offsets = rng.normal(size=(n, 2)) * spread_km[:, None] / KM_PER_DEG_LAT
+        offsets[:, 1] /= np.cos(np.radians(centers[:, 0]))
+        min_lat, min_lon, max_lat, max_lon = HYDERABAD_BOUNDS
+        uniform = rng.random((n, 2)) * [max_lat - min_lat, max_lon - min_lon] + [min_lat, min_lon]
+        coords = np.where(in_hotspot[:, None], centers + offsets, uniform)
+        lat = np.clip(coords[:, 0], min_lat, max_lat).round(6)
+        lon = np.clip(coords[:, 1], min_lon, max_lon).round(6)
+        return lat, lon, in_hotspot
+
+    @staticmethod
+    def nearest_area(lat, lon):
+        """Name of the closest known area to each point"""
+        names = list(AREA_CENTERS)
+        centers = np.array([AREA_CENTERS[name] for name in names])
+        distances = (lat[:, None] - centers[:, 0]) ** 2 + (lon[:, None] - centers[:, 1]) ** 2
+        return np.array([f"{name}, Hyderabad" for name in names])[distances.argmin(axis=1)]
+
+    def photos(self, rng):
+        """Distinct photos encoded exactly as uploads are (see utils.process_uploaded_image)"""
+        from PIL import Image
+        from utils import process_uploaded_image
+        width, height = PHOTO_SIZE
+        photos = []
+        for _ in range(PHOTO_VARIANTS):
+            # Muddy water gradient with sensor noise, so the JPEGs are the size of real photos
+            base = np.linspace(rng.uniform(40, 120), rng.uniform(120, 220), height)[:, None, None]
+            tint = rng.uniform(0.6, 1.0, size=3)
+            pixels = base * tint + rng.normal(0, 12, size=(height, width, 3))
+            buffer = io.BytesIO()
+            Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="PNG")
+            buffer.seek(0)
+            photos.append(process_uploaded_image(buffer))
+        return np.array(photos, dtype=object)
+
+    def _load(self, table, frames, progress):
+        loaded = 0
+        for frame in frames:
+            count, rejected = load_chunk(table, frame)
+            if len(rejected):
+                raise ValueError(f"{len(rejected)} generated {table} rows were rejected")
+            loaded += count
+            if progress:
+                progress(table, loaded)
+        return loaded
+
+    def _chunks(self, n):
+        for offset in range(0, n, IMPORT_CHUNK_SIZE):
+            yield offset, min(IMPORT_CHUNK_SIZE, n - offset)
+
+    def generate_users(self, n):
+        rng = self._rng("users")
+        roles = rng.choice([role for role, _ in ROLE_SHARES], size=n, p=[share for _, share in ROLE_SHARES])
+        # Every role needs at least one member for the traffic below
+        roles[:len(ROLE_SHARES)] = [role for role, _ in ROLE_SHARES]
+        usernames = np.array([f"sim{self.seed}_{role}_{i}" for i, role in enumerate(roles)])
+        created = self.to_timestamps(-rng.random(n) * 24 * 30 / self.hours)
+        frame = pd.DataFrame({"username": usernames, "password_hash": SIM_PASSWORD_HASH, "role": roles, "created_at": created})
+
+        existing = self.user_ids()
+        # Rerunning a seed reuses its users instead of failing on duplicate usernames
+        frame = frame[~frame["username"].isin(list(existing))]
+        for offset, size in self._chunks(len(frame)):
+            yield frame.iloc[offset:offset + size]
+
+    def user_ids(self):
+        """username -> id of this seed's users already in the database"""
+        rows = execute_query("SELECT username, id FROM users WHERE username LIKE %s", (f"sim{self.seed}\\_%",), fetch=True)
+        return dict(rows)
+
+    def _role_ids(self, role):
+        return np.array(sorted(user_id for username, user_id in self.users.items()
+                               if username.startswith(f"sim{self.seed}_{role}_")))
+
+    def generate_shelters(self, n):
+        rng = self._rng("shelters")
+        lat, lon, _ = self.points(rng, n)
+        capacity = rng.integers(10, 100, size=n) * 10
+        occupancy = (capacity * rng.beta(2, 2, size=n)).astype(int)
+        ratio = occupancy / capacity
+        status = np.where(ratio >= 0.95, "full", np.where(ratio >= 0.75, "limited", "available"))
+        areas = self.nearest_area(lat, lon)
+        facilities = [", ".join(rng.choice(FACILITIES, size=rng.integers(2, 5), replace=False)) for _ in range(n)]
+        yield pd.DataFrame({
+            "name": [f"{area.split(',')[0]} Relief Camp {i + 1}" for i, area in enumerate(areas)],
+            "address": areas,
+            "latitude": lat,
+            "longitude": lon,
+            "capacity": capacity,
+            "current_occupancy": occupancy,
+            "status": status,
+            "contact_number": [f"+91-9{number:09d}" for number in rng.integers(0, 10 ** 9, size=n)],
+            "facilities": facilities,
+        })
+
+    def generate_roads(self, n):
+        rng = self._rng("roads")
+        lat, lon, in_hotspot = self.points(rng, n)
+        # Roads through hotspots are far more likely to be under water
+        flooded = rng.random(n) < np.where(in_hotspot, 0.5, 0.1)
+        status = np.where(flooded, np.where(rng.random(n) < 0.6, "blocked", "limited"), "open")
+        descriptions = {"open": "Clear for traffic", "limited": "Slow moving traffic due to water accumulation",
+                        "blocked": "Waterlogged - avoid this route"}
+        yield pd.DataFrame({
+            "name": [f"{ROAD_NAMES[i % len(ROAD_NAMES)]} Stretch {i // len(ROAD_NAMES) + 1}" for i in range(n)],
+            "status": status,
+            "description": [descriptions[value] for value in status],
+            "latitude": lat,
+            "longitude": lon,
+        })
+
+    def generate_status_reports(self, n):
+        rng = self._rng("status_reports")
+        citizens = self._role_ids("citizen")
+        photos = self.photos(rng)
+        fractions = self.times(rng, n)
+        for offset, size in self._chunks(n):
+            chunk = fractions[offset:offset + size]
+            lat, lon, _ = self.points(rng, size)
+            # Worse reports at the height of the surge
+            surge = self.intensity(chunk)
+            draw = rng.random(size)
+            status = np.where(draw < 0.05 + 0.25 * surge, "trapped", np.where(draw < 0.25 + 0.35 * surge, "help", "safe"))
+            text = rng.integers(0, 3, size=size)
+            with_photo = rng.random(size) < self.photo_share
+            yield pd.DataFrame({
+                "user_id": rng.choice(citizens, size=size),
+                "status": status,
+                "location": self.nearest_area(lat, lon),
+                "latitude": lat,
+                "longitude": lon,
+                "description": [REPORT_TEXT[value][i] for value, i in zip(status, text)],
+                "photo_path": np.where(with_photo, photos[rng.integers(0, PHOTO_VARIANTS, size=size)], None),
+                "created_at": self.to_timestamps(chunk),
+            })
+
+    def generate_sos_alerts(self, n):
+        rng = self._rng("sos_alerts")
+        citizens = self._role_ids("citizen")
+        fractions = self.times(rng, n)
+        for offset, size in self._chunks(n):
+            chunk = fractions[offset:offset + size]
+            lat, lon, _ = self.points(rng, size)
+            # Older alerts are more likely to have been resolved by the end of the scenario
+            age_hours = (1 - chunk) * self.hours
+            resolved = rng.random(size) < np.clip(age_hours / 24, 0, 0.9)
+            yield pd.DataFrame({
+                "user_id": rng.choice(citizens, size=size),
+                "message": np.array(SOS_TEXT)[rng.integers(0, len(SOS_TEXT), size=size)],
+                "location": self.nearest_area(lat, lon),
+                "latitude": lat,
+                "longitude": lon,
+                "status": np.where(resolved, "resolved", "active"),
+                "created_at": self.to_timestamps(chunk),
+            })
+
+    def generate_messages(self, n, alerts):
+        """Message traffic; alerts is an array of (id, user_id, created_at fraction) rows to reply to"""
+        rng = self._rng("messages")
+        citizens = self._role_ids("citizen")
+        rescuers = self._role_ids("rescue_team")
+        officials = self._role_ids("government")
+        kinds = [kind for kind, _ in MESSAGE_MIX]
+        fractions = self.times(rng, n)
+        for offset, size in self._chunks(n):
+            kind = rng.choice(kinds, size=size, p=[share for _, share in MESSAGE_MIX])
+            if not len(alerts):
+                kind[kind == "sos_response"] = "general"
+            chunk = fractions[offset:offset + size]
+            sender = np.where(rng.random(size) < 0.5, rng.choice(citizens, size=size), rng.choice(rescuers, size=size))
+            recipient = np.where(np.isin(sender, citizens), rng.choice(rescuers, size=size), rng.choice(citizens, size=size))
+            alert_id = np.full(size, None, dtype=object)
+
+            responses = kind == "sos_response"
+            if responses.any():
+                # Replies follow their alert within about half an hour
+                replied = alerts[rng.integers(0, len(alerts), size=responses.sum())]
+                alert_id[responses] = replied[:, 0].astype(int)
+                sender[responses] = rng.choice(rescuers, size=responses.sum())
+                recipient[responses] = replied[:, 1].astype(int)
+                chunk = chunk.copy()
+                chunk[responses] = np.minimum(replied[:, 2] + rng.exponential(0.5, size=responses.sum()) / self.hours, 1)
+
+            broadcasts = kind == "alert"
+            sender[broadcasts] = rng.choice(officials, size=broadcasts.sum())
+            recipient = recipient.astype(object)
+            recipient[broadcasts] = None
+
+            text = rng.integers(0, 3, size=size)
+            yield pd.DataFrame({
+                "sender_id": sender,
+                "recipient_id": recipient,
+                "alert_id": alert_id,
+                "message_type": kind,
+                "message": [MESSAGE_TEXT[value][i] for value, i in zip(kind, text)],
+                "created_at": self.to_timestamps(chunk),
+            })
+
+    def _new_alerts(self, after_id):
+        """(id, user_id, created_at fraction) of alerts loaded after after_id"""
+        rows = execute_query(
+            "SELECT id, user_id, EXTRACT(EPOCH FROM created_at - %s) FROM sos_alerts WHERE id > %s ORDER BY id",
+            (self.start, after_id), fetch=True
+        )
+        return np.array([(alert_id, user_id, float(seconds) / 3600 / self.hours) for alert_id, user_id, seconds in rows])
+
+    def run(self, counts, progress=None):
+        """Generate and load every table; returns ({table: rows loaded}, seconds taken)"""
+        started = time.perf_counter()
+        loaded = {"users": self._load("users", self.generate_users(counts["users"]), progress)}
+        self.users = self.user_ids()
+        loaded["shelters"] = self._load("shelters", self.generate_shelters(counts["shelters"]), progress)
+        loaded["roads"] = self._load("roads", self.generate_roads(counts["roads"]), progress)
+        loaded["status_reports"] = self._load("status_reports", self.generate_status_reports(counts["status_reports"]), progress)
+        last_alert = execute_query("SELECT COALESCE(MAX(id), 0) FROM sos_alerts", fetch=True)
+        last_alert = last_alert[0][0] if last_alert else 0
+        loaded["sos_alerts"] = self._load("sos_alerts", self.generate_sos_alerts(counts["sos_alerts"]), progress)
+        alerts = self._new_alerts(last_alert)
+        loaded["messages"] = self._load("messages", self.generate_messages(counts["messages"], alerts), progress)
+        return loaded, round(time.perf_counter() - started, 3)
+
+def generate_scenario(reports, seed=0, curve=DEFAULT_CURVE, hours=DEFAULT_HOURS, start=None, hotspots=None,
+                      photo_share=PHOTO_SHARE, progress=None):
+    """Load a scenario sized by its number of status reports (see scenario_counts)"""
+    generator = ScenarioGenerator(seed, start, hours, curve, hotspots, photo_share)
+    return generator.run(scenario_counts(reports), progress)
+
+def parse_hotspot(text):
+    """'Area[:weight[:spread_km]]' -> (area, (weight, spread_km))"""
+    area, *rest = text.split(":")
+    if area not in AREA_CENTERS:
+        raise argparse.ArgumentTypeError(f"unknown area {area!r}; choose from {', '.join(AREA_CENTERS)}")
+    weight = float(rest[0]) if rest else 1.0
+    spread = float(rest[1]) if len(rest) > 1 else 1.5
+    return area, (weight, spread)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a synthetic, seed-deterministic Hyderabad flood scenario")
+    parser.add_argument("--reports", type=int, default=10000, help="status reports; other tables scale with it")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--curve", choices=sorted(SURGE_CURVES), default=DEFAULT_CURVE)
+    parser.add_argument("--hours", type=float, default=DEFAULT_HOURS, help="scenario length")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="scenario start (default: --hours before now)")
+    parser.add_argument("--hotspot", type=parse_hotspot, action="append",
+                        help="Area[:weight[:spread_km]] (repeatable, replaces the default hotspots)")
+    parser.add_argument("--photo-share", type=float, default=PHOTO_SHARE, help="share of status reports with a photo")
+    args = parser.parse_args()
+
+    counts = scenario_counts(args.reports)
+    print(", ".join(f"{count:,} {table}" for table, count in counts.items()), flush=True)
+    loaded, seconds = generate_scenario(args.reports, args.seed, args.curve, args.hours, args.start,
+                                        dict(args.hotspot) if args.hotspot else None, args.photo_share,
+                                        lambda table, count: print(f"{table}: {count:,} loaded", flush=True))
+    total = sum(loaded.values())
+    print(f"Loaded {total:,} rows in {seconds}s ({round(total / seconds) if seconds else 0:,} rows/s)")
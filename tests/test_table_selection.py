@@ -0,0 +1,81 @@
+import os
+import sys
+import pytest
+from streamlit.testing.v1 import AppTest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from components.data_table import _grid_key
+
+KEY = "rescue_sos_queue"
+SORT_OPTIONS = ("Oldest first", "Newest first", "Unanswered first")
+
+def queue_script():
+    """A stand-in for the rescue team queue, with rows taken from session state"""
+    import streamlit as st
+    from components.data_table import render_table
+    selected = render_table(
+        st.session_state.rows,
+        ["Alert", "Time", "Responses"],
+        key="rescue_sos_queue",
+        sort_options={"Oldest first": ("Time", True), "Newest first": ("Time", False), "Unanswered first": ("Responses", True)},
+        selectable=True,
+        id_column="Alert"
+    )
+    st.markdown(f"open: {None if selected is None else int(selected['Alert'])}")
+
+def open_alert(at):
+    return at.markdown[-1].value
+
+def shown_ids(at):
+    return at.dataframe[0].value["Alert"].tolist()
+
+def select(at, alert_id):
+    """Click the row of alert_id in the grid as currently shown"""
+    ids = shown_ids(at)
+    at.session_state[_grid_key(KEY, ids)] = {"selection": {"rows": [ids.index(alert_id)], "columns": []}}
+    return at.run()
+
+@pytest.fixture
+def app():
+    at = AppTest.from_function(queue_script)
+    at.session_state.rows = [(1, 10, 2), (2, 20, 0), (3, 30, 1)]
+    return at.run()
+
+def test_selection_follows_alert_across_sorts(app):
+    assert open_alert(app) == "open: None"
+    select(app, 2)
+    assert open_alert(app) == "open: 2"
+    for label in SORT_OPTIONS[1:] + SORT_OPTIONS[:1]:
+        app.selectbox(key=f"{KEY}_sort").select(label).run()
+        assert open_alert(app) == "open: 2", label
+
+def test_selection_follows_alert_when_rows_arrive(app):
+    app.selectbox(key=f"{KEY}_sort").select("Newest first").run()
+    select(app, 1)
+    assert shown_ids(app) == [3, 2, 1]
+    # A new alert lands at the top, moving the selected one down a position
+    app.session_state.rows = app.session_state.rows + [(4, 40, 0)]
+    app.run()
+    assert shown_ids(app) == [4, 3, 2, 1]
+    assert open_alert(app) == "open: 1"
+
+def test_deselecting_closes_alert(app):
+    select(app, 3)
+    app.session_state[_grid_key(KEY, shown_ids(app))] = {"selection": {"rows": [], "columns": []}}
+    app.run()
+    assert open_alert(app) == "open: None"
+
+def test_selection_clears_when_alert_leaves(app):
+    select(app, 3)
+    app.session_state.rows = [(1, 10, 2), (2, 20, 0)]
+    app.run()
+    assert open_alert(app) == "open: None"
+    # Coming back does not reopen it: the selection was dropped, not hidden
+    app.session_state.rows = [(1, 10, 2), (2, 20, 0), (3, 30, 1)]
+    app.run()
+    assert open_alert(app) == "open: None"
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import threading
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import write_queue
+from database import DatabaseUnavailable
+from write_queue import WriteQueue, WriteQueueFull
+
+FLUSH_TIMEOUT = 10
+
+class StubWriter:
+    """Stands in for a batch writer: one transaction per call, failed whole by any bad row"""
+
+    def __init__(self):
+        self.batches = []
+        self.rows = {}
+        self.down = False
+        self.calls_while_down = 0
+        self.open = threading.Event()
+        self.open.set()
+
+    def __call__(self, records):
+        self.open.wait()
+        if self.down:
+            self.calls_while_down += 1
+            raise DatabaseUnavailable("connection refused")
+        self.batches.append(len(records))
+        if any(record.get("bad") for record in records):
+            return None
+        inserted = {}
+        for record in records:
+            inserted[record["submission_id"]] = len(self.rows) + 1
+            self.rows[record["submission_id"]] = record
+        return inserted
+
+@pytest.fixture
+def writer(monkeypatch):
+    stub = StubWriter()
+    monkeypatch.setitem(write_queue.WRITERS, "status_report", stub)
+    monkeypatch.setattr(write_queue, "RETRY_BACKOFF", 0.01)
+    monkeypatch.setattr(write_queue, "MAX_OUTAGE_BACKOFF", 0.05)
+    monkeypatch.setattr(write_queue, "SUBMIT_TIMEOUT", 0.2)
+    return stub
+
+def report(n, bad=False):
+    return {"user_id": 1, "status": "safe", "location": f"L{n}", "bad": bad}
+
+def test_burst_is_committed_in_batches(writer, tmp_path):
+    queue = WriteQueue(str(tmp_path), batch_size=50)
+    writer.open.clear()
+    ids = [queue.submit("status_report", report(n)) for n in range(200)]
+    writer.open.set()
+    assert queue.wait_until_flushed(FLUSH_TIMEOUT)
+    assert set(writer.rows) == set(ids)
+    assert queue.stats()["committed"] == 200
+    # Far fewer transactions than rows, none larger than the batch size
+    assert len(writer.batches) < 20
+    assert max(writer.batches) <= 50
+
+def test_full_queue_rejects_submissions(writer, tmp_path):
+    queue = WriteQueue(str(tmp_path), max_size=3)
+    writer.open.clear()
+    for n in range(3):
+        queue.submit("status_report", report(n))
+    with pytest.raises(WriteQueueFull):
+        queue.submit("status_report", report(3))
+    assert queue.stats()["rejected"] == 1
+    writer.open.set()
+    assert queue.wait_until_flushed(FLUSH_TIMEOUT)
+    # Space frees up once the backlog is written
+    queue.submit("status_report", report(4))
+    assert queue.wait_until_flushed(FLUSH_TIMEOUT)
+    assert queue.stats()["committed"] == 4
+
+def test_bad_row_is_isolated_to_the_dead_letter_file(writer, tmp_path):
+    queue = WriteQueue(str(tmp_path), batch_size=100)
+    writer.open.clear()
+    ids = [queue.submit("status_report", report(n, bad=(n == 13))) for n in range(40)]
+    writer.open.set()
+    assert queue.wait_until_flushed(FLUSH_TIMEOUT)
+    assert set(writer.rows) == set(ids) - {ids[13]}
+    with open(queue.dead_letter_path) as f:
+        dead = [json.loads(line) for line in f]
+    assert [entry["id"] for entry in dead] == [ids[13]]
+    assert dead[0]["attempts"] == write_queue.MAX_WRITE_ATTEMPTS
+    assert queue.stats()["failed"] == 1
+
+def test_writes_are_held_during_an_outage(writer, tmp_path):
+    queue = WriteQueue(str(tmp_path))
+    writer.down = True
+    ids = [queue.submit("status_report", report(n)) for n in range(10)]
+    # Retried for longer than MAX_WRITE_ATTEMPTS rejections would allow
+    assert not queue.wait_until_flushed(0.5)
+    assert writer.calls_while_down > write_queue.MAX_WRITE_ATTEMPTS
+    assert queue.stats()["outage_retries"] > 0
+    assert queue.stats()["outstanding"] == 10
+    writer.down = False
+    assert queue.wait_until_flushed(FLUSH_TIMEOUT)
+    assert set(writer.rows) == set(ids)
+    assert not os.path.exists(queue.dead_letter_path)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -1,8 +1,13 @@
 import streamlit as st
 from datetime import datetime
+import time
 import base64
 from io import BytesIO
-from PIL import Image
+from metrics import IMAGE_PROCESSING_SECONDS
+
+# Zones are square grid cells: change events record the zone of the row they
+# touch, and SOS alerts and status reports are published on their zone topic
+ZONE_SIZE_DEG = 0.05
 
 def format_datetime(dt):
     """Format datetime for display"""
@@ -42,6 +47,10 @@ def get_status_emoji(status):
 def process_uploaded_image(uploaded_file):
     """Process uploaded image and return base64 encoded string"""
     if uploaded_file is not None:
+        # Pillow is only needed once someone uploads a photo
+        from PIL import Image
+        
+        started = time.perf_counter()
         try:
             # Open and resize image
             image = Image.open(uploaded_file)
@@ -60,9 +69,11 @@ def process_uploaded_image(uploaded_file):
             
             # Encode to base64
             img_str = base64.b64encode(buffer.read()).decode()
+            IMAGE_PROCESSING_SECONDS.observe(time.perf_counter() - started, outcome='ok')
             return f"data:image/jpeg;base64,{img_str}"
             
         except Exception as e:
+            IMAGE_PROCESSING_SECONDS.observe(time.perf_counter() - started, outcome='error')
             st.error(f"Error processing image: {e}")
             return None
     
@@ -116,6 +127,14 @@ def validate_coordinates(lat, lon):
     
     return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
 
+def get_zone(lat, lon):
+    """Get the grid zone id for a coordinate, or None if it is missing"""
+    if lat is None or lon is None:
+        return None
+    row = int(lat // ZONE_SIZE_DEG)
+    col = int(lon // ZONE_SIZE_DEG)
+    return f"{row}_{col}"
+
 def format_phone_number(phone):
     """Format phone number for display"""
     if phone and len(phone) >= 10:
@@ -0,0 +1,399 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+import logging
+import argparse
+import threading
+from itertools import count
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from database import DatabaseUnavailable, create_sos_alerts, create_status_reports
+
+# Submissions accepted but not yet committed; beyond this, submit() waits
+WRITE_QUEUE_SIZE = 5000
+# How long submit() waits for space before rejecting (backpressure)
+SUBMIT_TIMEOUT = 2.0
+# Rows per multi-row transaction
+FLUSH_BATCH_SIZE = 500
+# How long the flusher lets a burst accumulate before writing a partial batch
+FLUSH_INTERVAL = 0.02
+# A submission whose row keeps being rejected is moved to the dead-letter file after this many attempts
+MAX_WRITE_ATTEMPTS = 5
+RETRY_BACKOFF = 0.5
+# While the database is unreachable, writes are retried indefinitely, backing
+# off exponentially from RETRY_BACKOFF up to this many seconds
+MAX_OUTAGE_BACKOFF = 30
+# Acknowledgement latency target (p99) checked by the load test
+ACK_LATENCY_TARGET_MS = 50
+LATENCY_SAMPLES = 10000
+# The journal is truncated once it is larger than this and fully committed
+JOURNAL_COMPACT_BYTES = 16 * 1024 * 1024
+JOURNAL_DIR_ENV = "FLOODAID_WRITE_JOURNAL_DIR"
+DEFAULT_JOURNAL_DIR = "write_journal"
+
+# Submission kind -> batch writer returning {submission_id: row_id}, None if
+# the rows were rejected, or raising DatabaseUnavailable
+WRITERS = {
+    "sos_alert": create_sos_alerts,
+    "status_report": create_status_reports,
+}
+
+logger = logging.getLogger(__name__)
+
+class WriteQueueFull(Exception):
+    """Raised when the write queue stays full for SUBMIT_TIMEOUT seconds"""
+
+class Journal:
+    """Append-only local log of accepted submissions.
+
+    A submission is acknowledged once its line is fsynced. Concurrent
+    appends are group-committed: whichever caller finds no sync in progress
+    writes and fsyncs every pending line, and the others wait for it. Each
+    process locks its own journal-<n>.log, so a restarted worker picks up
+    (and replays) a journal left behind by a dead one.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        for n in count():
+            self.path = os.path.join(directory, f"journal-{n}.log")
+            self._file = open(self.path, "a+", encoding="utf-8")
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                self._file.close()
+        self._cond = threading.Condition()
+        self._pending = []
+        self._appended_seq = 0
+        self._durable_seq = 0
+        self._failed_seq = 0
+        self._syncing = False
+        self.uncommitted = set()
+
+    def recover(self):
+        """Return submissions in the journal that were never committed or dead-lettered"""
+        self._file.seek(0)
+        submissions = {}
+        line = "\n"
+        for line in self._file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn final line from a crash mid-write; it was never acknowledged
+                continue
+            if entry["op"] == "submit":
+                submissions[entry["id"]] = entry
+            else:
+                for submission_id in entry["ids"]:
+                    submissions.pop(submission_id, None)
+        if not line.endswith("\n"):
+            # Terminate the torn line so the next append starts on its own line
+            self._file.write("\n")
+            self._file.flush()
+        self.uncommitted.update(submissions)
+        return list(submissions.values())
+
+    def append(self, entry):
+        """Append a submission and return once it is durable"""
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._cond:
+            self._pending.append(line)
+            self.uncommitted.add(entry["id"])
+            self._appended_seq += 1
+            seq = self._appended_seq
+            while self._durable_seq < seq:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._sync_pending()
+            if seq <= self._failed_seq:
+                self.uncommitted.discard(entry["id"])
+                raise OSError("write journal sync failed")
+
+    def _sync_pending(self):
+        """Write and fsync all pending lines; called with the lock held, releases it while syncing"""
+        self._syncing = True
+        lines, self._pending = self._pending, []
+        batch_seq = self._appended_seq
+        self._cond.release()
+        try:
+            self._file.write("".join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            failed = False
+        except OSError:
+            failed = True
+        finally:
+            self._cond.acquire()
+        if failed:
+            self._failed_seq = batch_seq
+        self._durable_seq = batch_seq
+        self._syncing = False
+        self._cond.notify_all()
+
+    def mark_done(self, op, submission_ids):
+        """Record that submissions were committed (or dead-lettered) so they are not replayed.
+
+        Not fsynced: losing this line only means the rows are replayed, and
+        replays are skipped by their submission_id.
+        """
+        with self._cond:
+            self._pending.append(json.dumps({"op": op, "ids": list(submission_ids)}) + "\n")
+            self.uncommitted.difference_update(submission_ids)
+            if not self._syncing:
+                lines, self._pending = self._pending, []
+                self._file.write("".join(lines))
+                self._file.flush()
+            if not self.uncommitted and not self._pending and not self._syncing:
+                if os.path.getsize(self.path) > JOURNAL_COMPACT_BYTES:
+                    self._file.truncate(0)
+
+class WriteQueue:
+    """Bounded queue that acknowledges writes once journaled and commits them in batches"""
+
+    def __init__(self, journal_dir, max_size=WRITE_QUEUE_SIZE, batch_size=FLUSH_BATCH_SIZE):
+        self.journal = Journal(journal_dir)
+        self.dead_letter_path = os.path.join(journal_dir, "dead_letter.jsonl")
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.ack_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.submitted = 0
+        self.committed = 0
+        self.rejected = 0
+        self.failed = 0
+        # Consecutive flushes that found the database unreachable
+        self.outage_retries = 0
+        self._queue = deque(self.journal.recover())
+        # Accepted and not yet committed: reserved, queued or being written
+        self._outstanding = len(self._queue)
+        self._cond = threading.Condition()
+        threading.Thread(target=self._flush_loop, name="write-queue-flusher", daemon=True).start()
+
+    def submit(self, kind, record):
+        """Accept a write, returning its submission id once it is durable in the journal.
+
+        Raises WriteQueueFull if the queue has no space within SUBMIT_TIMEOUT.
+        """
+        if kind not in WRITERS:
+            raise ValueError(f"Unknown submission kind: {kind}")
+        started = time.perf_counter()
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._outstanding < self.max_size, timeout=SUBMIT_TIMEOUT):
+                self.rejected += 1
+                raise WriteQueueFull(f"{self._outstanding} writes pending")
+            self._outstanding += 1
+
+        entry = {"op": "submit", "id": uuid.uuid4().hex, "kind": kind, "record": record, "attempts": 0}
+        try:
+            self.journal.append(entry)
+        except OSError:
+            with self._cond:
+                self._outstanding -= 1
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._queue.append(entry)
+            self.submitted += 1
+            self._cond.notify_all()
+        self.ack_latencies.append(time.perf_counter() - started)
+        return entry["id"]
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue)
+            if len(self._queue) < self.batch_size:
+                # Let a burst fill the batch
+                time.sleep(FLUSH_INTERVAL)
+            with self._cond:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            failed, unwritten = [], []
+            self._write_batch(batch, failed, unwritten)
+            if failed:
+                self._retry(failed)
+            if unwritten:
+                self._wait_for_database(unwritten)
+            else:
+                self.outage_retries = 0
+
+    def _write_batch(self, batch, failed, unwritten):
+        """Write a batch, one transaction per kind.
+
+        Entries whose row was rejected are added to failed; entries not
+        written because the database was unreachable are added to unwritten,
+        and once that happens nothing more of the batch is attempted.
+        """
+        by_kind = {}
+        for entry in batch:
+            by_kind.setdefault(entry["kind"], []).append(entry)
+
+        for kind, entries in by_kind.items():
+            if unwritten:
+                unwritten += entries
+                continue
+            records = [dict(entry["record"], submission_id=entry["id"]) for entry in entries]
+            try:
+                inserted = WRITERS[kind](records)
+            except DatabaseUnavailable as e:
+                logger.warning("Database unavailable, holding %d %s writes: %s", len(entries), kind, e)
+                unwritten += entries
+                continue
+            if inserted is not None:
+                self._finish(entries, "commit")
+            elif len(entries) > 1:
+                # One bad row fails the whole statement; bisect to isolate it
+                middle = len(entries) // 2
+                self._write_batch(entries[:middle], failed, unwritten)
+                self._write_batch(entries[middle:], failed, unwritten)
+            else:
+                failed += entries
+
+    def _wait_for_database(self, entries):
+        """Requeue entries held back by an outage after a capped exponential backoff.
+
+        They stay journaled and their attempts are not counted: an outage says
+        nothing about the rows, so they are never dead-lettered for it.
+        """
+        self.outage_retries += 1
+        time.sleep(min(RETRY_BACKOFF * 2 ** min(self.outage_retries - 1, 16), MAX_OUTAGE_BACKOFF))
+        with self._cond:
+            self._queue.extendleft(reversed(entries))
+
+    def _retry(self, entries):
+        """Requeue entries whose row was rejected after a backoff, dead-lettering those out of attempts"""
+        retry, dead = [], []
+        for entry in entries:
+            entry["attempts"] += 1
+            (dead if entry["attempts"] >= MAX_WRITE_ATTEMPTS else retry).append(entry)
+
+        if dead:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in dead)
+            self.failed += len(dead)
+            self._finish(dead, "dead_letter")
+        if retry:
+            time.sleep(RETRY_BACKOFF * max(entry["attempts"] for entry in retry))
+            with self._cond:
+                self._queue.extendleft(reversed(retry))
+
+    def _finish(self, entries, op):
+        self.journal.mark_done(op, [entry["id"] for entry in entries])
+        with self._cond:
+            self._outstanding -= len(entries)
+            if op == "commit":
+                self.committed += len(entries)
+            self._cond.notify_all()
+
+    def ack_latency_ms(self, percentile):
+        """Acknowledgement latency at a percentile (0-100) over recent submissions"""
+        samples = sorted(self.ack_latencies)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index] * 1000
+
+    def stats(self):
+        return {
+            "outstanding": self._outstanding,
+            "queued": len(self._queue),
+            "submitted": self.submitted,
+            "committed": self.committed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "outage_retries": self.outage_retries,
+            "ack_p50_ms": round(self.ack_latency_ms(50), 2),
+            "ack_p99_ms": round(self.ack_latency_ms(99), 2),
+        }
+
+    def wait_until_flushed(self, timeout=None):
+        """Block until every accepted write is committed or dead-lettered"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._outstanding == 0, timeout=timeout)
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+def get_write_queue():
+    """Get this process's write queue, replaying its journal on first use"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(os.environ.get(JOURNAL_DIR_ENV, DEFAULT_JOURNAL_DIR))
+        return _write_queue
+
+def current_write_queue():
+    """This process's write queue if it has been started, without starting one"""
+    return _write_queue
+
+def submit_sos_alert(user_id, location, latitude, longitude, message):
+    """Queue an SOS alert; returns its submission id once it is durably accepted"""
+    return get_write_queue().submit("sos_alert", {
+        "user_id": user_id,
+        "location": location,
+        "latitude": latitude,
+        "longitude": longitude,
+        "message": message,
+    })
+
+def submit_status_report(user_id, status, location, latitude, longitude, description, photo_path=None):
+    """Queue a status report; returns its submission id once it is durably accepted"""
+    return get_write_queue().submit("status_report", {
+        "user_id": user_id,
+        "status": status,
+        "location": location,
+        "latitude": latitude,
+        "longitude": longitude,
+        "description": description,
+        "photo_path": photo_path,
+    })
+
+def load_test(journal_dir, user_id, submissions=5000, concurrency=64):
+    """Submit status reports from many threads and report acknowledgement latency.
+
+    Writes real rows for user_id to the configured database.
+    """
+    queue = WriteQueue(journal_dir)
+
+    def submit(i):
+        queue.submit("status_report", {
+            "user_id": user_id,
+            "status": "safe",
+            "location": f"Load test {i}",
+            "latitude": 17.3 + (i % 100) * 0.003,
+            "longitude": 78.3 + (i // 100 % 100) * 0.003,
+            "description": "write queue load test",
+            "photo_path": None,
+        })
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(submit, range(submissions)))
+    acknowledged = time.perf_counter() - started
+    queue.wait_until_flushed()
+    committed = time.perf_counter() - started
+
+    stats = queue.stats()
+    stats["acks_per_sec"] = round(submissions / acknowledged)
+    stats["commits_per_sec"] = round(submissions / committed)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the SOS/status report write queue")
+    parser.add_argument("--user-id", type=int, required=True, help="existing user to file test reports as")
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--journal-dir", default="write_journal_loadtest")
+    args = parser.parse_args()
+
+    stats = load_test(args.journal_dir, args.user_id, args.submissions, args.concurrency)
+    print(json.dumps(stats, indent=2))
+    if stats["ack_p99_ms"] > ACK_LATENCY_TARGET_MS:
+        print(f"FAIL: p99 acknowledgement latency above {ACK_LATENCY_TARGET_MS} ms")
+        raise SystemExit(1)
+    print(f"OK: p99 acknowledgement latency within {ACK_LATENCY_TARGET_MS} ms")